@@ -0,0 +1,189 @@
+"""
+Compare the sync views behind a threaded WSGI handler with the async views
+behind the ASGI handler under many concurrent clients.
+
+    python -m benchmarks.asgi_concurrency --points 100000 --concurrency 100,500,1000
+
+Both applications run in-process and are driven by the same asyncio load
+generator. A WSGI request is handed to a fixed pool of worker threads, as a
+threaded WSGI server would do; an ASGI request runs on the event loop, as a
+single uvicorn worker would. The response cache is disabled unless --cache
+is given, so every request reaches the database.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from .common import percentile, seed_locations, setup_django, test_database
+
+ENDPOINTS = ("list", "detail", "markers", "export")
+
+
+def make_requests(endpoint, prefix, count, max_pk, seed=0):
+    """Return ``count`` (path, query string) pairs for one endpoint."""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        if endpoint == "list":
+            path, query = f"{prefix}api/locations/", {"limit": 50}
+        elif endpoint == "detail":
+            path, query = f"{prefix}api/locations/{rng.randint(1, max_pk)}/", {}
+        elif endpoint == "markers":
+            south, west = rng.uniform(-60, 60), rng.uniform(-180, 170)
+            path = f"{prefix}markers/"
+            query = {"south": south, "west": west, "north": south + 2, "east": west + 2}
+        else:
+            south, west = rng.uniform(-60, 60), rng.uniform(-180, 170)
+            path = f"{prefix}export/"
+            query = {"format": "ndjson", "south": south, "west": west}
+            query.update(north=south + 1, east=west + 1)
+        requests.append((path, urlencode(query)))
+    return requests
+
+
+def wsgi_caller(application):
+    from django.test.client import RequestFactory
+
+    factory = RequestFactory()
+
+    def call(path, query):
+        environ = factory._base_environ(
+            PATH_INFO=path, QUERY_STRING=query, REQUEST_METHOD="GET"
+        )
+        status = []
+        body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+        for _ in body:
+            pass
+        if hasattr(body, "close"):
+            body.close()
+        return int(status[0].split()[0])
+
+    return call
+
+
+async def call_asgi(application, path, query):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Nobody disconnects; block until the handler cancels the listener.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+async def drive(call, requests, concurrency):
+    """Run ``requests`` through ``call`` from ``concurrency`` clients."""
+    queue = list(reversed(requests))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while queue:
+            path, query = queue.pop()
+            started = time.perf_counter()
+            status = await call(path, query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", default="100,250,500,1000")
+    parser.add_argument("--wsgi-threads", type=int, default=32)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument(
+        "--distribution", choices=["uniform", "clustered"], default="clustered"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Leave the response cache enabled."
+    )
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    endpoints = args.endpoints.split(",")
+
+    if not args.cache:
+        os.environ["DJANGO_CACHE_BACKEND"] = (
+            "django.core.cache.backends.dummy.DummyCache"
+        )
+    setup_django()
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    settings.ALLOWED_HOSTS = ["testserver"]
+    wsgi = wsgi_caller(get_wsgi_application())
+    asgi = get_asgi_application()
+    pool = ThreadPoolExecutor(max_workers=args.wsgi_threads)
+
+    async def call_wsgi(path, query):
+        return await asyncio.get_running_loop().run_in_executor(pool, wsgi, path, query)
+
+    async def call_async(path, query):
+        return await call_asgi(asgi, path, query)
+
+    results = {"points": args.points, "wsgi_threads": args.wsgi_threads, "runs": []}
+    with test_database():
+        seed_locations(args.points, args.distribution)
+        for endpoint in endpoints:
+            for concurrency in levels:
+                run = {"endpoint": endpoint, "concurrency": concurrency}
+                for mode, call, prefix in (
+                    ("wsgi_sync", call_wsgi, "/mapping/"),
+                    ("asgi_async", call_async, "/mapping/async/"),
+                ):
+                    requests = make_requests(
+                        endpoint, prefix, args.requests, args.points
+                    )
+                    run[mode] = asyncio.run(drive(call, requests, concurrency))
+                results["runs"].append(run)
+    pool.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
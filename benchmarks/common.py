@@ -0,0 +1,105 @@
+"""Shared setup for the benchmark scripts in this package."""
+
+import contextlib
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module="config.settings.base", database="sqlite"):
+    """
+    Configure Django so the benchmarks can use the ORM outside manage.py.
+
+    ``database="postgresql"`` swaps in a PostgreSQL connection built from the
+    same DB_* environment variables as the production settings.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    from django.conf import settings
+
+    if database == "postgresql":
+        settings.DATABASES = {
+            "default": {
+                "ENGINE": "django.db.backends.postgresql",
+                "NAME": os.environ.get("DB_NAME", "django_overview"),
+                "USER": os.environ.get("DB_USER", ""),
+                "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+                "HOST": os.environ.get("DB_HOST", "localhost"),
+                "PORT": os.environ.get("DB_PORT", "5432"),
+            }
+        }
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False):
+    """Run against a throwaway test database, like the test runner does."""
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def random_points(count, distribution="uniform", seed=0):
+    """
+    Yield ``count`` (latitude, longitude) pairs.
+
+    ``uniform`` spreads points over the globe; ``clustered`` draws them from
+    a few dozen gaussian blobs, which is closer to real place data.
+    """
+    rng = random.Random(seed)
+    if distribution == "uniform":
+        for _ in range(count):
+            yield rng.uniform(-85, 85), rng.uniform(-180, 180)
+        return
+
+    centres = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(40)]
+    for _ in range(count):
+        latitude, longitude = rng.choice(centres)
+        yield (
+            max(-90.0, min(90.0, rng.gauss(latitude, 1.5))),
+            (rng.gauss(longitude, 1.5) + 180) % 360 - 180,
+        )
+
+
+def seed_locations(count, distribution="uniform", batch_size=10000, seed=0):
+    """Bulk insert ``count`` synthetic locations; return the elapsed seconds."""
+    from mapping.models import Location
+    from mapping.signals import locations_bulk_changed
+
+    started = time.perf_counter()
+    batch = []
+    for i, (latitude, longitude) in enumerate(random_points(count, distribution, seed)):
+        batch.append(
+            Location(
+                name=f"Location {i:07d}",
+                description=f"Synthetic {distribution} point",
+                latitude=latitude,
+                longitude=longitude,
+            )
+        )
+        if len(batch) >= batch_size:
+            Location.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Location.objects.bulk_create(batch)
+    locations_bulk_changed.send(sender=Location)
+    return time.perf_counter() - started
+
+
+def percentile(samples, fraction):
+    """Return the ``fraction`` percentile of ``samples`` (nearest rank)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
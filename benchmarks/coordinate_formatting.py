@@ -0,0 +1,74 @@
+"""
+Compare the per-call coordinate filters with the batch formatter.
+
+    python -m benchmarks.coordinate_formatting --rows 100000
+"""
+
+import argparse
+import json
+import time
+from unittest import mock
+
+from .common import random_points, setup_django
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from mapping.templatetags import location_tags
+
+    points = list(random_points(args.rows, "uniform"))
+    latitudes = [lat for lat, _ in points]
+    longitudes = [lng for _, lng in points]
+    # A few hundred distinct coordinates, repeated: the memo's best case.
+    repeated = (latitudes[:500] * (args.rows // 500 + 1))[: args.rows]
+
+    def per_call(lats, lngs):
+        # The template used to call format_coordinates twice per row.
+        for lat, lng in zip(lats, lngs):
+            location_tags.format_coordinates(lat, lng)
+            location_tags.format_coordinates(lat, lng)
+
+    def run_pure_python(lats, lngs):
+        with mock.patch.object(location_tags, "np", None):
+            location_tags._format_dms.cache_clear()
+            location_tags.format_coordinates_batch(lats, lngs)
+
+    def run_per_call(lats, lngs):
+        location_tags._format_dms.cache_clear()
+        per_call(lats, lngs)
+
+    results = {"rows": args.rows, "numpy": location_tags.np is not None}
+    for label, (lats, lngs) in {
+        "unique": (latitudes, longitudes),
+        "repeated": (repeated, repeated),
+    }.items():
+        results[label] = {
+            "per_call_twice_ms": best_of(lambda: run_per_call(lats, lngs), args.repeat),
+            "batch_pure_python_ms": best_of(
+                lambda: run_pure_python(lats, lngs), args.repeat
+            ),
+        }
+        if location_tags.np is not None:
+            results[label]["batch_numpy_ms"] = best_of(
+                lambda: location_tags.format_coordinates_batch(lats, lngs),
+                args.repeat,
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
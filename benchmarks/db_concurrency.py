@@ -0,0 +1,202 @@
+"""
+Measure database throughput under concurrent readers and writers, with and
+without the connection tuning in the settings.
+
+    python -m benchmarks.db_concurrency --threads 1,8,32
+    python -m benchmarks.db_concurrency --database postgresql --threads 8,64
+
+SQLite runs compare "stock" connections (a new one per request, rollback
+journal, deferred transactions, no pragmas) with "tuned" ones (persistent,
+SQLITE_PRAGMAS and IMMEDIATE transactions) on a database file, as an in-memory database can't be shared
+between threads. PostgreSQL runs compare opening a connection per request
+with the psycopg pool; connection details come from the DB_* environment
+variables.
+
+Every worker thread acts like a request handler: it runs one operation and
+then closes or keeps its connection as Django does at the end of a request,
+following CONN_MAX_AGE. Operations are viewport reads, creates, and
+read-modify-write updates in a transaction. Each mode runs in its own
+process against a fresh test database.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .common import BASE_DIR, percentile, seed_locations, setup_django, test_database
+
+MODES = {"sqlite": ("stock", "tuned"), "postgresql": ("per_request", "pooled")}
+
+
+def configure(database, mode, max_threads, directory):
+    """Adjust the default database settings before any connection is made."""
+    from django.conf import settings
+
+    default = settings.DATABASES["default"]
+    if database == "sqlite":
+        default["TEST"]["NAME"] = str(Path(directory) / f"{mode}.sqlite3")
+        if mode == "stock":
+            settings.SQLITE_PRAGMAS = {}
+            default["OPTIONS"] = {}
+            default["CONN_MAX_AGE"] = 0
+    elif mode == "pooled":
+        default["OPTIONS"] = {"pool": {"min_size": 1, "max_size": max_threads}}
+
+
+def operations(ids, write_fraction):
+    from django.db import transaction
+
+    from mapping.geo import BoundingBox, bbox_q
+    from mapping.models import Location
+
+    def read(rng):
+        south, west = rng.uniform(-60, 60), rng.uniform(-180, 170)
+        box = BoundingBox(south, west, south + 2, west + 2)
+        list(
+            Location.objects.filter(bbox_q(box))
+            .order_by()
+            .values_list("id", "latitude", "longitude")[:500]
+        )
+
+    def create(rng):
+        Location.objects.create(
+            name=f"Created {rng.random()}",
+            description="Benchmark location",
+            latitude=rng.uniform(-80, 80),
+            longitude=rng.uniform(-180, 180),
+        )
+
+    def update(rng):
+        with transaction.atomic():
+            location = Location.objects.get(pk=rng.choice(ids))
+            location.description = f"Updated {rng.random()}"
+            location.save()
+
+    def choose(rng):
+        if rng.random() >= write_fraction:
+            return "read", read
+        return ("create", create) if rng.random() < 0.5 else ("update", update)
+
+    return choose
+
+
+def worker(choose, count, seed):
+    from django.db import OperationalError, connection
+
+    rng = random.Random(seed)
+    latencies, errors = [], {}
+    for _ in range(count):
+        name, operation = choose(rng)
+        started = time.perf_counter()
+        try:
+            operation(rng)
+        except OperationalError as e:
+            errors[str(e)] = errors.get(str(e), 0) + 1
+        finally:
+            # What Django does when a request finishes.
+            connection.close_if_unusable_or_obsolete()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, errors
+
+
+def run_level(choose, threads, requests, seed):
+    per_thread = max(1, requests // threads)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [
+            pool.submit(worker, choose, per_thread, seed + i) for i in range(threads)
+        ]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    latencies = [latency for result, _ in outcomes for latency in result]
+    errors = {}
+    for _, thread_errors in outcomes:
+        for message, count in thread_errors.items():
+            errors[message] = errors.get(message, 0) + count
+    return {
+        "operations_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "errors": sum(errors.values()),
+        "error_messages": errors,
+    }
+
+
+def run_mode(args, mode):
+    os.environ["DJANGO_CACHE_BACKEND"] = "django.core.cache.backends.dummy.DummyCache"
+    setup_django(database=args.database)
+    with tempfile.TemporaryDirectory() as directory:
+        configure(args.database, mode, max(args.threads), directory)
+        from django.db import connection
+
+        from mapping.models import Location
+
+        with test_database():
+            try:
+                seed_locations(args.points, "clustered")
+                ids = list(Location.objects.values_list("id", flat=True)[:10_000])
+                connection.close()
+                choose = operations(ids, args.write_fraction)
+                return {
+                    str(threads): run_level(choose, threads, args.requests, args.seed)
+                    for threads in args.threads
+                }
+            finally:
+                if getattr(connection, "pool", None) is not None:
+                    connection.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database", choices=["sqlite", "postgresql"], default="sqlite"
+    )
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", default="1,8,32")
+    parser.add_argument("--write-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.threads = [int(threads) for threads in args.threads.split(",")]
+
+    if args.mode:
+        print(json.dumps(run_mode(args, args.mode)))
+        return
+
+    results = {
+        "database": args.database,
+        "points": args.points,
+        "requests": args.requests,
+        "write_fraction": args.write_fraction,
+        "runs": [],
+    }
+    by_mode = {}
+    for mode in MODES[args.database]:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_concurrency", *sys.argv[1:]]
+            + ["--mode", mode],
+            cwd=BASE_DIR,
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True,
+        )
+        by_mode[mode] = json.loads(result.stdout.strip().splitlines()[-1])
+    for threads in args.threads:
+        run = {"threads": threads}
+        for mode, levels in by_mode.items():
+            run[mode] = levels[str(threads)]
+        results["runs"].append(run)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Measure the live event stream with many idle clients on one event loop.
+
+    python -m benchmarks.event_fanout --clients 1000,5000,10000
+
+Each client is the real stream generator from mapping.async_views, read by
+its own task as an ASGI server would. Reports the memory held per idle
+stream, and the time from publishing an event on another thread to every
+client having it, for one event and for a burst that coalesces.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from .common import percentile, setup_django
+
+
+async def run(clients, burst):
+    from mapping.async_views import _event_stream
+    from mapping.events import broker, location_event
+
+    received = [[] for _ in range(clients)]
+    arrived = asyncio.Event()
+    pending = {"clients": 0}
+
+    async def client(index):
+        stream = _event_stream()
+        try:
+            async for chunk in stream:
+                if chunk.startswith("data:"):
+                    if not received[index]:
+                        pending["clients"] -= 1
+                        if not pending["clients"]:
+                            arrived.set()
+                    received[index].append((time.perf_counter(), chunk.count("data:")))
+        finally:
+            await stream.aclose()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(client(i)) for i in range(clients)]
+    await asyncio.sleep(0.5)  # Let every stream subscribe and go idle.
+    per_client = (tracemalloc.get_traced_memory()[0] - before) / clients
+    tracemalloc.stop()
+
+    async def publish(events):
+        for r in received:
+            r.clear()
+        arrived.clear()
+        pending["clients"] = clients
+
+        def send():
+            for event in events:
+                broker.publish(event)
+
+        started = time.perf_counter()
+        thread = threading.Thread(target=send)
+        thread.start()
+        await asyncio.wait_for(arrived.wait(), 60)
+        thread.join()
+        await asyncio.sleep(0.05)  # Collect any stragglers from the burst.
+        latencies = [(r[0][0] - started) * 1000 for r in received]
+        delivered = sum(count for r in received for _, count in r) / clients
+        return {
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "max_ms": round(max(latencies), 2),
+            "events_published": len(events),
+            "events_per_client": round(delivered, 1),
+        }
+
+    single = await publish([location_event("updated", 1, "One", 1.0, 2.0)])
+    # Many edits to a few locations, as when an operator drags markers.
+    edits = [
+        location_event("updated", i % 10, f"Edit {i}", 1.0, 2.0) for i in range(burst)
+    ]
+    coalesced = await publish(edits)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "clients": clients,
+        "bytes_per_idle_client": round(per_client),
+        "single_event": single,
+        "burst": coalesced,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", default="1000,5000,10000")
+    parser.add_argument("--burst", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+
+    results = []
+    for clients in [int(c) for c in args.clients.split(",")]:
+        with override_settings(
+            MAPPING_EVENTS_BACKEND="mapping.events.LocalBackend",
+            MAPPING_EVENTS_HEARTBEAT=60,
+        ):
+            results.append(asyncio.run(run(clients, args.burst)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
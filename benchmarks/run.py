@@ -0,0 +1,348 @@
+"""
+Load and scale benchmark suite for the mapping app.
+
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output results.json
+    python -m benchmarks.run --database postgresql --sizes 100000
+
+Every (size, distribution) case runs in its own process against a fresh test
+database: it is seeded with synthetic locations and each view is then
+driven through the test client. The report gives latency percentiles,
+throughput and queries per request for every view, plus the peak RSS of
+the case's process. The output is JSON, so two commits can be compared
+with any JSON diff. Results include the git commit and database vendor.
+
+The response cache is disabled unless --cache is given, so every request
+exercises the view rather than the cache. PostgreSQL connection details
+come from the DB_* environment variables.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from .common import (
+    BASE_DIR,
+    percentile,
+    random_points,
+    seed_locations,
+    setup_django,
+    test_database,
+)
+
+# Operations per request in the batch scenario.
+BATCH_SIZE = 100
+
+
+def _bbox(rng, size):
+    south, west = rng.uniform(-80, 80 - size), rng.uniform(-180, 180 - size)
+    return {"south": south, "west": west, "north": south + size, "east": west + size}
+
+
+def _point(rng):
+    latitude, longitude = next(random_points(1, "clustered", rng.random()))
+    return {"lat": latitude, "lng": longitude}
+
+
+def _form(rng, name):
+    return {
+        "name": name,
+        "description": "Benchmark location",
+        "latitude": rng.uniform(-80, 80),
+        "longitude": rng.uniform(-180, 180),
+    }
+
+
+def _batch(rng, size):
+    operations = [
+        {"op": "create", "data": _form(rng, f"Batched {rng.random()}")}
+        for _ in range(size)
+    ]
+    return json.dumps({"operations": operations})
+
+
+def build_scenarios(ids, cursors):
+    """
+    Return ``(name, request_factory)`` pairs in run order.
+
+    Each factory takes a random generator and returns ``(method, url, data)``;
+    string data is posted as JSON. Write scenarios run last; batch creates
+    BATCH_SIZE locations per request; update uses the first half of ``ids`` and
+    delete consumes the second half.
+    """
+    from django.urls import reverse
+
+    from mapping.models import ChangeSequence
+
+    update_ids = ids[: len(ids) // 2]
+    delete_ids = ids[len(ids) // 2 :]
+
+    def deep_page(rng):
+        return "GET", reverse("location_list"), {"after": rng.choice(cursors)}
+
+    def recent_changes(rng):
+        # A map client that is a few edits behind.
+        since = max(ChangeSequence.current() - rng.randint(1, 20), 0)
+        return "GET", reverse("location_changes"), {"since": since}
+
+    return [
+        ("list", lambda rng: ("GET", reverse("location_list"), {})),
+        ("list_deep_page", deep_page),
+        ("list_api", lambda rng: ("GET", reverse("location_list_api"), {})),
+        (
+            "detail_api",
+            lambda rng: (
+                "GET",
+                reverse("location_detail_api", args=[rng.choice(ids)]),
+                {},
+            ),
+        ),
+        ("markers", lambda rng: ("GET", reverse("location_markers"), _bbox(rng, 2))),
+        (
+            "markers_packed",
+            lambda rng: ("GET", reverse("location_markers_packed"), _bbox(rng, 2)),
+        ),
+        (
+            "clusters",
+            lambda rng: (
+                "GET",
+                reverse("location_clusters"),
+                {**_bbox(rng, 40), "zoom": 4},
+            ),
+        ),
+        ("changes", recent_changes),
+        ("nearest", lambda rng: ("GET", reverse("location_nearest"), _point(rng))),
+        (
+            "within",
+            lambda rng: (
+                "GET",
+                reverse("location_within"),
+                {**_point(rng), "radius_m": 20_000},
+            ),
+        ),
+        (
+            "export_bbox",
+            lambda rng: (
+                "GET",
+                reverse("location_export"),
+                {**_bbox(rng, 1), "format": "ndjson"},
+            ),
+        ),
+        (
+            "create",
+            lambda rng: (
+                "POST",
+                reverse("location_create"),
+                _form(rng, f"Created {rng.random()}"),
+            ),
+        ),
+        (
+            "batch",
+            lambda rng: (
+                "POST",
+                reverse("location_batch"),
+                _batch(rng, BATCH_SIZE),
+            ),
+        ),
+        (
+            "update",
+            lambda rng: (
+                "POST",
+                reverse("location_update", args=[rng.choice(update_ids)]),
+                _form(rng, f"Updated {rng.random()}"),
+            ),
+        ),
+        (
+            "delete",
+            lambda rng: (
+                "POST",
+                reverse("location_delete", args=[delete_ids.pop()]),
+                {},
+            ),
+        ),
+    ]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def run_scenario(client, make_request, count, seed):
+    from django.db import connection
+
+    from mapping.middleware import QueryRecorder
+
+    rng = random.Random(seed)
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(count):
+        method, url, data = make_request(rng)
+        recorder = QueryRecorder()
+        request_started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            if method == "GET":
+                response = client.get(url, data)
+            elif isinstance(data, str):
+                response = client.post(url, data, "application/json")
+            else:
+                response = client.post(url, data)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        queries.append(recorder.count)
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": count,
+        "errors": errors,
+        "requests_per_second": round(count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_per_request": round(sum(queries) / count, 2),
+        "max_queries": max(queries),
+    }
+
+
+def run_case(args, size, distribution):
+    if not args.cache:
+        os.environ["DJANGO_CACHE_BACKEND"] = (
+            "django.core.cache.backends.dummy.DummyCache"
+        )
+    setup_django(database=args.database)
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from mapping.models import Location
+    from mapping.pagination import encode_cursor
+
+    setup_test_environment()
+    with test_database():
+        seed_seconds = seed_locations(size, distribution)
+        rng = random.Random(args.seed)
+        ids = list(Location.objects.values_list("id", flat=True))
+        # Enough distinct ids for every detail, update and delete request.
+        ids = rng.sample(ids, min(len(ids), 2 * args.requests))
+        cursors = [
+            encode_cursor(name, pk)
+            for pk, name in Location.objects.filter(id__in=ids).values_list(
+                "id", "name"
+            )
+        ]
+        counts = {"delete": min(args.requests, len(ids) - len(ids) // 2)}
+
+        client = Client()
+        views = {}
+        scenarios = build_scenarios(ids, cursors)
+        for index, (name, make_request) in enumerate(scenarios):
+            if args.views and name not in args.views:
+                continue
+            views[name] = run_scenario(
+                client,
+                make_request,
+                counts.get(name, args.requests),
+                args.seed + index,
+            )
+        return {
+            "size": size,
+            "distribution": distribution,
+            "database": connection.vendor,
+            "seed_seconds": round(seed_seconds, 2),
+            "peak_rss_mb": peak_rss_mb(),
+            "views": views,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--distributions", default="clustered,uniform")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--views", help="Comma-separated subset of views to run.")
+    parser.add_argument(
+        "--database", choices=["sqlite", "postgresql"], default="sqlite"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache", action="store_true", help="Leave the response cache enabled."
+    )
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.views = set(args.views.split(",")) if args.views else None
+
+    if args.case:
+        size, distribution = args.case.split(":")
+        print(json.dumps(run_case(args, int(size), distribution)))
+        return
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests_per_view": args.requests,
+        "cache": args.cache,
+        "cases": [],
+    }
+    # Each case gets a fresh process so its peak RSS is its own.
+    passthrough = [
+        f"--requests={args.requests}",
+        f"--database={args.database}",
+        f"--seed={args.seed}",
+    ]
+    if args.views:
+        passthrough.append(f"--views={','.join(args.views)}")
+    if args.cache:
+        passthrough.append("--cache")
+    for size in args.sizes.split(","):
+        for distribution in args.distributions.split(","):
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", *passthrough]
+                + ["--case", f"{size}:{distribution}"],
+                cwd=BASE_DIR,
+                stdout=subprocess.PIPE,
+                check=True,
+                text=True,
+            )
+            case = json.loads(result.stdout.strip().splitlines()[-1])
+            report["cases"].append(case)
+            print(
+                f"{size} {distribution}: done in {case['seed_seconds']}s seed, "
+                f"{case['peak_rss_mb']} MB peak",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare the in-memory KD-tree against a plain ORM scan for nearest and
+radius queries.
+
+    python -m benchmarks.spatial_index --points 100000 --queries 200
+"""
+
+import argparse
+import heapq
+import json
+import time
+
+from .common import (
+    percentile,
+    random_points,
+    seed_locations,
+    setup_django,
+    test_database,
+)
+
+
+def orm_nearest(latitude, longitude, k):
+    from mapping.models import Location
+    from mapping.spatial import haversine_m
+
+    rows = Location.objects.values_list("id", "latitude", "longitude").iterator(
+        chunk_size=10000
+    )
+    return heapq.nsmallest(
+        k, ((haversine_m(latitude, longitude, lat, lng), pk) for pk, lat, lng in rows)
+    )
+
+
+def orm_within(latitude, longitude, radius_m):
+    from mapping.models import Location
+    from mapping.spatial import haversine_m
+
+    rows = Location.objects.values_list("id", "latitude", "longitude").iterator(
+        chunk_size=10000
+    )
+    return sorted(
+        (distance, pk)
+        for distance, pk in (
+            (haversine_m(latitude, longitude, lat, lng), pk) for pk, lat, lng in rows
+        )
+        if distance <= radius_m
+    )
+
+
+def timed(function, queries, *args):
+    samples = []
+    for latitude, longitude in queries:
+        started = time.perf_counter()
+        function(latitude, longitude, *args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p95_ms": round(percentile(samples, 0.95), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--orm-queries", type=int, default=10)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-m", type=float, default=25_000)
+    parser.add_argument(
+        "--distribution", choices=["uniform", "clustered"], default="clustered"
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    from mapping.spatial import SpatialIndex
+
+    with test_database():
+        seed_seconds = seed_locations(args.points, args.distribution)
+        queries = list(random_points(args.queries, args.distribution, seed=1))
+
+        index = SpatialIndex()
+        started = time.perf_counter()
+        index.nearest(0, 0, 1)
+        build_seconds = time.perf_counter() - started
+
+        orm_queries = queries[: args.orm_queries]
+        results = {
+            "points": args.points,
+            "distribution": args.distribution,
+            "seed_seconds": round(seed_seconds, 2),
+            "index_build_seconds": round(build_seconds, 2),
+            "nearest": {
+                "index": timed(index.nearest, queries, args.k),
+                "orm_scan": timed(orm_nearest, orm_queries, args.k),
+            },
+            "within": {
+                "index": timed(index.within, queries, args.radius_m),
+                "orm_scan": timed(orm_within, orm_queries, args.radius_m),
+            },
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 ASGI config for django_overview project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (e.g. ``uvicorn config.asgi:application``) for
+the async views and the live event stream at /mapping/events/, which is
+refused under WSGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -0,0 +1,27 @@
+"""
+Per-connection database setup.
+
+``configure_sqlite`` is a ``connection_created`` receiver that applies the
+SQLITE_PRAGMAS setting to every new SQLite connection. The defaults switch
+to write-ahead logging, so readers no longer block the writer, relax fsyncs
+to ``synchronous=NORMAL`` (safe under WAL), wait on a busy database instead
+of failing and memory-map the file for reads.
+"""
+
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not name.isidentifier() or not str(value).isalnum():
+                raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+            cursor.execute(f"PRAGMA {name} = {value}")
+    logger.debug("Configured SQLite connection %s: %s", connection.alias, pragmas)
@@ -0,0 +1,157 @@
+"""
+Logging helpers used by the LOGGING setting.
+
+``QueueListenerHandler`` takes records off the request thread: records are
+put on an in-memory queue and a background ``QueueListener`` thread passes
+them to the real (file and console) handlers, so a slow disk no longer adds
+to request latency. ``configure`` is the LOGGING_CONFIG callable that puts
+it in front of the configured handlers. ``SamplingFilter`` keeps
+high-volume DEBUG records from flooding that queue.
+"""
+
+import logging
+import logging.config
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# The DEBUG sample rate used outside development, see resolve_sample_rates.
+PRODUCTION_SAMPLE_RATE = 10
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass one in every ``rate`` records at or below ``level``.
+
+    Counting is per call site (logger name and line number), so the first
+    record from each site always gets through and a rare debug message is
+    never sampled away by a chatty one. Records above ``level`` always pass.
+    """
+
+    def __init__(self, rate=1, level="DEBUG"):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        if isinstance(level, str):
+            level = logging.getLevelNamesMapping()[level]
+        self.level = level
+        self._counts = {}
+
+    def filter(self, record):
+        if self.rate == 1 or record.levelno > self.level:
+            return True
+        site = (record.name, record.lineno)
+        # A lost update under contention only shifts which record is kept.
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        return count % self.rate == 0
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler that feeds ``handlers`` from a background QueueListener.
+
+    The listener is started lazily on the first record, so a worker forked
+    after settings are loaded gets its own thread. When the queue is full
+    the record is dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.handlers = list(handlers)
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.listener = QueueListener(
+                self.queue, *self.handlers, respect_handler_level=True
+            )
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def close(self):
+        # logging.shutdown() closes handlers newest first, so the queue is
+        # drained here before the target handlers are closed.
+        with self._start_lock:
+            if self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = self._pid = None
+        super().close()
+
+
+def queue_handlers(logger_names, queue_size=10000):
+    """
+    Put the handlers of each named logger behind a QueueListenerHandler.
+
+    Loggers with the same handlers share one queue. Filters that every one
+    of those handlers has (debug sampling, say) move to the queue handler,
+    so they still run exactly once per record and dropped records are
+    never queued.
+    """
+    queues = {}
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        if not logger.handlers:
+            continue
+        key = tuple(logger.handlers)
+        if key not in queues:
+            shared = [f for f in key[0].filters if all(f in h.filters for h in key[1:])]
+            for handler in key:
+                for f in shared:
+                    handler.removeFilter(f)
+            queue_handler = QueueListenerHandler(key, queue_size)
+            for f in shared:
+                queue_handler.addFilter(f)
+            queues[key] = queue_handler
+        logger.handlers = [queues[key]]
+
+
+def resolve_sample_rates(filters, debug):
+    """
+    Return the ``filters`` config with every ``"rate": None`` replaced by
+    1 when ``debug`` is set and PRODUCTION_SAMPLE_RATE otherwise.
+    """
+    return {
+        name: (
+            {**options, "rate": 1 if debug else PRODUCTION_SAMPLE_RATE}
+            if "rate" in options and options["rate"] is None
+            else options
+        )
+        for name, options in filters.items()
+    }
+
+
+def configure(config):
+    """
+    LOGGING_CONFIG callable: apply ``config`` with dictConfig, then, if it
+    has a ``"queue"`` section (keyword arguments for ``queue_handlers``),
+    move its loggers' handlers behind a queue.
+
+    Sampling rates left as None are resolved here from the final DEBUG
+    setting, so an environment's settings module that only overrides DEBUG
+    still gets the matching rate.
+    """
+    from django.conf import settings
+
+    config = dict(config)
+    config["filters"] = resolve_sample_rates(config.get("filters", {}), settings.DEBUG)
+    queue_options = config.pop("queue", None)
+    logging.config.dictConfig(config)
+    if queue_options is not None:
+        queue_handlers(config.get("loggers", {}), **queue_options)
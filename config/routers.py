@@ -0,0 +1,137 @@
+"""
+Read replicas for the mapping app.
+
+``PrimaryReplicaRouter`` sends reads of mapping models to one of the
+DATABASE_REPLICAS aliases and every write to ``default``. With no replicas
+configured everything stays on ``default``.
+
+Replicas lag behind the primary, so reads go to the primary instead when
+they have to see the latest data:
+
+* inside a transaction on the primary;
+* for the rest of a request once it has written;
+* during POST and other unsafe requests, which read rows in order to
+  change them;
+* for DATABASE_PRIMARY_STICKY_SECONDS after a client's write, so the page
+  it is redirected to shows its own change. ``PrimaryStickinessMiddleware``
+  keeps track of this with a short-lived cookie.
+
+Reads whose results outlive the request, such as the change feed, the
+in-memory indexes and cached tiles, name ``default`` with ``using()`` and
+never reach the router.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ROUTED_APP_LABELS = {"mapping"}
+STICKY_COOKIE = "use_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+
+class RoutingState:
+    """What the router knows about the current request."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar("database_routing_state", default=None)
+
+
+def replicas_enabled():
+    return bool(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def pinned_to_primary():
+    state = _state.get()
+    return state is not None and (state.pinned or state.wrote)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        replicas = getattr(settings, "DATABASE_REPLICAS", ())
+        if (
+            not replicas
+            or pinned_to_primary()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, "DATABASE_REPLICAS", ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Keep a client's reads on the primary while its writes may not have
+    reached the replicas yet. Does nothing unless replicas are configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        pinned = request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES
+        return _state.set(RoutingState(pinned=pinned))
+
+    def finish(self, token, response):
+        state = _state.get()
+        _state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_PRIMARY_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas_enabled():
+            return self.get_response(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _state.reset(token)
+            raise
+        return self.finish(token, response)
+
+    async def __acall__(self, request):
+        if not replicas_enabled():
+            return await self.get_response(request)
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _state.reset(token)
+            raise
+        return self.finish(token, response)
@@ -45,7 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mapping.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "config.staticfiles.StaticFilesMiddleware",
+    "config.routers.PrimaryStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -82,6 +85,52 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections between requests. Opening one runs the pragmas
+        # below, and closing the last one checkpoints the WAL file.
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_SQLITE_CONN_MAX_AGE", 600)),
+        "OPTIONS": {
+            # Take the write lock when a transaction starts. A deferred
+            # transaction that reads and then writes can't wait for the lock
+            # under WAL and fails with "database is locked" straight away.
+            "transaction_mode": os.environ.get(
+                "DJANGO_SQLITE_TRANSACTION_MODE", "IMMEDIATE"
+            ),
+        },
+    }
+}
+
+# Aliases in DATABASES that replicate "default"; config.routers sends
+# Location reads to them. Empty keeps every query on "default".
+DATABASE_REPLICAS = [
+    alias
+    for alias in os.environ.get("DJANGO_DATABASE_REPLICAS", "").split(",")
+    if alias
+]
+DATABASE_ROUTERS = ["config.routers.PrimaryReplicaRouter"]
+# How long a client that has just written reads from the primary, and how
+# long after a change responses aren't cached. Should cover replica lag.
+DATABASE_PRIMARY_STICKY_SECONDS = int(
+    os.environ.get("DJANGO_DATABASE_PRIMARY_STICKY_SECONDS", 5)
+)
+
+# Applied to every new SQLite connection by config.db.configure_sqlite.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("DJANGO_SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": os.environ.get("DJANGO_SQLITE_SYNCHRONOUS", "normal"),
+    "busy_timeout": int(os.environ.get("DJANGO_SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("DJANGO_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "mapping"),
     }
 }
 
@@ -124,11 +173,118 @@ STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Serve STATIC_ROOT from the app (config.staticfiles.StaticFilesMiddleware).
+# Off in development, where runserver serves the source files instead.
+SERVE_STATIC = os.environ.get("DJANGO_SERVE_STATIC", str(not DEBUG)) == "True"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+
+# Mapping app settings
+
+# Upper bound on the number of markers returned for a single map viewport.
+MAPPING_MARKER_LIMIT = int(os.environ.get("MAPPING_MARKER_LIMIT", 5000))
+# The same bound for the packed binary endpoint, at 12 bytes per point.
+MAPPING_PACKED_MARKER_LIMIT = int(
+    os.environ.get("MAPPING_PACKED_MARKER_LIMIT", 500_000)
+)
+
+# Cache alias and lifetime for responses cached against the data version.
+# The in-memory indexes also watch the version to catch up with edits made
+# by other processes, so with more than one worker this must be a shared
+# cache (Redis, Memcached, database), not the per-process LocMem default.
+MAPPING_CACHE_ALIAS = os.environ.get("MAPPING_CACHE_ALIAS", "default")
+MAPPING_RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get("MAPPING_RESPONSE_CACHE_TIMEOUT", 3600)
+)
+
+# Number of locations per page in the sidebar and the list API.
+MAPPING_PAGE_SIZE = int(os.environ.get("MAPPING_PAGE_SIZE", 50))
+MAPPING_MAX_PAGE_SIZE = int(os.environ.get("MAPPING_MAX_PAGE_SIZE", 500))
+# Rows the admin changelist counts exactly; larger tables show an estimate.
+MAPPING_ADMIN_COUNT_LIMIT = int(os.environ.get("MAPPING_ADMIN_COUNT_LIMIT", 10000))
+
+# Above this zoom level the cluster endpoint returns individual markers.
+MAPPING_CLUSTER_MAX_ZOOM = int(os.environ.get("MAPPING_CLUSTER_MAX_ZOOM", 16))
+# Width of a cluster grid cell in screen pixels.
+MAPPING_CLUSTER_CELL_SIZE = int(os.environ.get("MAPPING_CLUSTER_CELL_SIZE", 64))
+
+# Rows fetched per database round trip when streaming an export.
+MAPPING_EXPORT_CHUNK_SIZE = int(os.environ.get("MAPPING_EXPORT_CHUNK_SIZE", 2000))
+
+# Limits for the nearest-neighbour and radius search endpoints.
+MAPPING_NEAREST_MAX_K = int(os.environ.get("MAPPING_NEAREST_MAX_K", 100))
+MAPPING_WITHIN_MAX_RADIUS_M = float(
+    os.environ.get("MAPPING_WITHIN_MAX_RADIUS_M", 100_000)
+)
+
+# Locations closer than this with names at least this similar (0-1, as
+# difflib ratios) are reported as likely duplicates.
+MAPPING_DUPLICATE_RADIUS_M = float(os.environ.get("MAPPING_DUPLICATE_RADIUS_M", 50))
+MAPPING_DUPLICATE_NAME_SIMILARITY = float(
+    os.environ.get("MAPPING_DUPLICATE_NAME_SIMILARITY", 0.85)
+)
+
+# Vector tiles are cached on disk; bump the version when the tile format changes.
+MAPPING_TILE_CACHE_DIR = os.environ.get(
+    "MAPPING_TILE_CACHE_DIR", str(BASE_DIR / "tilecache")
+)
+MAPPING_TILE_CACHE_VERSION = 2
+MAPPING_TILE_MAX_ZOOM = int(os.environ.get("MAPPING_TILE_MAX_ZOOM", 18))
+# Tiles below this zoom level hold cluster counts instead of every location.
+MAPPING_TILE_CLUSTER_ZOOM = int(os.environ.get("MAPPING_TILE_CLUSTER_ZOOM", 10))
+
+# Raster base map proxy. The upstream is a URL template with {z}, {x} and {y};
+# fetched tiles are kept on disk up to the byte limit, least recently used
+# first out, and served with a max-age of MAPPING_BASEMAP_MAX_AGE seconds.
+MAPPING_BASEMAP_UPSTREAM = os.environ.get(
+    "MAPPING_BASEMAP_UPSTREAM", "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+)
+MAPPING_BASEMAP_CACHE_DIR = os.environ.get(
+    "MAPPING_BASEMAP_CACHE_DIR", str(BASE_DIR / "basemapcache")
+)
+MAPPING_BASEMAP_CACHE_MAX_BYTES = int(
+    os.environ.get("MAPPING_BASEMAP_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+MAPPING_BASEMAP_MAX_ZOOM = int(os.environ.get("MAPPING_BASEMAP_MAX_ZOOM", 19))
+MAPPING_BASEMAP_MAX_AGE = int(os.environ.get("MAPPING_BASEMAP_MAX_AGE", 7 * 86400))
+MAPPING_BASEMAP_TIMEOUT = float(os.environ.get("MAPPING_BASEMAP_TIMEOUT", 10))
+# Tile servers such as OpenStreetMap's require an identifying User-Agent.
+MAPPING_BASEMAP_USER_AGENT = os.environ.get(
+    "MAPPING_BASEMAP_USER_AGENT", "django_overview basemap proxy"
+)
+
+# Largest number of operations accepted by the batch write endpoint.
+MAPPING_BATCH_MAX_OPERATIONS = int(os.environ.get("MAPPING_BATCH_MAX_OPERATIONS", 5000))
+
+# Rows and deletions per page of the incremental sync endpoint.
+MAPPING_CHANGES_PAGE_SIZE = int(os.environ.get("MAPPING_CHANGES_PAGE_SIZE", 5000))
+
+# Live event stream (mapping.events). LocalBackend only reaches clients of the
+# process that made the change; with several server processes use
+# mapping.events.ChangesBackend, which polls the change sequence instead.
+MAPPING_EVENTS_BACKEND = os.environ.get(
+    "MAPPING_EVENTS_BACKEND", "mapping.events.LocalBackend"
+)
+MAPPING_EVENTS_POLL_INTERVAL = float(
+    os.environ.get("MAPPING_EVENTS_POLL_INTERVAL", 1.0)
+)
+# Seconds between keep-alive comments on an idle stream.
+MAPPING_EVENTS_HEARTBEAT = float(os.environ.get("MAPPING_EVENTS_HEARTBEAT", 15))
+# Locations a client may fall behind by before it is told to resync.
+MAPPING_EVENTS_MAX_PENDING = int(os.environ.get("MAPPING_EVENTS_MAX_PENDING", 1000))
+# Open streams allowed per process; more are refused with a 503.
+MAPPING_EVENTS_MAX_CLIENTS = int(os.environ.get("MAPPING_EVENTS_MAX_CLIENTS", 10000))
+
+# Upper bound for the limit parameter of the search endpoint.
+MAPPING_SEARCH_MAX_RESULTS = int(os.environ.get("MAPPING_SEARCH_MAX_RESULTS", 100))
+
+# Requests running more queries than this are logged as likely N+1 patterns
+MAPPING_QUERY_BUDGET = int(os.environ.get("MAPPING_QUERY_BUDGET", 20))
+
 log_dir = BASE_DIR / "logs"
 log_dir.mkdir(exist_ok=True)
 
@@ -181,3 +337,28 @@ LOGGING = {
         },
     },
 }
+
+# Hand records to a background thread (config.log.QueueListenerHandler) so
+# console and file I/O stay off the request path. Set DJANGO_LOG_QUEUE=False
+# to write synchronously, e.g. when debugging the logging setup itself.
+LOG_QUEUE = os.environ.get("DJANGO_LOG_QUEUE", "True") == "True"
+# Keep one in this many DEBUG records from each call site. Unset, it is
+# chosen from the final DEBUG setting by config.log.configure: all of them
+# in development, one in ten otherwise.
+LOG_DEBUG_SAMPLE_RATE = os.environ.get("DJANGO_LOG_DEBUG_SAMPLE_RATE")
+if LOG_DEBUG_SAMPLE_RATE is not None:
+    LOG_DEBUG_SAMPLE_RATE = int(LOG_DEBUG_SAMPLE_RATE)
+
+LOGGING["filters"] = {
+    "sample_debug": {
+        "()": "config.log.SamplingFilter",
+        "rate": LOG_DEBUG_SAMPLE_RATE,
+    },
+}
+for handler_config in LOGGING["handlers"].values():
+    handler_config["filters"] = ["sample_debug"]
+LOGGING_CONFIG = "config.log.configure"
+if LOG_QUEUE:
+    # The sampling filter moves in front of the queue, so records it drops
+    # are never formatted or queued.
+    LOGGING["queue"] = {"queue_size": 10000}
@@ -9,7 +9,7 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 # Use SQLite for development
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        **DATABASES["default"],
         "NAME": "db.sqlite3",
     }
 }
@@ -16,13 +16,49 @@ DATABASES = {
         "PASSWORD": os.environ.get("DB_PASSWORD"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": os.environ.get("DB_PORT", "5432"),
-        "CONN_MAX_AGE": 60,
+        # Connections come from the pool below; persistent connections
+        # can't be combined with it.
+        "CONN_MAX_AGE": 0,
+        # Pooled connections are checked before being handed out, so ones
+        # dropped by the server or a proxy are replaced instead of failing.
+        "CONN_HEALTH_CHECKS": True,
         "OPTIONS": {
-            "MAX_CONNS": 20,
+            # psycopg 3 connection pool, one per process.
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 20)),
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+            },
         },
     }
 }
 
+# Streaming read replicas of the primary, one alias per host. Location
+# reads go to them through config.routers.PrimaryReplicaRouter.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Content-hashed, precompressed static files for collectstatic
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "config.staticfiles.CompressedManifestStaticFilesStorage",
+    },
+}
+SERVE_STATIC = os.environ.get("DJANGO_SERVE_STATIC", "True") == "True"
+
 # Security settings
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -0,0 +1,230 @@
+"""
+Precompressed, content-hashed static files served by the app itself.
+
+``CompressedManifestStaticFilesStorage`` is ManifestStaticFilesStorage that
+also writes a ``.gz`` copy (and a ``.br`` copy when the optional ``brotli``
+package is installed) of every compressible file during ``collectstatic``.
+
+``StaticFilesMiddleware`` serves STATIC_ROOT without a CDN or web server in
+front. It picks the smallest precompressed copy the client accepts, so no
+compression happens per request, and marks content-hashed names as
+``immutable`` for a year, so browsers don't revalidate them. Files are
+indexed once, on first use, because collectstatic only runs at deploy time.
+"""
+
+import gzip
+import logging
+import mimetypes
+import os
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css",
+    ".js",
+    ".json",
+    ".map",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".html",
+    ".ttf",
+    ".otf",
+    ".eot",
+}
+# A compressed copy is only kept if it is smaller than this share of the original.
+MIN_RATIO = 0.95
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+
+def _compressors():
+    compressors = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressors.append((".br", lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # Plain names are served too, so compress both copies.
+        for name in sorted(hashed | set(paths)):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self._compress(name)
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) >= len(data) * MIN_RATIO:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+def accepted_encodings(header):
+    """Return the content codings with a non-zero q-value in Accept-Encoding."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    """A file under STATIC_ROOT and its precompressed copies."""
+
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    def __init__(self, path, immutable):
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type in (
+            "application/javascript",
+            "application/json",
+        ):
+            self.content_type += "; charset=utf-8"
+        stat = os.stat(path)
+        self.last_modified = http_date(stat.st_mtime)
+        self.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.variants = [(None, path, stat.st_size)]
+        for encoding, suffix in self.ENCODINGS:
+            if os.path.isfile(path + suffix):
+                size = os.path.getsize(path + suffix)
+                self.variants.append((encoding, path + suffix, size))
+        # Smallest first, so the best accepted copy is the first match.
+        self.variants.sort(key=lambda variant: variant[2])
+
+    def choose(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, path, size in self.variants:
+            if encoding is None or encoding in accepted:
+                return encoding, path, size
+
+    def response(self, request):
+        encoding, path, size = self.choose(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        etag = self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, "rb"), content_type=self.content_type)
+            response["Content-Length"] = str(size)
+            if encoding is not None:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Last-Modified"] = self.last_modified
+        response["Cache-Control"] = IMMUTABLE if self.immutable else REVALIDATE
+        if len(self.variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serve files collected into STATIC_ROOT under STATIC_URL.
+
+    Enabled by the SERVE_STATIC setting. Place it right after
+    SecurityMiddleware so static responses skip sessions, CSRF and
+    authentication. Names that aren't in STATIC_ROOT fall through to the
+    rest of the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVE_STATIC", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = "/" + settings.STATIC_URL.lstrip("/")
+        self.root = str(settings.STATIC_ROOT)
+        self._files = None
+        self._lock = threading.Lock()
+
+    def files(self):
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._files = self.scan()
+        return self._files
+
+    def scan(self):
+        """Index every servable file under STATIC_ROOT by its relative name."""
+        manifest = getattr(staticfiles_storage, "hashed_files", {})
+        hashed = set(manifest.values())
+        suffixes = {suffix for _, suffix in StaticFile.ENCODINGS}
+        files = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                base, extension = os.path.splitext(path)
+                if extension in suffixes and os.path.isfile(base):
+                    continue
+                files[name] = StaticFile(path, immutable=name in hashed)
+        logger.info(
+            "Indexed %d static files in %s (%d hashed)",
+            len(files),
+            self.root,
+            len(hashed),
+        )
+        return files
+
+    def find(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        if not request.path_info.startswith(self.prefix):
+            return None
+        return self.files().get(request.path_info[len(self.prefix) :])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.find(request)
+        if static_file is not None:
+            return static_file.response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            return static_file.response(request)
+        return await self.get_response(request)
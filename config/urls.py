@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.shortcuts import redirect
 from django.urls import include, path
 
+from mapping.views import metrics
+
 
 def redirect_to_mapping(request):
     return redirect("location_list")
@@ -10,5 +12,6 @@ def redirect_to_mapping(request):
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("mapping/", include("mapping.urls")),
+    path("metrics", metrics, name="metrics"),
     path("", redirect_to_mapping, name="home"),
 ]
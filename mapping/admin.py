@@ -1,5 +1,145 @@
-from django.contrib import admin
+"""
+Admin for Location tables too large to count, search or delete row by row.
 
+* The changelist shows the planner's row estimate instead of running
+  ``COUNT(*)`` (see ``EstimatedCountPaginator``) and never counts the
+  unfiltered table next to a filtered one.
+* Search goes through the full-text index from mapping.search.
+* Regions, or any ``south,west,north,east`` box, filter through the
+  latitude/longitude index.
+* Bulk actions run as one statement each, however many rows are selected;
+  derived state is reset once through ``locations_bulk_changed``.
+"""
+
+import logging
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import model_ngettext
+from django.db import router, transaction
+from django.template.response import TemplateResponse
+
+from . import search
+from .geo import BBOX_PARAMS, bbox_q, parse_bbox
 from .models import Location
+from .pagination import EstimatedCountPaginator
+from .signals import locations_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+
+def _send_bulk_changed(using):
+    transaction.on_commit(
+        lambda: locations_bulk_changed.send(sender=Location), using=using
+    )
+
+
+class BoundingBoxFilter(admin.SimpleListFilter):
+    """Filter by region; the value can be any ``south,west,north,east`` box."""
+
+    title = "region"
+    parameter_name = "bbox"
+    REGIONS = [
+        ("North America", (7.0, -168.0, 84.0, -52.0)),
+        ("South America", (-56.0, -82.0, 13.0, -34.0)),
+        ("Europe", (35.0, -25.0, 72.0, 45.0)),
+        ("Africa", (-35.0, -18.0, 38.0, 52.0)),
+        ("Asia", (-11.0, 45.0, 81.0, 180.0)),
+        ("Oceania", (-50.0, 110.0, 0.0, 180.0)),
+    ]
+
+    def lookups(self, request, model_admin):
+        return [
+            (",".join(str(value) for value in bbox), name)
+            for name, bbox in self.REGIONS
+        ]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            bbox = parse_bbox(dict(zip(BBOX_PARAMS, self.value().split(","))))
+        except ValueError as e:
+            raise IncorrectLookupParameters(e)
+        return queryset.filter(bbox_q(bbox))
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ["name", "latitude", "longitude", "updated_at"]
+    list_filter = [BoundingBoxFilter]
+    # The name column is backed by the (name, id) index.
+    sortable_by = ["name"]
+    readonly_fields = ["geohash", "change_seq", "updated_at"]
+    search_fields = ["name", "description"]
+    search_help_text = "Words in the name or description; each matches as a prefix."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    actions = ["delete_in_bulk", "resend_to_clients"]
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search.match_q(search_term, queryset.db)), False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Loads, lists and signals every selected row; delete_in_bulk doesn't.
+        actions.pop("delete_selected", None)
+        return actions
+
+    @admin.action(permissions=["delete"], description="Delete selected locations")
+    def delete_in_bulk(self, request, queryset):
+        """
+        Delete the selection with one DELETE after a confirmation page.
+
+        Unlike the built-in action the rows aren't listed or loaded, and no
+        admin log entry is written per row.
+        """
+        select_across = request.POST.get("select_across") == "1"
+        if request.POST.get("post"):
+            using = router.db_for_write(Location)
+            with transaction.atomic(using=using):
+                deleted = queryset.using(using).delete_in_bulk()
+                _send_bulk_changed(using)
+            logger.info("User %s deleted %d locations in bulk", request.user, deleted)
+            self.message_user(
+                request,
+                f"Deleted {deleted} {model_ngettext(self.opts, deleted)}.",
+                messages.SUCCESS,
+            )
+            return None
+
+        count = queryset.count()
+        return TemplateResponse(
+            request,
+            "admin/mapping/location/delete_in_bulk_confirmation.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Are you sure?",
+                "opts": self.opts,
+                "count": count,
+                "objects_name": model_ngettext(self.opts, count),
+                "select_across": select_across,
+                "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+                "media": self.media,
+            },
+        )
 
-admin.site.register(Location)
+    @admin.action(
+        permissions=["change"], description="Resend selected locations to clients"
+    )
+    def resend_to_clients(self, request, queryset):
+        """Give the selection new change numbers so sync clients fetch it again."""
+        using = router.db_for_write(Location)
+        with transaction.atomic(using=using):
+            updated = queryset.using(using).update()
+            _send_bulk_changed(using)
+        self.message_user(
+            request,
+            f"Marked {updated} {model_ngettext(self.opts, updated)} as changed.",
+            messages.SUCCESS,
+        )
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class MappingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mapping"
+
+    def ready(self):
+        from config.db import configure_sqlite
+
+        from . import signals  # noqa: F401
+        from .search import ensure_installed
+
+        post_migrate.connect(ensure_installed, sender=self)
+        connection_created.connect(configure_sqlite)
@@ -0,0 +1,205 @@
+"""
+Async counterparts of the read-only views, for deployments served over ASGI.
+
+Queries go through Django's async ORM (``aget`` and async iteration).
+In Django 5.1 each of those calls still runs the query through
+``sync_to_async`` on a thread-pool thread, so a slow query holds a
+thread just as it would under WSGI. Only the request between queries is
+a coroutine: the thread pool limits concurrent queries, not concurrent
+connections, and slow clients and open event streams hold no thread.
+Validation, serialisation and the response cache are shared with the
+sync views in ``views``.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import render
+
+from .cache import cache_by_data_version
+from .events import broker
+from .export import EXPORT_FORMATS, ExportEncoder, accepts_gzip, aiter_export
+from .geo import parse_bbox
+from .models import Location
+from .pagination import apaginate_keyset
+from .views import (
+    _export_query,
+    _export_response,
+    _location_dict,
+    _markers_from_rows,
+    _viewport_query,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@cache_by_data_version
+async def location_list(request):
+    user = await request.auser()
+    logger.info("Accessing async location list view - User: %s", user)
+    try:
+        page = await apaginate_keyset(
+            Location.objects.all(),
+            settings.MAPPING_PAGE_SIZE,
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
+    except ValueError as e:
+        logger.warning("Invalid location list cursor: %s", e)
+        return HttpResponseBadRequest(str(e))
+    # The page is already loaded; rendering runs in a thread only because
+    # context processors may touch the session or user lazily.
+    return await sync_to_async(render)(
+        request,
+        "mapping/location_list.html",
+        {"locations": page, "page": page},
+    )
+
+
+@cache_by_data_version
+async def location_list_api(request):
+    """Return one keyset-paginated page of locations as JSON."""
+    try:
+        limit = int(request.GET.get("limit", settings.MAPPING_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer")
+        page = await apaginate_keyset(
+            Location.objects.all(),
+            min(limit, settings.MAPPING_MAX_PAGE_SIZE),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
+    except ValueError as e:
+        logger.warning("Invalid location list API request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(
+        {
+            "results": [_location_dict(location) for location in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+async def location_detail_api(request, pk):
+    """Return a single location as JSON."""
+    try:
+        location = await Location.objects.aget(pk=pk)
+    except Location.DoesNotExist:
+        raise Http404("No Location matches the given query.")
+    return JsonResponse(_location_dict(location))
+
+
+@cache_by_data_version
+async def location_markers(request):
+    """Return the markers that fall inside the map's current viewport."""
+    try:
+        bbox = parse_bbox(request.GET)
+    except ValueError as e:
+        logger.warning("Invalid marker bounding box: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = [row async for row in _viewport_query(bbox)]
+    markers, truncated = _markers_from_rows(rows)
+    logger.debug("Returning %s markers for %s", len(markers), bbox)
+    return JsonResponse({"markers": markers, "truncated": truncated})
+
+
+async def _aiter_id_chunks(queryset, chunk_size):
+    """
+    Iterate an id-ordered values_list queryset in keyset slices of
+    ``chunk_size`` rows.
+
+    ``aiterator()`` on a values_list() queryset opens its cursor in the
+    event loop thread on Django 5.1 and fails, so rows are fetched in
+    bounded slices instead; each slice is one indexed range scan.
+    """
+    chunk = queryset[:chunk_size]
+    while True:
+        rows = [row async for row in chunk]
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        chunk = queryset.filter(id__gt=rows[-1][0])[:chunk_size]
+
+
+async def location_export(request):
+    """Stream locations as GeoJSON, CSV or NDJSON from an async iterator."""
+    fmt = request.GET.get("format", "geojson")
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unsupported export format: {fmt}")
+
+    try:
+        rows = _aiter_id_chunks(
+            _export_query(request.GET), settings.MAPPING_EXPORT_CHUNK_SIZE
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    compress = accepts_gzip(request)
+    content = aiter_export(ExportEncoder(fmt, compress), rows)
+    logger.info("Streaming async %s export (gzip=%s)", fmt, compress)
+    return _export_response(fmt, compress, content)
+
+
+# How long browsers wait before reconnecting a dropped event stream.
+EVENTS_RETRY_MS = 5000
+
+
+async def _event_stream():
+    subscription = broker.subscribe()
+    try:
+        # Sent at once so the client knows the stream is open.
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        while True:
+            events = await subscription.get(settings.MAPPING_EVENTS_HEARTBEAT)
+            if not events:
+                # Keeps proxies from timing out idle streams and notices
+                # clients that went away without closing.
+                yield ": keep-alive\n\n"
+                continue
+            yield "".join(f"data: {event.data}\n\n" for event in events)
+    finally:
+        subscription.close()
+
+
+async def location_events(request):
+    """
+    Stream Location creates, updates and deletes as Server-Sent Events.
+
+    Each event is a JSON object with a ``type`` of ``created``, ``updated``
+    or ``deleted`` and the location's ``id``, plus its name and coordinates
+    unless deleted. ``resync`` means changes were missed and the client
+    should catch up through the changes endpoint. See mapping.events.
+
+    An open stream is a coroutine waiting on the broker, so it needs the
+    ASGI application in config/asgi.py; a WSGI worker would be tied up for
+    as long as the client stayed connected.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(
+            "The event stream is only served over ASGI.",
+            status=501,
+            content_type="text/plain",
+        )
+    if broker.subscriber_count >= settings.MAPPING_EVENTS_MAX_CLIENTS:
+        logger.warning("Refusing event stream: %d open", broker.subscriber_count)
+        response = HttpResponse(status=503)
+        response["Retry-After"] = str(EVENTS_RETRY_MS // 1000)
+        return response
+    response = StreamingHttpResponse(_event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
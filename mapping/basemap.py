@@ -0,0 +1,207 @@
+"""
+Caching proxy for the raster base map.
+
+Tiles are fetched from MAPPING_BASEMAP_UPSTREAM (by default OpenStreetMap)
+and kept on disk as ``<dir>/z/x/y.png`` in a cache bounded to
+MAPPING_BASEMAP_CACHE_MAX_BYTES. The least recently used tiles are evicted
+first; a hit refreshes the file's mtime so the order survives restarts.
+Concurrent requests for the same missing tile share one upstream fetch.
+
+Each process keeps its own view of the cache, built by scanning the
+directory on first use. A tile evicted by another process is simply
+fetched again.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """The upstream tile server failed or timed out."""
+
+
+class TileNotFound(Exception):
+    """The upstream tile server has no such tile."""
+
+
+class BasemapCache:
+    """Size-bounded on-disk LRU cache of base map tiles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None  # path -> size, least recently used first
+        self._size = 0
+        self._root = None
+
+    @property
+    def root(self):
+        return Path(settings.MAPPING_BASEMAP_CACHE_DIR)
+
+    def path(self, zoom, x, y):
+        return self.root / str(zoom) / str(x) / f"{y}.png"
+
+    def _load(self):
+        """Index the files already on disk, oldest first. Call with the lock."""
+        if self._entries is not None and self._root == self.root:
+            return
+        files = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".png"):
+                    stat = os.stat(os.path.join(directory, filename))
+                    files.append((stat.st_mtime, filename, directory, stat.st_size))
+        files.sort()
+        self._entries = OrderedDict(
+            (Path(directory) / filename, size) for _, filename, directory, size in files
+        )
+        self._size = sum(self._entries.values())
+        self._root = self.root
+        logger.info(
+            "Indexed %d cached basemap tiles (%d bytes) in %s",
+            len(self._entries),
+            self._size,
+            self._root,
+        )
+
+    def get(self, zoom, x, y):
+        path = self.path(zoom, x, y)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._load()
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process since the read.
+        return data
+
+    def set(self, zoom, x, y, data):
+        path = self.path(zoom, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it into place so readers never
+        # see a partially written tile.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            self._load()
+            self._size += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._evict()
+
+    def _evict(self):
+        limit = settings.MAPPING_BASEMAP_CACHE_MAX_BYTES
+        evicted = 0
+        while self._size > limit and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._size -= size
+            evicted += 1
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.debug("Evicted %d basemap tiles, %d bytes left", evicted, self._size)
+
+    @property
+    def size(self):
+        with self._lock:
+            self._load()
+            return self._size
+
+    def clear(self):
+        """Remove every cached tile."""
+        logger.info("Clearing basemap cache at %s", self.root)
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._entries = None
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+        else:
+            try:
+                call["result"] = function()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["done"].set()
+        if "error" in call:
+            raise call["error"]
+        return call["result"]
+
+
+basemap_cache = BasemapCache()
+_flights = SingleFlight()
+
+
+def fetch_upstream(zoom, x, y):
+    url = settings.MAPPING_BASEMAP_UPSTREAM.format(z=zoom, x=x, y=y)
+    request = urllib.request.Request(
+        url, headers={"User-Agent": settings.MAPPING_BASEMAP_USER_AGENT}
+    )
+    try:
+        with urllib.request.urlopen(
+            request, timeout=settings.MAPPING_BASEMAP_TIMEOUT
+        ) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            raise TileNotFound(url) from e
+        raise UpstreamError(f"{url} returned {e.code}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise UpstreamError(f"{url} failed: {e}") from e
+
+
+def get_tile(zoom, x, y):
+    """Return the PNG bytes for a tile from the cache or the upstream server."""
+    data = basemap_cache.get(zoom, x, y)
+    if data is not None:
+        return data
+
+    def fetch():
+        # Another request may have stored the tile since our cache check.
+        cached = basemap_cache.get(zoom, x, y)
+        if cached is not None:
+            return cached
+        logger.debug("Fetching basemap tile %s/%s/%s", zoom, x, y)
+        fetched = fetch_upstream(zoom, x, y)
+        basemap_cache.set(zoom, x, y, fetched)
+        return fetched
+
+    return _flights.do((zoom, x, y), fetch)
@@ -0,0 +1,193 @@
+"""
+Validate and apply many location writes in one transaction.
+
+A batch is a list of operations::
+
+    {"op": "create", "data": {"name": ..., "latitude": ..., ...}}
+    {"op": "update", "id": 7, "data": {"description": ...}}
+    {"op": "delete", "id": 9}
+
+Every operation is validated with LocationForm first; updates may give a
+subset of fields and keep the rest. If any operation is invalid nothing is
+written. Otherwise creates, updates and deletes are applied with one
+``bulk_create``, one ``bulk_update`` and one bulk delete inside a single
+transaction. The rows to update and delete are read again in it under a
+row lock, and an update only writes the fields it gave, so an edit made
+to other fields since validation is kept. After commit, locations_changed
+carries each row's old and new coordinates to the derived state, which
+is updated row by row as for single saves.
+"""
+
+import logging
+
+from django.db import transaction
+from django.forms.models import model_to_dict
+
+from .forms import LocationForm
+from .models import Location
+from .signals import locations_changed
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("create", "update", "delete")
+FIELDS = LocationForm._meta.fields
+
+
+class BatchError(ValueError):
+    """The batch as a whole is malformed (not a per-item validation error)."""
+
+
+def _error(index, op, errors):
+    return {"index": index, "op": op, "status": "invalid", "errors": errors}
+
+
+def validate(operations, max_operations):
+    """
+    Check every operation; return ``(plan, results, ok)``.
+
+    ``plan`` maps each operation type to entries ready to apply: ``(index,
+    location)`` for creates, ``(index, pk, fields)`` for updates, with the
+    cleaned values of just the fields given, and ``(index, pk)`` for
+    deletes. ``results`` has one entry per operation and ``ok`` is False if
+    any entry is an error. Raises BatchError for a malformed batch.
+    """
+    if not isinstance(operations, list):
+        raise BatchError("'operations' must be a list")
+    if not operations:
+        raise BatchError("'operations' must not be empty")
+    if len(operations) > max_operations:
+        raise BatchError(f"At most {max_operations} operations per batch")
+
+    # Updates and deletes are looked up in one query.
+    ids = [
+        item.get("id")
+        for item in operations
+        if isinstance(item, dict) and isinstance(item.get("id"), int)
+    ]
+    existing = Location.objects.in_bulk(ids)
+
+    plan = {op: [] for op in OPERATIONS}
+    results = []
+    seen = set()
+    for index, item in enumerate(operations):
+        op = item.get("op") if isinstance(item, dict) else None
+        if op not in OPERATIONS:
+            results.append(_error(index, op, {"op": [f"Must be one of {OPERATIONS}"]}))
+            continue
+
+        location = None
+        if op != "create":
+            pk = item.get("id")
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                results.append(_error(index, op, {"id": ["An integer id is required"]}))
+                continue
+            if pk in seen:
+                results.append(
+                    _error(index, op, {"id": ["Location appears twice in the batch"]})
+                )
+                continue
+            seen.add(pk)
+            location = existing.get(pk)
+            if location is None:
+                results.append(_error(index, op, {"id": ["Location not found"]}))
+                continue
+
+        if op == "delete":
+            plan[op].append((index, pk))
+            results.append({"index": index, "op": op, "status": "deleted", "id": pk})
+            continue
+
+        data = item.get("data")
+        if not isinstance(data, dict):
+            results.append(_error(index, op, {"data": ["An object is required"]}))
+            continue
+        given = data
+        if location is not None:
+            data = {**model_to_dict(location, fields=FIELDS), **data}
+        form = LocationForm(data=data, instance=location)
+        if not form.is_valid():
+            errors = {field: list(messages) for field, messages in form.errors.items()}
+            results.append(_error(index, op, errors))
+            continue
+        if location is None:
+            plan[op].append((index, form.save(commit=False)))
+        else:
+            values = {f: form.cleaned_data[f] for f in FIELDS if f in given}
+            plan[op].append((index, pk, values))
+        results.append(
+            {
+                "index": index,
+                "op": op,
+                "status": "created" if op == "create" else "updated",
+                "id": None if location is None else location.pk,
+            }
+        )
+
+    ok = all(result["status"] != "invalid" for result in results)
+    return plan, results, ok
+
+
+def apply(plan, results):
+    """
+    Write a validated plan in one transaction; fill in created ids.
+
+    Returns ``(results, ok)``. ``ok`` is False, and nothing is written, if a
+    location to update was deleted after validation; its result says so.
+    """
+    created = [location for _, location in plan["create"]]
+    changes = []
+
+    with transaction.atomic():
+        ids = [entry[1] for op in ("update", "delete") for entry in plan[op]]
+        current = Location.objects.select_for_update().in_bulk(ids)
+        missing = [index for index, pk, _ in plan["update"] if pk not in current]
+        if missing:
+            for index in missing:
+                results[index] = _error(
+                    index, "update", {"id": ["Location was deleted meanwhile"]}
+                )
+            return results, False
+
+        updated, fields = [], set()
+        for _, pk, values in plan["update"]:
+            location = current[pk]
+            previous = (location.latitude, location.longitude)
+            for field, value in values.items():
+                setattr(location, field, value)
+            fields.update(values)
+            updated.append(location)
+            changes.append(
+                (pk, location.name, previous, (location.latitude, location.longitude))
+            )
+        # A location deleted meanwhile is already gone.
+        deleted = [current[pk] for _, pk in plan["delete"] if pk in current]
+        changes.extend(
+            (location.pk, None, (location.latitude, location.longitude), None)
+            for location in deleted
+        )
+
+        if created:
+            Location.objects.bulk_create(created)
+        if updated and fields:
+            Location.objects.bulk_update(updated, sorted(fields))
+        if deleted:
+            Location.objects.filter(
+                pk__in=[location.pk for location in deleted]
+            ).delete_in_bulk()
+        changes.extend(
+            (location.pk, location.name, None, (location.latitude, location.longitude))
+            for location in created
+        )
+        transaction.on_commit(
+            lambda: locations_changed.send(sender=Location, changes=changes)
+        )
+
+    for index, location in plan["create"]:
+        results[index]["id"] = location.pk
+    logger.info(
+        "Applied batch: %d created, %d updated, %d deleted",
+        len(created),
+        len(updated),
+        len(deleted),
+    )
+    return results, True
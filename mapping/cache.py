@@ -0,0 +1,198 @@
+import functools
+import hashlib
+import logging
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "mapping:data-version"
+LAST_MODIFIED_KEY = "mapping:data-last-modified"
+
+# The most recent versions this process bumped to, so in-memory state can
+# tell its own changes, which it has already applied, from other processes'.
+_own_versions = deque(maxlen=1000)
+
+
+def _cache():
+    return caches[settings.MAPPING_CACHE_ALIAS]
+
+
+def _initialise():
+    # Seed a fresh counter from the clock so a counter lost to eviction or a
+    # restart can never come back with a value that was already handed out.
+    version, now = time.time_ns(), int(time.time())
+    cache = _cache()
+    if cache.add(VERSION_KEY, version, timeout=None):
+        cache.set(LAST_MODIFIED_KEY, now, timeout=None)
+    return cache.get(VERSION_KEY, version), cache.get(LAST_MODIFIED_KEY, now)
+
+
+def get_data_version():
+    """Return ``(version, last_modified_timestamp)`` for Location data."""
+    values = _cache().get_many([VERSION_KEY, LAST_MODIFIED_KEY])
+    if VERSION_KEY not in values or LAST_MODIFIED_KEY not in values:
+        return _initialise()
+    return values[VERSION_KEY], values[LAST_MODIFIED_KEY]
+
+
+def bump_data_version():
+    """Mark Location data as changed; every versioned response goes stale."""
+    cache = _cache()
+    try:
+        version = cache.incr(VERSION_KEY)
+        _own_versions.append(version)
+    except ValueError:
+        version, _ = _initialise()
+    cache.set(LAST_MODIFIED_KEY, int(time.time()), timeout=None)
+    logger.debug("Location data version is now %s", version)
+    return version
+
+
+class DataVersionWatch:
+    """
+    Notice Location changes committed by other processes.
+
+    The in-memory indexes apply this process's edits as they commit but
+    never hear of edits made by other workers. ``changed_elsewhere()``
+    reads the shared data version and returns True when it has moved by
+    more than this process's own bumps since the last call or ``start()``.
+    Like the response cache, this relies on MAPPING_CACHE_ALIAS being
+    shared between the processes.
+    """
+
+    def __init__(self):
+        self._seen = None
+
+    def start(self):
+        """Note the current version; call just before loading from the database."""
+        self._seen = get_data_version()[0]
+
+    def changed_elsewhere(self):
+        current = get_data_version()[0]
+        seen, self._seen = self._seen, current
+        if seen is None or current == seen:
+            return False
+        if 0 < current - seen <= len(_own_versions):
+            own = set(_own_versions)
+            return not all(version in own for version in range(seen + 1, current + 1))
+        return True
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if header is None:
+        return None
+    # If-None-Match compares weakly; GZipMiddleware makes ETags weak.
+    return header.strip() == "*" or etag in (
+        tag.strip().removeprefix("W/") for tag in header.split(",")
+    )
+
+
+def _cached_response(request):
+    """
+    Return ``(response, etag, last_modified, key)`` for a GET request.
+
+    ``response`` is a 304 or a stored body when one can be served, else None
+    and the caller runs the view and hands the result to ``_store``.
+    """
+    version, last_modified = get_data_version()
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    etag = f'"{version}-{path_hash}"'
+    key = f"mapping:response:{version}:{path_hash}"
+
+    matched = _etag_matches(request, etag)
+    if matched is None:
+        # Last-Modified only has whole seconds, and several versions can
+        # share one; a client holding any of them sends the same date. Only
+        # a date strictly after the version's time proves it is current.
+        since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        matched = since is not None and last_modified < since
+    if matched:
+        return HttpResponseNotModified(), etag, last_modified, key
+
+    cached = _cache().get(key)
+    if cached is not None:
+        content, content_type = cached
+        return (
+            HttpResponse(content, content_type=content_type),
+            etag,
+            last_modified,
+            key,
+        )
+    return None, etag, last_modified, key
+
+
+def _settled(last_modified):
+    """
+    Whether read replicas can be assumed to have the latest change. Until
+    then a response may have been built from older data, so it's neither
+    stored nor given an ETag that would make clients keep it.
+    """
+    if not getattr(settings, "DATABASE_REPLICAS", ()):
+        return True
+    return time.time() - last_modified > settings.DATABASE_PRIMARY_STICKY_SECONDS
+
+
+def _store(response, key, last_modified):
+    if response.status_code != 200 or response.streaming or not _settled(last_modified):
+        return False
+    _cache().set(
+        key,
+        (response.content, response["Content-Type"]),
+        timeout=settings.MAPPING_RESPONSE_CACHE_TIMEOUT,
+    )
+    return True
+
+
+def _finalise(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cache_by_data_version(view):
+    """
+    Cache a GET view's response under the current data version.
+
+    The ETag is derived from the data version and the request path, so a
+    matching If-None-Match (or, without one, an If-Modified-Since later than
+    the version's time) is answered with 304 from two cache reads, without running the view or touching the
+    database. Otherwise the stored body for this version is served, and only
+    on a miss does the view run. Works on both sync and async views.
+    """
+    if iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+            response, etag, last_modified, key = _cached_response(request)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if not _store(response, key, last_modified):
+                    return response
+            return _finalise(response, etag, last_modified)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        response, etag, last_modified, key = _cached_response(request)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if not _store(response, key, last_modified):
+                return response
+        return _finalise(response, etag, last_modified)
+
+    return wrapper
@@ -0,0 +1,166 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import DataVersionWatch
+from .geo import TILE_SIZE, normalize_longitude, project
+
+logger = logging.getLogger(__name__)
+
+
+class GridClusterIndex:
+    """
+    Per-zoom grid of marker clusters, kept in memory and updated incrementally.
+
+    Every zoom level is a dict mapping a (column, row) grid cell to a running
+    ``[count, latitude_sum, longitude_sum]``. Cells are ``cell_size`` pixels
+    wide, so the world doubles in cells with each zoom level and a cell at
+    zoom ``z - 1`` is simply the cell at zoom ``z`` shifted right by one bit.
+    That lets the whole pyramid be built from the deepest level and lets a
+    single point be added or removed with one cell lookup per level.
+
+    Cells don't record which locations they hold, so an edit made by another
+    process can't be applied in place: when a query notices the shared data
+    version has moved for that reason, the index is rebuilt.
+    """
+
+    def __init__(self, max_zoom, cell_size):
+        self.max_zoom = max_zoom
+        self.cell_size = cell_size
+        self._levels = None
+        self._watch = DataVersionWatch()
+        self._lock = threading.RLock()
+
+    def _cell(self, latitude, longitude):
+        x, y = project(latitude, longitude, self.max_zoom)
+        cells = (TILE_SIZE << self.max_zoom) // self.cell_size
+        column = min(int(x // self.cell_size), cells - 1)
+        row = min(int(y // self.cell_size), cells - 1)
+        return column, row
+
+    def _load(self):
+        from .models import Location
+
+        self._watch.start()
+        deepest = {}
+        # From the primary: the index is kept until the next invalidation,
+        # so a lagging replica's rows would outlive the lag.
+        rows = (
+            Location.objects.using(DEFAULT_DB_ALIAS)
+            .order_by()
+            .values_list("latitude", "longitude")
+        )
+        for latitude, longitude in rows.iterator(chunk_size=10000):
+            stats = deepest.setdefault(self._cell(latitude, longitude), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += latitude
+            stats[2] += longitude
+
+        levels = [None] * (self.max_zoom + 1)
+        levels[self.max_zoom] = deepest
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            level = {}
+            for (column, row), (count, lat_sum, lng_sum) in levels[zoom + 1].items():
+                stats = level.setdefault((column >> 1, row >> 1), [0, 0.0, 0.0])
+                stats[0] += count
+                stats[1] += lat_sum
+                stats[2] += lng_sum
+            levels[zoom] = level
+        logger.info(
+            "Built cluster index with %s cells at zoom %s", len(deepest), self.max_zoom
+        )
+        return levels
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._levels is not None and self._watch.changed_elsewhere():
+                logger.info("Locations changed in another process; reloading")
+                self._levels = None
+            if self._levels is None:
+                self._levels = self._load()
+            return self._levels
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt from the database on next use."""
+        with self._lock:
+            self._levels = None
+
+    def _apply(self, latitude, longitude, delta):
+        column, row = self._cell(latitude, longitude)
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (column >> shift, row >> shift)
+            level = self._levels[zoom]
+            stats = level.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += delta
+            stats[1] += delta * latitude
+            stats[2] += delta * longitude
+            if stats[0] <= 0:
+                del level[key]
+
+    def add(self, latitude, longitude):
+        with self._lock:
+            if self._levels is not None:
+                self._apply(latitude, longitude, 1)
+
+    def remove(self, latitude, longitude):
+        with self._lock:
+            if self._levels is not None:
+                self._apply(latitude, longitude, -1)
+
+    def _column_ranges(self, bbox, zoom):
+        cells = (TILE_SIZE << zoom) // self.cell_size
+        span = bbox.east - bbox.west
+        if span >= 360:
+            return [(0, cells - 1)]
+        west = normalize_longitude(bbox.west)
+        east = west + span
+        first = int(project(0, west, zoom)[0] // self.cell_size)
+        if east <= 180:
+            last = int(project(0, east, zoom)[0] // self.cell_size)
+            return [(first, min(last, cells - 1))]
+        last = int(project(0, east - 360, zoom)[0] // self.cell_size)
+        return [(first, cells - 1), (0, last)]
+
+    def query(self, bbox, zoom):
+        """Return ``(latitude, longitude, count)`` for each cluster in ``bbox``."""
+        zoom = max(0, min(zoom, self.max_zoom))
+        levels = self._ensure_loaded()
+        with self._lock:
+            level = levels[zoom]
+            cells = (TILE_SIZE << zoom) // self.cell_size
+            top = int(project(bbox.north, 0, zoom)[1] // self.cell_size)
+            bottom = min(
+                int(project(bbox.south, 0, zoom)[1] // self.cell_size), cells - 1
+            )
+            columns = self._column_ranges(bbox, zoom)
+
+            visible = sum(last - first + 1 for first, last in columns) * (
+                bottom - top + 1
+            )
+            if visible <= len(level):
+                found = (
+                    level.get((column, row))
+                    for first, last in columns
+                    for column in range(first, last + 1)
+                    for row in range(top, bottom + 1)
+                )
+            else:
+                found = (
+                    stats
+                    for (column, row), stats in level.items()
+                    if top <= row <= bottom
+                    and any(first <= column <= last for first, last in columns)
+                )
+            return [
+                (lat_sum / count, lng_sum / count, count)
+                for count, lat_sum, lng_sum in (stats for stats in found if stats)
+            ]
+
+
+cluster_index = GridClusterIndex(
+    max_zoom=settings.MAPPING_CLUSTER_MAX_ZOOM,
+    cell_size=settings.MAPPING_CLUSTER_CELL_SIZE,
+)
@@ -0,0 +1,195 @@
+"""
+Near-duplicate detection: two locations are duplicates when they are
+within a radius of each other and their normalized names are similar.
+
+A single point is checked against the rows in its geohash cell and the
+eight around it, with the precision chosen so a cell is at least the
+radius across; that is a handful of index range scans, never a table scan.
+Close to the poles a thin latitude band is read instead.
+The whole table is grouped the same way in one pass: points go into a
+grid of cubes on the unit sphere, each a chord of the radius wide, so only
+points in the same or adjacent cubes are ever compared, and matches are
+joined into clusters with union-find.
+"""
+
+import difflib
+import logging
+import math
+import unicodedata
+from array import array
+
+from django.conf import settings
+
+from . import geohash
+from .spatial import EARTH_RADIUS_M, haversine_m, metres_to_chord, to_unit_vector
+
+logger = logging.getLogger(__name__)
+
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# Offsets to half of the 26 neighbouring cubes; the other half see each
+# pair from the opposite side, so every pair of cubes is visited once.
+FORWARD_OFFSETS = [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+
+def normalize_name(name):
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    chars = (
+        char if char.isalnum() else " "
+        for char in decomposed
+        if not unicodedata.combining(char)
+    )
+    return " ".join("".join(chars).split())
+
+
+def names_similar(a, b, threshold):
+    """Whether two normalized names have a similarity ratio of ``threshold``."""
+    if a == b:
+        return True
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    # The cheap upper bounds reject most pairs before the full comparison.
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+def search_precision(latitude, radius_m):
+    """
+    Return the finest geohash precision whose cells are at least
+    ``radius_m`` across near ``latitude``.
+    """
+    # Cells narrow towards the poles; size them for the poleward edge.
+    edge = min(90.0, abs(latitude) + radius_m / METRES_PER_DEGREE)
+    shrink = math.cos(math.radians(edge))
+    for precision in range(geohash.MAX_PRECISION, 0, -1):
+        height, width = geohash.cell_size(precision)
+        if min(height, width * shrink) * METRES_PER_DEGREE >= radius_m:
+            return precision
+    return 1
+
+
+def _nearby(queryset, latitude, longitude, radius_m):
+    """
+    Narrow ``queryset`` to a superset of the rows within ``radius_m``.
+
+    That is normally the point's geohash cell and its eight neighbours.
+    Near a pole the cells get too coarse, and the neighbours stop at the
+    pole instead of continuing across it. So when the radius reaches the
+    pole, or a latitude band round the globe is smaller than the nine
+    cells, the band is read instead, through the latitude index.
+    """
+    span = radius_m / METRES_PER_DEGREE
+    south, north = latitude - span, latitude + span
+    precision = search_precision(latitude, radius_m)
+    height, width = geohash.cell_size(precision)
+    if north >= 90 or south <= -90 or 2 * span * 360 <= 9 * height * width:
+        return queryset.filter(
+            latitude__gte=max(south, -90.0), latitude__lte=min(north, 90.0)
+        )
+    return queryset.near_geohash(geohash.encode(latitude, longitude, precision))
+
+
+def find_near_duplicates(
+    queryset, name, latitude, longitude, radius_m=None, threshold=None
+):
+    """
+    Return ``(location, distance_m)`` pairs from ``queryset`` within
+    ``radius_m`` of the point whose names are similar to ``name``, nearest
+    first.
+    """
+    if radius_m is None:
+        radius_m = settings.MAPPING_DUPLICATE_RADIUS_M
+    if threshold is None:
+        threshold = settings.MAPPING_DUPLICATE_NAME_SIMILARITY
+    target = normalize_name(name)
+    found = []
+    nearby = _nearby(queryset, latitude, longitude, radius_m)
+    for location in nearby.only("name", "latitude", "longitude"):
+        distance = haversine_m(
+            latitude, longitude, location.latitude, location.longitude
+        )
+        if distance <= radius_m and names_similar(
+            target, normalize_name(location.name), threshold
+        ):
+            found.append((location, distance))
+    found.sort(key=lambda pair: pair[1])
+    return found
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parent = array("q", range(size))
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The smaller index wins, so a cluster's root is its oldest row.
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_duplicate_clusters(rows, radius_m, threshold):
+    """
+    Group ``(id, name, latitude, longitude)`` rows into duplicate clusters.
+
+    Returns a list of id lists, each with two or more ids in the order the
+    rows were given. Matching is transitive: A and C share a cluster when
+    both match B, even if they don't match each other.
+    """
+    chord = metres_to_chord(radius_m)
+    max_squared = chord * chord
+    ids, names, xs, ys, zs = array("q"), [], array("d"), array("d"), array("d")
+    cubes = {}
+    for index, (pk, name, latitude, longitude) in enumerate(rows):
+        x, y, z = to_unit_vector(latitude, longitude)
+        ids.append(pk)
+        names.append(normalize_name(name))
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+        key = (math.floor(x / chord), math.floor(y / chord), math.floor(z / chord))
+        cubes.setdefault(key, []).append(index)
+    logger.info("Bucketed %d locations into %d cubes", len(ids), len(cubes))
+
+    clusters = _DisjointSet(len(ids))
+
+    def compare(i, j):
+        dx, dy, dz = xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]
+        if dx * dx + dy * dy + dz * dz > max_squared:
+            return
+        if clusters.find(i) != clusters.find(j) and names_similar(
+            names[i], names[j], threshold
+        ):
+            clusters.union(i, j)
+
+    for (cx, cy, cz), members in cubes.items():
+        for position, i in enumerate(members):
+            for j in members[position + 1 :]:
+                compare(i, j)
+        for dx, dy, dz in FORWARD_OFFSETS:
+            others = cubes.get((cx + dx, cy + dy, cz + dz))
+            if others:
+                for i in members:
+                    for j in others:
+                        compare(i, j)
+
+    groups = {}
+    for index in range(len(ids)):
+        groups.setdefault(clusters.find(index), []).append(ids[index])
+    return [group for group in groups.values() if len(group) > 1]
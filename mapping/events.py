@@ -0,0 +1,313 @@
+"""
+Live Location change events for map clients.
+
+``broker`` fans events out to every open event stream in this process.
+Each stream holds a ``Subscription``: a small buffer read from the stream's
+event loop. Events are coalesced per location, so a client that falls
+behind receives the latest state of each location rather than every step,
+and a client more than MAPPING_EVENTS_MAX_PENDING locations behind gets a
+single ``resync`` event telling it to catch up through the changes
+endpoint instead. Idle streams cost one waiting coroutine each; an event
+reaches an event loop's subscribers through one ``call_soon_threadsafe``,
+however many there are.
+
+Where events come from is up to MAPPING_EVENTS_BACKEND:
+
+* ``LocalBackend`` hands events published in this process straight to the
+  broker. It suits a single server process and tests.
+* ``ChangesBackend`` reads changes from the database through mapping.sync,
+  so every process sees changes made by any other. One thread per process
+  polls while it has subscribers.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils.module_loading import import_string
+
+from .templatetags.location_tags import format_coordinates
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"type": "resync"}
+
+
+def location_event(event_type, pk, name, latitude, longitude):
+    return {
+        "type": event_type,
+        "id": pk,
+        "name": name,
+        "lat": latitude,
+        "lng": longitude,
+        "coordinates": format_coordinates(latitude, longitude),
+    }
+
+
+def deleted_event(pk):
+    return {"type": "deleted", "id": pk}
+
+
+class Event:
+    """A published event, encoded once and shared by every subscriber."""
+
+    __slots__ = ("payload", "type", "key", "data")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.type = payload["type"]
+        # Events coalesce per location; a resync stands for everything.
+        self.key = payload.get("id", self.type)
+        self.data = json.dumps(payload)
+
+    def __repr__(self):
+        return f"<Event {self.data}>"
+
+
+def _merge(pending, event):
+    """Add ``event`` to ``pending`` (key -> Event), one event per location."""
+    if "resync" in pending:
+        return  # The client will reload everything anyway.
+    if event.type == "resync":
+        pending.clear()
+    else:
+        # A later event for the same location replaces the earlier one,
+        # except that an update to a location the client hasn't been told
+        # about yet is still a create.
+        previous = pending.pop(event.key, None)
+        if previous is not None and (previous.type, event.type) == (
+            "created",
+            "updated",
+        ):
+            event = Event({**event.payload, "type": "created"})
+    pending[event.key] = event
+
+
+class Subscription:
+    """Events waiting to be sent to one client. Use from its event loop only."""
+
+    def __init__(self, broker, loop, max_pending):
+        self.broker = broker
+        self.loop = loop
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, event):
+        pending = self._pending
+        if (
+            event.key not in pending
+            and len(pending) >= self.max_pending
+            and "resync" not in pending
+        ):
+            self.dropped += len(pending) + 1
+            logger.info(
+                "Event subscriber fell %d changes behind; sending resync",
+                len(pending) + 1,
+            )
+            event = Event(RESYNC)
+        _merge(pending, event)
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Return the pending events, waiting up to ``timeout`` seconds for one."""
+        if not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Fan events out to the subscriptions of every event loop in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # event loop -> set of Subscription
+        self._outboxes = {}  # event loop -> events not yet handed over
+        self._count = 0
+        self._backend = None
+        self._backend_path = None
+
+    @property
+    def backend(self):
+        path = settings.MAPPING_EVENTS_BACKEND
+        with self._lock:
+            if self._backend_path != path:
+                if self._backend is not None:
+                    self._backend.stop()
+                self._backend = import_string(path)(self)
+                self._backend_path = path
+                if self._count:
+                    self._backend.start()
+            return self._backend
+
+    @property
+    def subscriber_count(self):
+        return self._count
+
+    def subscribe(self):
+        """Open a subscription on the running event loop."""
+        backend = self.backend
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, loop, settings.MAPPING_EVENTS_MAX_PENDING)
+        with self._lock:
+            self._subscriptions.setdefault(loop, set()).add(subscription)
+            self._count += 1
+            first = self._count == 1
+        if first:
+            backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.loop, set())
+            if subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.loop]
+            self._count -= 1
+            last = self._count == 0
+            backend = self._backend
+        if last and backend is not None:
+            backend.stop()
+
+    def publish(self, event):
+        """Announce a committed change through the configured backend."""
+        self.backend.publish(event)
+
+    def dispatch(self, *payloads):
+        """
+        Deliver events to every subscription. Safe from any thread.
+
+        Events for a loop collect in its outbox until the loop gets to them,
+        so a burst costs one wake-up and is coalesced once for all of the
+        loop's subscribers.
+        """
+        events = [Event(payload) for payload in payloads]
+        wake = []
+        with self._lock:
+            for loop in self._subscriptions:
+                outbox = self._outboxes.get(loop)
+                if outbox is None:
+                    outbox = self._outboxes[loop] = OrderedDict()
+                    wake.append(loop)
+                for event in events:
+                    _merge(outbox, event)
+        for loop in wake:
+            try:
+                loop.call_soon_threadsafe(self._deliver, loop)
+            except RuntimeError:
+                # The loop has closed; its streams are gone.
+                with self._lock:
+                    self._outboxes.pop(loop, None)
+
+    def _deliver(self, loop):
+        # Runs on ``loop``, the only thread that adds to or removes from its set.
+        with self._lock:
+            events = list(self._outboxes.pop(loop, {}).values())
+        for subscription in list(self._subscriptions.get(loop, ())):
+            for event in events:
+                subscription.push(event)
+
+
+class LocalBackend:
+    """Deliver events published in this process to this process's clients."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, event):
+        self.broker.dispatch(event)
+
+
+class ChangesBackend:
+    """
+    Deliver changes made by any process, read from the change sequence.
+
+    Every MAPPING_EVENTS_POLL_INTERVAL seconds a background thread fetches
+    what changed since its last poll, so the database sees one query per
+    process rather than one per client. The sequence doesn't tell creates
+    from updates; both are sent as ``updated``.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def start(self):
+        with self._lock:
+            if self._stop is not None:
+                return
+            self._stop = threading.Event()
+            threading.Thread(
+                target=self._run,
+                args=(self._stop,),
+                name="location-events",
+                daemon=True,
+            ).start()
+
+    def stop(self):
+        with self._lock:
+            if self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def publish(self, event):
+        pass  # Every process reads the change from the database instead.
+
+    def _run(self, stop):
+        from .models import ChangeSequence
+
+        since = None
+        while True:
+            try:
+                if since is None:
+                    since = ChangeSequence.current()
+                else:
+                    since = self.poll(since)
+            except DatabaseError as e:
+                logger.warning("Polling for location changes failed: %s", e)
+            finally:
+                close_old_connections()
+            if stop.wait(settings.MAPPING_EVENTS_POLL_INTERVAL):
+                return
+
+    def poll(self, since):
+        """Dispatch everything changed after ``since``; return the new position."""
+        from .sync import changes_since
+
+        more = True
+        while more:
+            changes = changes_since(since, settings.MAPPING_CHANGES_PAGE_SIZE)
+            events = [RESYNC] if changes["reset"] else []
+            events += [location_event("updated", *row) for row in changes["rows"]] + [
+                deleted_event(pk) for pk in changes["deleted"]
+            ]
+            if events:
+                self.broker.dispatch(*events)
+            since, more = changes["seq"], changes["more"]
+        return since
+
+
+broker = Broker()
@@ -0,0 +1,129 @@
+import csv
+import json
+import zlib
+
+EXPORT_FIELDS = ("id", "name", "description", "latitude", "longitude")
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _feature(pk, name, description, latitude, longitude):
+    return _dumps(
+        {
+            "type": "Feature",
+            "id": pk,
+            "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+            "properties": {"name": name, "description": description},
+        }
+    )
+
+
+class _Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+_csv_row = csv.writer(_Echo()).writerow
+
+# format: (content type, file extension, header, row encoder, separator, footer)
+EXPORT_FORMATS = {
+    "geojson": (
+        "application/geo+json",
+        "geojson",
+        '{"type":"FeatureCollection","features":[',
+        lambda row: _feature(*row),
+        ",",
+        "]}\n",
+    ),
+    "csv": (
+        "text/csv; charset=utf-8",
+        "csv",
+        _csv_row(EXPORT_FIELDS),
+        _csv_row,
+        "",
+        "",
+    ),
+    "ndjson": (
+        "application/x-ndjson",
+        "ndjson",
+        "",
+        lambda row: _feature(*row) + "\n",
+        "",
+        "",
+    ),
+}
+
+
+class ExportEncoder:
+    """
+    Incrementally encode export rows into output blocks.
+
+    Rows are encoded one at a time, joined into roughly ``block_size``
+    characters and optionally gzip-compressed, so the same encoder can sit
+    behind a sync or an async row iterator. ``feed`` returns bytes when a
+    block is ready and ``b""`` otherwise; ``finish`` flushes the rest.
+    """
+
+    def __init__(self, fmt, compress=False, block_size=1 << 16, level=6):
+        _, _, header, self._encode, self._separator, self._footer = EXPORT_FORMATS[fmt]
+        self._block_size = block_size
+        self._parts = [header]
+        self._length = len(header)
+        self._prefix = ""
+        self._compressor = (
+            zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            if compress
+            else None
+        )
+
+    def _emit(self, final=False):
+        data = "".join(self._parts).encode()
+        self._parts, self._length = [], 0
+        if self._compressor is None:
+            return data
+        data = self._compressor.compress(data)
+        if final:
+            data += self._compressor.flush()
+        return data
+
+    def feed(self, row):
+        text = self._prefix + self._encode(row)
+        self._prefix = self._separator
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self._block_size:
+            return self._emit()
+        return b""
+
+    def finish(self):
+        self._parts.append(self._footer)
+        return self._emit(final=True)
+
+
+def iter_export(encoder, rows):
+    """Yield encoded blocks for a sync row iterator."""
+    for row in rows:
+        block = encoder.feed(row)
+        if block:
+            yield block
+    yield encoder.finish()
+
+
+async def aiter_export(encoder, rows):
+    """Yield encoded blocks for an async row iterator."""
+    async for row in rows:
+        block = encoder.feed(row)
+        if block:
+            yield block
+    yield encoder.finish()
+
+
+def accepts_gzip(request):
+    """Return True if the Accept-Encoding header allows gzip."""
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00")
+    return False
@@ -2,37 +2,89 @@ import logging
 
 from django import forms
 
+from .dedupe import find_near_duplicates
 from .models import Location
+from .validators import validate_latitude, validate_longitude
 
 logger = logging.getLogger(__name__)
 
 
 class LocationForm(forms.ModelForm):
+    save_anyway = forms.BooleanField(
+        required=False,
+        widget=forms.HiddenInput,
+        label="Save anyway",
+        help_text="Tick to save even though it looks like a duplicate.",
+    )
+
     class Meta:
         model = Location
         fields = ["name", "description", "latitude", "longitude"]
 
+    def __init__(self, *args, check_duplicates=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.check_duplicates = check_duplicates
+        self.duplicates = []
+
     def clean(self):
         cleaned_data = super().clean()
-        logger.debug(f"Cleaning form data: {cleaned_data}")
+        logger.debug("Cleaning form data: %s", cleaned_data)
+        if self.check_duplicates and not cleaned_data.get("save_anyway"):
+            self._check_duplicates(cleaned_data)
         return cleaned_data
 
+    def _check_duplicates(self, cleaned_data):
+        """
+        Refuse a likely duplicate until the user ticks "Save anyway".
+
+        Only the rows in the point's geohash neighbourhood are read.
+        """
+        name = cleaned_data.get("name")
+        latitude = cleaned_data.get("latitude")
+        longitude = cleaned_data.get("longitude")
+        if not name or latitude is None or longitude is None or self.errors:
+            return
+        if self.instance.pk is not None and not {
+            "name",
+            "latitude",
+            "longitude",
+        } & set(self.changed_data):
+            return
+        queryset = Location.objects.all()
+        if self.instance.pk is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        self.duplicates = find_near_duplicates(queryset, name, latitude, longitude)
+        if not self.duplicates:
+            return
+        logger.info("Possible duplicates of %s: %s", name, self.duplicates)
+        self.fields["save_anyway"].widget = forms.CheckboxInput()
+        raise forms.ValidationError(
+            "This looks like a duplicate of %(matches)s.",
+            code="duplicate",
+            params={
+                "matches": ", ".join(
+                    f"{location.name} ({distance:.0f} m away)"
+                    for location, distance in self.duplicates[:5]
+                )
+            },
+        )
+
     def clean_latitude(self):
         latitude = self.cleaned_data.get("latitude")
         if latitude is not None:
-            if latitude < -90 or latitude > 90:
-                logger.warning(f"Invalid latitude value: {latitude}")
-                raise forms.ValidationError(
-                    "Latitude must be between -90 and 90 degrees"
-                )
+            try:
+                validate_latitude(latitude)
+            except forms.ValidationError:
+                logger.warning("Invalid latitude value: %s", latitude)
+                raise
         return latitude
 
     def clean_longitude(self):
         longitude = self.cleaned_data.get("longitude")
         if longitude is not None:
-            if longitude < -180 or longitude > 180:
-                logger.warning(f"Invalid longitude value: {longitude}")
-                raise forms.ValidationError(
-                    "Longitude must be between -180 and 180 degrees"
-                )
+            try:
+                validate_longitude(longitude)
+            except forms.ValidationError:
+                logger.warning("Invalid longitude value: %s", longitude)
+                raise
         return longitude
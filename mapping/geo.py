@@ -0,0 +1,131 @@
+import math
+from collections import namedtuple
+
+from django.db.models import Q
+
+BoundingBox = namedtuple("BoundingBox", ["south", "west", "north", "east"])
+
+BBOX_PARAMS = ("south", "west", "north", "east")
+
+# Web-mercator tiles are TILE_SIZE pixels square and stop at this latitude.
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798
+
+
+def normalize_longitude(longitude):
+    """Wrap a longitude into the [-180, 180) range."""
+    return ((longitude + 180.0) % 360.0) - 180.0
+
+
+def parse_bbox(params):
+    """
+    Build a BoundingBox from a mapping holding south/west/north/east values.
+
+    Longitudes may come straight from Leaflet's ``map.getBounds()``, which
+    can run past +/-180 once the map has been panned across the antimeridian.
+    Raises ValueError if a value is missing, not finite or out of range.
+    """
+    try:
+        south, west, north, east = (float(params[key]) for key in BBOX_PARAMS)
+    except KeyError as e:
+        raise ValueError(f"Missing bounding box parameter: {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("Bounding box values must be numbers")
+
+    if not all(map(math.isfinite, (south, west, north, east))):
+        raise ValueError("Bounding box values must be finite numbers")
+    if not (-90 <= south <= 90 and -90 <= north <= 90):
+        raise ValueError("Latitude must be between -90 and 90 degrees")
+    if south > north:
+        raise ValueError("South must not be greater than north")
+    if east < west:
+        raise ValueError("East must not be less than west")
+    return BoundingBox(south, west, north, east)
+
+
+def bbox_q(bbox, lat_field="latitude", lng_field="longitude"):
+    """
+    Return a Q object selecting rows inside ``bbox``.
+
+    A box that crosses the antimeridian is split into two longitude ranges so
+    both halves can still use the latitude/longitude index.
+    """
+    q = Q(**{f"{lat_field}__gte": bbox.south, f"{lat_field}__lte": bbox.north})
+    span = bbox.east - bbox.west
+    if span >= 360:
+        return q
+
+    west = normalize_longitude(bbox.west)
+    east = west + span
+    if east <= 180:
+        return q & Q(**{f"{lng_field}__gte": west, f"{lng_field}__lte": east})
+    return q & (
+        Q(**{f"{lng_field}__gte": west}) | Q(**{f"{lng_field}__lte": east - 360})
+    )
+
+
+def longitude_ranges(bbox):
+    """
+    Return the ``(west, east)`` longitude ranges covered by ``bbox``, with
+    longitudes in [-180, 180]; two ranges if it crosses the antimeridian.
+    """
+    span = bbox.east - bbox.west
+    if span >= 360:
+        return [(-180.0, 180.0)]
+    west = normalize_longitude(bbox.west)
+    east = west + span
+    if east <= 180:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east - 360)]
+
+
+def project(latitude, longitude, zoom):
+    """Project a coordinate to web-mercator world pixels at ``zoom``."""
+    scale = TILE_SIZE * (1 << zoom)
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    x = (longitude + 180.0) / 360.0 * scale
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def tile_for(latitude, longitude, zoom):
+    """Return the (x, y) web-mercator tile containing a coordinate at ``zoom``."""
+    x, y = project(latitude, longitude, zoom)
+    last = (1 << zoom) - 1
+    return min(int(x // TILE_SIZE), last), min(int(y // TILE_SIZE), last)
+
+
+def tile_bbox(zoom, x, y):
+    """Return the BoundingBox covered by web-mercator tile ``zoom/x/y``."""
+    tiles = 1 << zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return BoundingBox(
+        south=latitude(y + 1),
+        west=x / tiles * 360.0 - 180.0,
+        north=latitude(y),
+        east=(x + 1) / tiles * 360.0 - 180.0,
+    )
+
+
+def tiles_containing(latitude, longitude, zoom):
+    """
+    Return every tile at ``zoom`` whose bounds contain a coordinate.
+
+    Tile bounds are inclusive, as in ``bbox_q``, so a point on an edge or
+    corner is in two or four tiles; ``tile_for`` only picks one of them.
+    """
+    x, y = tile_for(latitude, longitude, zoom)
+    last = (1 << zoom) - 1
+    tiles = []
+    for tx in range(max(0, x - 1), min(last, x + 1) + 1):
+        for ty in range(max(0, y - 1), min(last, y + 1) + 1):
+            bbox = tile_bbox(zoom, tx, ty)
+            if bbox.south <= latitude <= bbox.north and any(
+                west <= longitude <= east for west, east in longitude_ranges(bbox)
+            ):
+                tiles.append((tx, ty))
+    return tiles
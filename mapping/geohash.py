@@ -0,0 +1,145 @@
+"""
+Geohash encoding and the prefix arithmetic used to query a geohash column.
+
+A geohash interleaves longitude and latitude bits and writes them five at a
+time in a base-32 alphabet, so every prefix names a rectangular cell and
+all points inside that cell share the prefix. The alphabet is in ascending
+ASCII order, which means the rows in a cell form one contiguous range of a
+B-tree index: ``prefix <= geohash < next_prefix(prefix)``.
+"""
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+DECODE = {char: i for i, char in enumerate(BASE32)}
+MAX_PRECISION = 12
+
+
+def encode(latitude, longitude, precision=MAX_PRECISION):
+    """Return the geohash of a coordinate at ``precision`` characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash):
+    """Return the (south, west, north, east) bounds of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for char in geohash:
+        value = DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a cell at ``precision``."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def neighbours(geohash):
+    """
+    Return the cell and its (up to) eight neighbours at the same precision.
+
+    Longitude wraps around the antimeridian; there is nothing beyond the
+    poles, so cells on the top or bottom row have fewer neighbours.
+    """
+    south, west, north, east = decode_bbox(geohash)
+    height, width = north - south, east - west
+    centre_lat, centre_lng = (south + north) / 2, (west + east) / 2
+    cells = []
+    for d_lat in (-height, 0, height):
+        latitude = centre_lat + d_lat
+        if not -90 < latitude < 90:
+            continue
+        for d_lng in (-width, 0, width):
+            longitude = (centre_lng + d_lng + 180) % 360 - 180
+            cell = encode(latitude, longitude, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def next_prefix(prefix):
+    """
+    Return the smallest string greater than every geohash starting with
+    ``prefix``, or None if there is none (the prefix is all ``z``).
+    """
+    chars = prefix.rstrip(BASE32[-1])
+    if not chars:
+        return None
+    return chars[:-1] + BASE32[DECODE[chars[-1]] + 1]
+
+
+def cover_bbox(south, west, north, east, max_cells=32):
+    """
+    Return geohash prefixes whose cells together cover a bounding box.
+
+    The finest precision that needs at most ``max_cells`` cells is used.
+    Boxes crossing the antimeridian should be split by the caller.
+    """
+    for precision in range(MAX_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = int((north + 90) // height) - int((south + 90) // height) + 1
+        columns = int((east + 180) // width) - int((west + 180) // width) + 1
+        if rows * columns <= max_cells:
+            break
+    else:
+        return [""]
+
+    height, width = cell_size(precision)
+    cells = []
+    latitude = south
+    while True:
+        longitude = west
+        while True:
+            cell = encode(min(latitude, north), min(longitude, east), precision)
+            if cell not in cells:
+                cells.append(cell)
+            if longitude >= east:
+                break
+            longitude = min(longitude + width, east)
+        if latitude >= north:
+            break
+        latitude = min(latitude + height, north)
+    return cells
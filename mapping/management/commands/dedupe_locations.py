@@ -0,0 +1,134 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mapping.dedupe import find_duplicate_clusters
+from mapping.models import Location
+from mapping.signals import locations_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Find clusters of nearby locations with similar names across the whole "
+        "table and, with --merge, merge each into its oldest row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--radius",
+            type=float,
+            default=settings.MAPPING_DUPLICATE_RADIUS_M,
+            help="Maximum distance in metres between duplicates "
+            "(default: MAPPING_DUPLICATE_RADIUS_M).",
+        )
+        parser.add_argument(
+            "--similarity",
+            type=float,
+            default=settings.MAPPING_DUPLICATE_NAME_SIMILARITY,
+            help="Minimum name similarity between 0 and 1 "
+            "(default: MAPPING_DUPLICATE_NAME_SIMILARITY).",
+        )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Merge the clusters found. Without it nothing is changed.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Locations removed per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        if options["radius"] <= 0:
+            raise CommandError("--radius must be positive.")
+        if not 0 < options["similarity"] <= 1:
+            raise CommandError("--similarity must be between 0 and 1.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        started = time.perf_counter()
+        rows = (
+            Location.objects.order_by("pk")
+            .values_list("id", "name", "latitude", "longitude")
+            .iterator(chunk_size=10000)
+        )
+        clusters = find_duplicate_clusters(
+            rows, options["radius"], options["similarity"]
+        )
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Found %d duplicate clusters (%d duplicates) in %.2fs",
+            len(clusters),
+            duplicates,
+            elapsed,
+        )
+        if options["verbosity"] >= 2:
+            for cluster in clusters:
+                self.stdout.write(" ".join(str(pk) for pk in cluster))
+
+        if not options["merge"]:
+            self.stdout.write(
+                f"Found {len(clusters)} clusters with {duplicates} duplicates "
+                f"in {elapsed:.2f}s; run with --merge to merge them."
+            )
+            return
+
+        removed = 0
+        try:
+            batch = []
+            for cluster in clusters:
+                batch.append(cluster)
+                if sum(len(c) for c in batch) >= options["batch_size"]:
+                    removed += self._merge(batch)
+                    batch = []
+            if batch:
+                removed += self._merge(batch)
+        finally:
+            if removed:
+                locations_bulk_changed.send(sender=Location)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Merged {len(clusters)} clusters, removing {removed} duplicates, "
+                f"in {elapsed:.2f}s"
+            )
+        )
+
+    def _merge(self, clusters):
+        """
+        Keep the first (oldest) location of each cluster and delete the rest.
+
+        A kept location with no description takes the longest one in its
+        cluster. Returns the number of locations deleted.
+        """
+        with transaction.atomic():
+            locations = Location.objects.in_bulk(
+                [pk for cluster in clusters for pk in cluster]
+            )
+            filled, doomed = [], []
+            for keeper_pk, *others in clusters:
+                keeper = locations.get(keeper_pk)
+                others = [locations[pk] for pk in others if pk in locations]
+                if keeper is None or not others:
+                    # Edited away since the scan; leave it for the next run.
+                    continue
+                doomed.extend(location.pk for location in others)
+                if not keeper.description:
+                    description = max(
+                        (location.description for location in others), key=len
+                    )
+                    if description:
+                        keeper.description = description
+                        filled.append(keeper)
+            if filled:
+                Location.objects.bulk_update(filled, ["description"])
+            return Location.objects.filter(pk__in=doomed).delete_in_bulk()
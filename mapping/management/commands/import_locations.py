@@ -0,0 +1,299 @@
+import csv
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mapping.models import Location
+from mapping.signals import locations_bulk_changed
+from mapping.validators import validate_latitude, validate_longitude
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "geojson", "ndjson")
+EXTENSIONS = {
+    ".csv": "csv",
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".geojsonl": "ndjson",
+}
+LATITUDE_KEYS = ("latitude", "lat")
+LONGITUDE_KEYS = ("longitude", "lng", "lon")
+
+
+def _first(record, keys):
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+
+def _flatten_feature(record):
+    """Turn a GeoJSON Point feature into a flat record; pass others through."""
+    if record.get("type") != "Feature":
+        return record
+    geometry = record.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        raise ValueError("Only Point geometries are supported")
+    longitude, latitude = geometry["coordinates"][:2]
+    return {
+        **(record.get("properties") or {}),
+        "latitude": latitude,
+        "longitude": longitude,
+    }
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_geojson(stream, chunk_size=1 << 16):
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time.
+
+    The file is read in chunks and the top-level object is walked key by
+    key, so only its own "features" member is used, never a "features"
+    nested in another member or inside a string. Other members are decoded
+    and dropped, and each feature is decoded as soon as it is complete, so
+    only one value (plus one chunk) is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(chars=" \t\r\n"):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(char, message):
+        nonlocal pos
+        skip()
+        if pos >= len(buffer) or buffer[pos] != char:
+            raise ValueError(message)
+        pos += 1
+
+    def value():
+        nonlocal pos
+        skip()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            pos = end
+            return result
+
+    expect("{", "Not a GeoJSON object")
+    while True:
+        skip()
+        if pos >= len(buffer) or buffer[pos] == "}":
+            raise ValueError("No 'features' array found")
+        key = value()
+        if not isinstance(key, str):
+            raise ValueError("Object keys must be strings")
+        expect(":", "Expected ':' after an object key")
+        if key == "features":
+            break
+        value()
+        skip()
+        if pos < len(buffer) and buffer[pos] == ",":
+            pos += 1
+    expect("[", "'features' is not an array")
+
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file inside 'features'")
+        if buffer[pos] == "]":
+            return
+        yield value()
+
+
+READERS = {"csv": read_csv, "geojson": read_geojson, "ndjson": read_ndjson}
+
+
+def clean_record(record, name_max_length):
+    """Validate a raw record and return an unsaved Location."""
+    record = _flatten_feature(record)
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("Missing name")
+    if len(name) > name_max_length:
+        raise ValueError(f"Name longer than {name_max_length} characters")
+    try:
+        latitude = float(_first(record, LATITUDE_KEYS))
+        longitude = float(_first(record, LONGITUDE_KEYS))
+    except (TypeError, ValueError):
+        raise ValueError("Latitude and longitude must be numbers")
+    try:
+        validate_latitude(latitude)
+        validate_longitude(longitude)
+    except ValidationError as e:
+        raise ValueError(e.messages[0])
+    return Location(
+        name=name,
+        description=str(record.get("description") or ""),
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream locations from a CSV, GeoJSON or NDJSON file into the database "
+        "in transactional bulk batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or '-' for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Input format. Inferred from the file extension if omitted.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows written per transaction (default: 5000).",
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help="Update existing locations with the same name instead of "
+            "creating duplicates.",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Abort on the first invalid row instead of skipping it.",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or EXTENSIONS.get(Path(options["path"]).suffix.lower())
+        if fmt is None:
+            raise CommandError("Cannot infer the format; pass --format.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        self.upsert = options["upsert"]
+        self.created = self.updated = self.skipped = 0
+        name_max_length = Location._meta.get_field("name").max_length
+        started = time.perf_counter()
+
+        stream = self._open(options["path"])
+        try:
+            batch = []
+            for number, record in enumerate(READERS[fmt](stream), start=1):
+                try:
+                    batch.append(clean_record(record, name_max_length))
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    if options["strict"]:
+                        raise CommandError(f"Record {number}: {e}")
+                    self.skipped += 1
+                    if options["verbosity"] >= 2:
+                        self.stderr.write(f"Skipping record {number}: {e}")
+                    continue
+                if len(batch) >= options["batch_size"]:
+                    self._write(batch)
+                    batch = []
+                    self._progress(started, options["verbosity"])
+            if batch:
+                self._write(batch)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.created or self.updated:
+                locations_bulk_changed.send(sender=Location)
+
+        elapsed = time.perf_counter() - started
+        total = self.created + self.updated
+        rate = total / elapsed if elapsed else 0
+        logger.info("Imported %s locations in %.2fs", total, elapsed)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} locations ({self.created} created, "
+                f"{self.updated} updated, {self.skipped} skipped) "
+                f"in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+            )
+        )
+
+    def _open(self, path):
+        if path == "-":
+            return sys.stdin
+        try:
+            # utf-8-sig drops the byte order mark spreadsheet exports start
+            # with, which would otherwise end up in the first CSV header.
+            return open(path, newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(f"Could not open {path}: {e}")
+
+    def _progress(self, started, verbosity):
+        if verbosity >= 2:
+            total = self.created + self.updated
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{total} rows written ({total / elapsed:,.0f} rows/s)")
+
+    @transaction.atomic
+    def _write(self, batch):
+        if not self.upsert:
+            Location.objects.bulk_create(batch)
+            self.created += len(batch)
+            return
+
+        # Within a batch the last row for a name wins.
+        by_name = {location.name: location for location in batch}
+        existing = {}
+        for location in Location.objects.filter(name__in=by_name).order_by("-id"):
+            existing[location.name] = location
+
+        to_update = []
+        for name, location in existing.items():
+            incoming = by_name.pop(name)
+            location.description = incoming.description
+            location.latitude = incoming.latitude
+            location.longitude = incoming.longitude
+            to_update.append(location)
+
+        if to_update:
+            Location.objects.bulk_update(
+                to_update, ["description", "latitude", "longitude"]
+            )
+        Location.objects.bulk_create(by_name.values())
+        self.updated += len(to_update)
+        self.created += len(by_name)
@@ -0,0 +1,164 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+Every worker process keeps its own registry; Prometheus scrapes each one
+and sums them. Updates take a single lock per request, which is cheap next
+to the request itself.
+"""
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``counts[i]`` is the count in bucket i only."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yield ``(upper_bound, cumulative_count)`` pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewStats:
+    def __init__(self):
+        self.responses = {}  # (method, status) -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_seconds = 0.0
+        self.response_bytes = 0
+        self.over_budget = 0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Per-view request metrics shared by every thread in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def observe(
+        self,
+        view,
+        method,
+        status,
+        seconds,
+        queries=0,
+        query_seconds=0.0,
+        response_bytes=0,
+        over_budget=False,
+    ):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            key = (method, status)
+            stats.responses[key] = stats.responses.get(key, 0) + 1
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.query_seconds += query_seconds
+            stats.response_bytes += response_bytes
+            stats.over_budget += over_budget
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            def histogram(name, view, hist):
+                for bound, count in hist.cumulative():
+                    labels = _labels(view=view, le=_number(bound))
+                    lines.append(f"{name}_bucket{labels} {count}")
+                lines.append(f"{name}_sum{_labels(view=view)} {_number(hist.sum)}")
+                lines.append(f"{name}_count{_labels(view=view)} {hist.count}")
+
+            family(
+                "mapping_http_requests_total",
+                "counter",
+                "Responses by view, method and status.",
+            )
+            for view, stats in views:
+                for (method, status), count in sorted(stats.responses.items()):
+                    labels = _labels(view=view, method=method, status=status)
+                    lines.append(f"mapping_http_requests_total{labels} {count}")
+
+            family(
+                "mapping_http_request_duration_seconds",
+                "histogram",
+                "Time spent handling the request.",
+            )
+            for view, stats in views:
+                histogram("mapping_http_request_duration_seconds", view, stats.latency)
+
+            family(
+                "mapping_db_queries_per_request",
+                "histogram",
+                "Database queries run while handling one request.",
+            )
+            for view, stats in views:
+                histogram("mapping_db_queries_per_request", view, stats.queries)
+
+            for name, attr, help_text in (
+                (
+                    "mapping_db_query_duration_seconds_total",
+                    "query_seconds",
+                    "Time spent executing database queries.",
+                ),
+                (
+                    "mapping_http_response_bytes_total",
+                    "response_bytes",
+                    "Bytes in non-streaming response bodies.",
+                ),
+                (
+                    "mapping_query_budget_exceeded_total",
+                    "over_budget",
+                    "Requests that ran more queries than MAPPING_QUERY_BUDGET.",
+                ),
+            ):
+                family(name, "counter", help_text)
+                for view, stats in views:
+                    lines.append(
+                        f"{name}{_labels(view=view)} {_number(getattr(stats, attr))}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
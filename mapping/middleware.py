@@ -0,0 +1,107 @@
+import collections
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+
+def _install(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _uninstall(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries and response size for every request,
+    keyed by the resolved URL name, in ``mapping.metrics.registry``.
+
+    Requests that run more than ``MAPPING_QUERY_BUDGET`` queries are counted
+    and logged with their most repeated statement, which is usually the
+    query inside an N+1 loop. Place it first in MIDDLEWARE so the latency
+    covers the whole stack. Queries run while a streaming response is being
+    consumed happen after the view returns and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # Connections are per thread, and an async request's ORM calls run
+        # in the thread sync_to_async picks for it, so the wrapper has to be
+        # installed on that thread's connection.
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        await sync_to_async(_install)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_uninstall)(recorder)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, response, seconds, recorder):
+        match = request.resolver_match
+        view = match.view_name if match is not None else "<unresolved>"
+        over_budget = recorder.count > settings.MAPPING_QUERY_BUDGET
+        if over_budget:
+            statement, repeats = recorder.statements.most_common(1)[0]
+            logger.warning(
+                "%s ran %d queries (budget %d); repeated %d times: %s",
+                view,
+                recorder.count,
+                settings.MAPPING_QUERY_BUDGET,
+                repeats,
+                statement,
+            )
+        registry.observe(
+            view,
+            request.method,
+            response.status_code,
+            seconds,
+            queries=recorder.count,
+            query_seconds=recorder.seconds,
+            response_bytes=0 if response.streaming else len(response.content),
+            over_budget=over_budget,
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="location",
+            options={"ordering": ["name"]},
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="location_lat_lng_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0002_location_lat_lng_idx"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="location",
+            options={"ordering": ["name", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(fields=["name", "id"], name="location_name_id_idx"),
+        ),
+    ]
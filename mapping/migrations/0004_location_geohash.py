@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+from mapping import geohash
+
+BATCH_SIZE = 2000
+
+
+def backfill_geohash(apps, schema_editor):
+    """Fill in geohashes for existing rows, walking the table in pk batches."""
+    Location = apps.get_model("mapping", "Location")
+    rows = Location.objects.using(schema_editor.connection.alias).order_by("pk")
+    last_pk = 0
+    while True:
+        batch = list(
+            rows.filter(pk__gt=last_pk).only("pk", "latitude", "longitude")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for location in batch:
+            location.geohash = geohash.encode(location.latitude, location.longitude)
+        Location.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ["geohash"]
+        )
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0003_location_name_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="location",
+            name="geohash",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=12
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        # Build the index once the column is populated rather than updating
+        # it row by row during the backfill.
+        migrations.AlterField(
+            model_name="location",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=12
+            ),
+        ),
+    ]
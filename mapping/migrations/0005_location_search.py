@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:40
+
+from django.db import migrations
+
+from mapping import search
+
+
+def install_search(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0004_location_geohash"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-17 00:51
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_change_seq(apps, schema_editor):
+    """Number existing rows by pk and start the counter after the last one."""
+    alias = schema_editor.connection.alias
+    Location = apps.get_model("mapping", "Location")
+    ChangeSequence = apps.get_model("mapping", "ChangeSequence")
+    Location.objects.using(alias).update(change_seq=F("id"))
+    last = Location.objects.using(alias).aggregate(last=Max("id"))["last"] or 0
+    ChangeSequence.objects.using(alias).create(pk=1, last_value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0005_location_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LocationTombstone",
+            fields=[
+                (
+                    "location_id",
+                    models.BigIntegerField(primary_key=True, serialize=False),
+                ),
+                ("change_seq", models.BigIntegerField(db_index=True)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="change_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_change_seq, migrations.RunPython.noop),
+        # Index once the backfill has numbered every row, as in 0004.
+        migrations.AlterField(
+            model_name="location",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -1,38 +1,301 @@
 import logging
 
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import geohash
+from .geo import normalize_longitude
 
 logger = logging.getLogger(__name__)
 
 
+def _prefix_q(prefix):
+    """Match geohashes starting with ``prefix`` as an index range scan."""
+    upper = geohash.next_prefix(prefix)
+    if upper is None:
+        return Q(geohash__gte=prefix)
+    return Q(geohash__gte=prefix, geohash__lt=upper)
+
+
+class ChangeSequence(models.Model):
+    """
+    Single-row counter handing out Location change sequence numbers.
+
+    ``allocate`` increments the row inside the caller's transaction, so the
+    row stays locked until that transaction commits. Writers are serialized
+    on it and sequence numbers become visible in the order they were
+    handed out: a client that has seen ``n`` can never later miss a change
+    numbered below ``n``.
+    """
+
+    last_value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, count=1, using=None):
+        """Reserve ``count`` consecutive numbers and return the first."""
+        using = using or "default"
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            raise transaction.TransactionManagementError(
+                "Change sequence numbers must be allocated inside the "
+                "transaction that writes them."
+            )
+        if connection.features.can_return_columns_from_insert:
+            # SQLite and PostgreSQL can increment and read back in one query.
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET last_value = last_value + %s "
+                    f"WHERE id = 1 RETURNING last_value",
+                    [count],
+                )
+                row = cursor.fetchone()
+            if row is not None:
+                return row[0] - count + 1
+        else:
+            rows = cls.objects.using(using).filter(pk=1)
+            if rows.update(last_value=F("last_value") + count):
+                return rows.get().last_value - count + 1
+        cls.objects.using(using).create(pk=1, last_value=count)
+        return 1
+
+    @classmethod
+    def current(cls, using=None):
+        """Return the last number handed out, 0 if none has been."""
+        row = cls.objects.using(using or "default").filter(pk=1).first()
+        return row.last_value if row else 0
+
+
+class LocationTombstone(models.Model):
+    """Record of a deleted Location, kept so sync clients can drop it."""
+
+    location_id = models.BigIntegerField(primary_key=True)
+    change_seq = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def record(cls, pks, using=None):
+        pks = list(pks)
+        if not pks:
+            return
+        seq = ChangeSequence.allocate(using=using)
+        # A pk can come back if a row is inserted with an explicit id.
+        cls.objects.using(using or "default").bulk_create(
+            [cls(location_id=pk, change_seq=seq) for pk in pks],
+            update_conflicts=True,
+            unique_fields=["location_id"],
+            update_fields=["change_seq", "deleted_at"],
+        )
+
+    @classmethod
+    def record_queryset(cls, queryset):
+        """Record every Location in ``queryset`` with one INSERT ... SELECT."""
+        using = queryset.db
+        connection = transaction.get_connection(using)
+        inner, params = queryset.order_by().values_list("pk").query.sql_with_params()
+        seq = ChangeSequence.allocate(using=using)
+        table = connection.ops.quote_name(cls._meta.db_table)
+        now = cls._meta.get_field("deleted_at").get_db_prep_value(
+            timezone.now(), connection
+        )
+        with connection.cursor() as cursor:
+            # "WHERE true" tells SQLite's parser that ON CONFLICT belongs to
+            # the INSERT rather than to a join in the SELECT.
+            cursor.execute(
+                f"INSERT INTO {table} (location_id, change_seq, deleted_at) "
+                f"SELECT deleted.id, %s, %s FROM ({inner}) AS deleted WHERE true "
+                f"ON CONFLICT (location_id) DO UPDATE SET "
+                f"change_seq = excluded.change_seq, "
+                f"deleted_at = excluded.deleted_at",
+                [seq, now, *params],
+            )
+
+
+class LocationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.update_geohash()
+        with transaction.atomic(using=self.db, savepoint=False):
+            if objs:
+                seq = ChangeSequence.allocate(len(objs), using=self.db)
+                for offset, obj in enumerate(objs):
+                    obj.change_seq = seq + offset
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs, fields = list(objs), list(fields)
+        if {"latitude", "longitude"} & set(fields):
+            for obj in objs:
+                obj.update_geohash()
+            if "geohash" not in fields:
+                fields.append("geohash")
+        fields.extend(f for f in ("change_seq", "updated_at") if f not in fields)
+        with transaction.atomic(using=self.db, savepoint=False):
+            if objs:
+                seq = ChangeSequence.allocate(len(objs), using=self.db)
+                now = timezone.now()
+                for offset, obj in enumerate(objs):
+                    obj.change_seq = seq + offset
+                    obj.updated_at = now
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        # Every row in one update() shares a sequence number; clients treat
+        # a number as a unit when paging through changes.
+        with transaction.atomic(using=self.db, savepoint=False):
+            if "change_seq" not in kwargs:
+                kwargs["change_seq"] = ChangeSequence.allocate(using=self.db)
+            kwargs.setdefault("updated_at", timezone.now())
+            return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            LocationTombstone.record(
+                self.values_list("pk", flat=True).order_by(), using=self.db
+            )
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def delete_in_bulk(self):
+        """
+        Delete the matching rows with one DELETE, without loading them.
+
+        Unlike ``delete()`` no post_delete signals are sent; callers send
+        locations_bulk_changed instead. Returns the number of rows deleted.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            LocationTombstone.record_queryset(self)
+            return self._raw_delete(self.db)
+
+    delete_in_bulk.alters_data = True
+    delete_in_bulk.queryset_only = True
+
+    def in_cell(self, *prefixes):
+        """Locations whose geohash starts with any of ``prefixes``."""
+        q = Q()
+        for prefix in prefixes:
+            q |= _prefix_q(prefix)
+        return self.filter(q)
+
+    def near_geohash(self, cell):
+        """Locations in geohash cell ``cell`` or any of its eight neighbours."""
+        return self.in_cell(*geohash.neighbours(cell))
+
+    def in_bbox(self, south, west, north, east, max_cells=32):
+        """
+        Locations inside a bounding box, found through geohash prefix ranges.
+
+        The box is covered by at most ``max_cells`` cells per side of the
+        antimeridian; the exact latitude/longitude test then trims the
+        edges of those cells.
+        """
+        span = east - west
+        if span >= 360:
+            west, east = -180.0, 180.0
+        else:
+            west = normalize_longitude(west)
+            east = west + span
+        spans = [(west, min(east, 180.0))]
+        if east > 180:
+            spans.append((-180.0, east - 360))
+
+        prefixes, exact = [], Q()
+        for span_west, span_east in spans:
+            prefixes.extend(
+                geohash.cover_bbox(south, span_west, north, span_east, max_cells)
+            )
+            exact |= Q(longitude__gte=span_west, longitude__lte=span_east)
+        return self.in_cell(*prefixes).filter(
+            exact, latitude__gte=south, latitude__lte=north
+        )
+
+
 class Location(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(
+        max_length=geohash.MAX_PRECISION, blank=True, editable=False, db_index=True
+    )
+    # Position in the global order of changes, see ChangeSequence.
+    change_seq = models.BigIntegerField(default=0, editable=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LocationQuerySet.as_manager()
 
     class Meta:
-        ordering = ["name"]
+        ordering = ["name", "id"]
+        indexes = [
+            models.Index(fields=["name", "id"], name="location_name_id_idx"),
+            models.Index(fields=["latitude", "longitude"], name="location_lat_lng_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_coordinates(self):
+        """
+        Return the (latitude, longitude) last read from or written to the
+        database, or None if this instance never went through the ORM.
+        """
+        loaded = getattr(self, "_loaded_values", {})
+        if "latitude" in loaded and "longitude" in loaded:
+            return loaded["latitude"], loaded["longitude"]
+        return None
+
+    def update_geohash(self):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash.encode(self.latitude, self.longitude)
+
     def save(self, *args, **kwargs):
-        logger.debug(f"Saving location: {self.name}")
+        logger.debug("Saving location: %s", self.name)
+        self.update_geohash()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        if update_fields:
+            kwargs["update_fields"] = {
+                *kwargs["update_fields"],
+                "change_seq",
+                "updated_at",
+            }
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
         try:
-            super().save(*args, **kwargs)
-            logger.info(f"Successfully saved location: {self.name}")
+            with transaction.atomic(using=using, savepoint=False):
+                self.change_seq = ChangeSequence.allocate(using=using)
+                super().save(*args, **kwargs)
+            self._loaded_values = {
+                **getattr(self, "_loaded_values", {}),
+                "latitude": self.latitude,
+                "longitude": self.longitude,
+            }
+            logger.info("Successfully saved location: %s", self.name)
         except Exception as e:
-            logger.error(f"Error saving location {self.name}: {str(e)}", exc_info=True)
+            logger.error("Error saving location %s: %s", self.name, e, exc_info=True)
             raise
 
     def delete(self, *args, **kwargs):
-        logger.info(f"Deleting location: {self.name}")
+        logger.info("Deleting location: %s", self.name)
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
         try:
-            super().delete(*args, **kwargs)
-            logger.info(f"Successfully deleted location: {self.name}")
+            with transaction.atomic(using=using, savepoint=False):
+                pk = self.pk
+                super().delete(*args, **kwargs)
+                LocationTombstone.record([pk], using=using)
+            logger.info("Successfully deleted location: %s", self.name)
         except Exception as e:
-            logger.error(
-                f"Error deleting location {self.name}: {str(e)}", exc_info=True
-            )
+            logger.error("Error deleting location %s: %s", self.name, e, exc_info=True)
             raise
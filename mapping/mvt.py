@@ -0,0 +1,96 @@
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder for point layers.
+
+Only what the map needs is implemented: one layer of POINT features with
+string, integer, float and boolean properties. The protobuf wire format is
+written by hand so no protobuf runtime is required.
+"""
+
+import struct
+
+MOVE_TO = 1
+POINT = 1
+
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return _key(7, VARINT) + _varint(int(value))
+    if isinstance(value, int):
+        if value < 0:
+            return _key(6, VARINT) + _varint(_zigzag(value))
+        return _key(5, VARINT) + _varint(value)
+    if isinstance(value, float):
+        return _key(3, FIXED64) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode())
+
+
+def encode_layer(name, features, extent=4096):
+    """
+    Encode one point layer.
+
+    ``features`` yields ``(id, x, y, properties)`` where ``x``/``y`` are
+    integer tile coordinates in the ``0..extent`` range and ``properties``
+    is a dict of scalar values.
+    """
+    keys, values = {}, {}
+    encoded = []
+    for feature_id, x, y, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        feature = _key(1, VARINT) + _varint(feature_id)
+        if tags:
+            feature += _packed_field(2, tags)
+        feature += _key(3, VARINT) + _varint(POINT)
+        feature += _packed_field(
+            4, [(MOVE_TO & 0x7) | (1 << 3), _zigzag(x), _zigzag(y)]
+        )
+        encoded.append(_bytes_field(2, feature))
+
+    layer = _key(15, VARINT) + _varint(2)
+    layer += _bytes_field(1, name.encode())
+    layer += b"".join(encoded)
+    layer += b"".join(_bytes_field(3, key.encode()) for key in keys)
+    layer += b"".join(_bytes_field(4, _value(value)) for _, value in values)
+    layer += _key(5, VARINT) + _varint(extent)
+    return layer
+
+
+def encode_tile(layers):
+    """Encode a tile from ``{layer_name: features}``; see ``encode_layer``."""
+    return b"".join(
+        _bytes_field(3, encode_layer(name, features))
+        for name, features in layers.items()
+    )
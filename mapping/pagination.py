@@ -0,0 +1,152 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(name, pk):
+    """Encode a (name, id) sort key as an opaque URL-safe cursor."""
+    raw = json.dumps([name, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor``; raise ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(name, str) or not isinstance(pk, int):
+        raise ValueError("Invalid cursor")
+    return name, pk
+
+
+class KeysetPage:
+    """One page of a (name, id) keyset-paginated queryset."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next and self.object_list):
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.name, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous and self.object_list):
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.name, first.pk)
+
+
+def _keyset_query(queryset, page_size, after, before):
+    if after is not None and before is not None:
+        raise ValueError("Use either 'after' or 'before', not both")
+    if before is not None:
+        name, pk = decode_cursor(before)
+        return queryset.filter(
+            Q(name__lte=name) & (Q(name__lt=name) | Q(id__lt=pk))
+        ).order_by("-name", "-id")[: page_size + 1]
+    if after is not None:
+        name, pk = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(name__gte=name) & (Q(name__gt=name) | Q(id__gt=pk))
+        )
+    return queryset.order_by("name", "id")[: page_size + 1]
+
+
+def _keyset_page(rows, page_size, after, before):
+    if before is not None:
+        return KeysetPage(rows[:page_size][::-1], True, len(rows) > page_size)
+    return KeysetPage(rows[:page_size], len(rows) > page_size, after is not None)
+
+
+def paginate_keyset(queryset, page_size, after=None, before=None):
+    """
+    Return the KeysetPage following cursor ``after`` or preceding ``before``.
+
+    Rows are ordered by (name, id) and each page is a range scan starting at
+    the cursor, so a deep page costs the same as the first one. No COUNT(*)
+    is issued; one extra row is fetched to tell whether another page exists.
+    """
+    rows = list(_keyset_query(queryset, page_size, after, before))
+    return _keyset_page(rows, page_size, after, before)
+
+
+async def apaginate_keyset(queryset, page_size, after=None, before=None):
+    """Async version of ``paginate_keyset`` for use in async views."""
+    query = _keyset_query(queryset, page_size, after, before)
+    rows = [row async for row in query]
+    return _keyset_page(rows, page_size, after, before)
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Return the query planner's estimate of ``model``'s row count, or None.
+
+    PostgreSQL keeps one in ``pg_class.reltuples`` and SQLite in
+    ``sqlite_stat1``; both are refreshed by ANALYZE (or autovacuum) and are
+    None until it has run.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(table)],
+                )
+            elif connection.vendor == "sqlite":
+                # Each index's stat starts with the row count of its table.
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None  # No sqlite_stat1 table before the first ANALYZE.
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a large table row by row.
+
+    An unfiltered queryset uses the planner's estimate once it exceeds
+    MAPPING_ADMIN_COUNT_LIMIT. A filtered one is counted up to that limit
+    only, so pages past it aren't offered.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.MAPPING_ADMIN_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
@@ -0,0 +1,236 @@
+"""
+Full-text search over Location name and description.
+
+The text index lives outside the Django model and is created per database
+vendor by migration 0005:
+
+* SQLite: an external-content FTS5 table kept in sync by triggers.
+* PostgreSQL: a generated ``tsvector`` column with a GIN index.
+
+Other backends fall back to ``icontains`` filters. Every search term is
+matched as a prefix and all terms must match; name matches rank above
+description matches.
+"""
+
+import logging
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .geo import bbox_q
+
+logger = logging.getLogger(__name__)
+
+TERM_RE = re.compile(r"\w+")
+MAX_TERMS = 8
+# Relative weight of a name match against a description match.
+NAME_WEIGHT = 10.0
+
+
+def _table():
+    from .models import Location
+
+    return Location._meta.db_table
+
+
+def _fts_table():
+    return f"{_table()}_fts"
+
+
+def _sqlite_triggers(table, fts):
+    insert = (
+        f"INSERT INTO {fts}(rowid, name, description) "
+        f"VALUES (new.id, new.name, new.description);"
+    )
+    delete = (
+        f"INSERT INTO {fts}({fts}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description);"
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+        f"AFTER UPDATE OF name, description ON {table} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def install(connection):
+    """Create the vendor-specific text index and fill it from existing rows."""
+    table, fts = _table(), _fts_table()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"name, description, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            for statement in _sqlite_triggers(table, fts):
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector "
+                f"tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+                f") STORED"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_idx "
+                f"ON {table} USING GIN (search_vector)"
+            )
+
+
+def uninstall(connection):
+    table, fts = _table(), _fts_table()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+def ensure_installed(using="default", **kwargs):
+    """
+    post_migrate receiver that restores the SQLite triggers.
+
+    SQLite can't alter most columns in place, so Django rebuilds the table
+    for such migrations and the triggers are dropped with the old table.
+    When that has happened they are recreated and the index rebuilt.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    table, fts = _table(), _fts_table()
+    if table not in connection.introspection.table_names():
+        return  # Migrated backwards past the Location table.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = %s AND name LIKE %s",
+            [table, f"{fts}_%"],
+        )
+        if cursor.fetchone()[0] == 3:
+            return
+    if fts in connection.introspection.table_names():
+        logger.warning("Search triggers on %s were dropped; reinstalling", table)
+        install(connection)
+
+
+def parse_terms(text):
+    """Split user input into at most MAX_TERMS lower-case word terms."""
+    return TERM_RE.findall(text.lower())[:MAX_TERMS]
+
+
+def _sqlite_match(terms):
+    # Quoting each term keeps FTS5 operators in the input literal.
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _postgresql_match(terms):
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def match_q(text, using="default"):
+    """
+    Return a Q selecting the locations matching ``text``, unranked.
+
+    The match is made in the text index, so it stays fast on large tables
+    and can be combined with other filters.
+    """
+    terms = parse_terms(text)
+    if not terms:
+        return Q(pk__in=[])
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        fts = _fts_table()
+        return Q(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [_sqlite_match(terms)]
+            )
+        )
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(_table())
+        return Q(
+            pk__in=RawSQL(
+                f"SELECT id FROM {table} "
+                f"WHERE search_vector @@ to_tsquery('simple', %s)",
+                [_postgresql_match(terms)],
+            )
+        )
+    q = Q()
+    for term in terms:
+        q &= Q(name__icontains=term) | Q(description__icontains=term)
+    return q
+
+
+def _bbox_where(bbox, connection):
+    from .models import Location
+
+    query = Location.objects.filter(bbox_q(bbox)).query
+    return query.get_compiler(connection=connection).compile(query.where)
+
+
+def search(text, bbox=None, limit=20, using="default"):
+    """
+    Return up to ``limit`` locations matching ``text``, best first.
+
+    Each result has a ``rank`` attribute (higher is better). ``bbox``
+    optionally restricts results to a BoundingBox.
+    """
+    from .models import Location
+
+    terms = parse_terms(text)
+    if not terms:
+        return []
+    connection = connections[using]
+    table = connection.ops.quote_name(_table())
+    columns = ", ".join(
+        f"{table}.{connection.ops.quote_name(field.column)}"
+        for field in Location._meta.concrete_fields
+    )
+    where, params = "", []
+    if bbox is not None:
+        where, params = _bbox_where(bbox, connection)
+        where = f"AND {where}"
+
+    if connection.vendor == "sqlite":
+        fts = _fts_table()
+        sql = (
+            f"SELECT {columns}, -bm25({fts}, {NAME_WEIGHT}, 1.0) AS rank "
+            f"FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid "
+            f"WHERE {fts} MATCH %s {where} "
+            f"ORDER BY rank DESC, {table}.id LIMIT %s"
+        )
+        match = _sqlite_match(terms)
+        return list(Location.objects.using(using).raw(sql, [match, *params, limit]))
+
+    if connection.vendor == "postgresql":
+        sql = (
+            f"SELECT {columns}, ts_rank_cd(search_vector, query) AS rank "
+            f"FROM {table}, to_tsquery('simple', %s) query "
+            f"WHERE search_vector @@ query {where} "
+            f"ORDER BY rank DESC, {table}.id LIMIT %s"
+        )
+        match = _postgresql_match(terms)
+        return list(Location.objects.using(using).raw(sql, [match, *params, limit]))
+
+    queryset = Location.objects.using(using)
+    if bbox is not None:
+        queryset = queryset.filter(bbox_q(bbox))
+    for term in terms:
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(description__icontains=term)
+        )
+    results = list(queryset[:limit])
+    for location in results:
+        location.rank = 0.0
+    return results
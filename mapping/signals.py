@@ -0,0 +1,214 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import bump_data_version
+from .clustering import cluster_index
+from .events import RESYNC, broker, deleted_event, location_event
+from .models import Location
+from .snapshot import location_snapshot
+from .spatial import spatial_index
+from .tiles import tile_cache
+
+logger = logging.getLogger(__name__)
+
+# Sent after rows are written with bulk_create/bulk_update/QuerySet.delete,
+# which bypass post_save/post_delete. Receivers should drop any derived state.
+locations_bulk_changed = Signal()
+# Sent after commit for rows written with the bulk methods whose changes are
+# known, with ``changes``: ``(pk, name, previous, current)`` tuples where the
+# coordinates are ``(latitude, longitude)``, ``previous`` is None for created
+# rows and ``current`` (and ``name``) None for deleted ones. Receivers update
+# derived state row by row, as for post_save and post_delete.
+locations_changed = Signal()
+
+
+@receiver(post_save, sender=Location)
+def update_cluster_index_on_save(sender, instance, created, **kwargs):
+    latitude, longitude = instance.latitude, instance.longitude
+    previous = instance.loaded_coordinates()
+
+    def apply():
+        if created:
+            cluster_index.add(latitude, longitude)
+        elif previous is None:
+            logger.debug(
+                "Previous coordinates unknown for %s, invalidating", instance.pk
+            )
+            cluster_index.invalidate()
+        elif previous != (latitude, longitude):
+            cluster_index.remove(*previous)
+            cluster_index.add(latitude, longitude)
+
+    transaction.on_commit(apply, using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=Location)
+def update_cluster_index_on_delete(sender, instance, **kwargs):
+    previous = instance.loaded_coordinates() or (instance.latitude, instance.longitude)
+    transaction.on_commit(
+        lambda: cluster_index.remove(*previous), using=kwargs.get("using")
+    )
+
+
+# Connected after the cluster index receivers and before the tile ones, so
+# its on_commit callback runs between them. A tile rendered while the change
+# commits is only caught if the version moves before the tile is
+# invalidated (see TileCache.set), and after the cluster index, which
+# low-zoom tiles are drawn from, has the change.
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def bump_data_version_on_change(sender, **kwargs):
+    transaction.on_commit(bump_data_version, using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=Location)
+def invalidate_tiles_on_save(sender, instance, created, **kwargs):
+    points = [(instance.latitude, instance.longitude)]
+    previous = instance.loaded_coordinates()
+    if not created:
+        if previous is None:
+            transaction.on_commit(tile_cache.clear, using=kwargs.get("using"))
+            return
+        if previous != points[0]:
+            points.append(previous)
+
+    def apply():
+        for latitude, longitude in points:
+            tile_cache.invalidate_point(latitude, longitude)
+
+    transaction.on_commit(apply, using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=Location)
+def invalidate_tiles_on_delete(sender, instance, **kwargs):
+    previous = instance.loaded_coordinates() or (instance.latitude, instance.longitude)
+    transaction.on_commit(
+        lambda: tile_cache.invalidate_point(*previous), using=kwargs.get("using")
+    )
+
+
+@receiver(post_save, sender=Location)
+def update_spatial_index_on_save(sender, instance, **kwargs):
+    pk, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(
+        lambda: spatial_index.upsert(pk, latitude, longitude),
+        using=kwargs.get("using"),
+    )
+
+
+@receiver(post_delete, sender=Location)
+def update_spatial_index_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: spatial_index.remove(pk), using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=Location)
+def update_snapshot_on_save(sender, instance, **kwargs):
+    pk, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(
+        lambda: location_snapshot.upsert(pk, latitude, longitude),
+        using=kwargs.get("using"),
+    )
+
+
+@receiver(post_delete, sender=Location)
+def update_snapshot_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(
+        lambda: location_snapshot.remove(pk), using=kwargs.get("using")
+    )
+
+
+@receiver(post_save, sender=Location)
+def publish_event_on_save(sender, instance, created, **kwargs):
+    event = location_event(
+        "created" if created else "updated",
+        instance.pk,
+        instance.name,
+        instance.latitude,
+        instance.longitude,
+    )
+    transaction.on_commit(lambda: broker.publish(event), using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=Location)
+def publish_event_on_delete(sender, instance, **kwargs):
+    event = deleted_event(instance.pk)
+    transaction.on_commit(lambda: broker.publish(event), using=kwargs.get("using"))
+
+
+# Connected in the same order as the single-row receivers above: cluster
+# index, data version, tiles, then the rest.
+@receiver(locations_changed)
+def update_cluster_index_on_change(sender, changes, **kwargs):
+    for _, _, previous, current in changes:
+        if previous == current:
+            continue
+        if previous is not None:
+            cluster_index.remove(*previous)
+        if current is not None:
+            cluster_index.add(*current)
+
+
+@receiver(locations_changed)
+def bump_data_version_on_batch_change(sender, **kwargs):
+    bump_data_version()
+
+
+@receiver(locations_changed)
+def invalidate_tiles_on_change(sender, changes, **kwargs):
+    points = {
+        point
+        for _, _, previous, current in changes
+        for point in (previous, current)
+        if point is not None
+    }
+    for latitude, longitude in points:
+        tile_cache.invalidate_point(latitude, longitude)
+
+
+@receiver(locations_changed)
+def update_spatial_index_on_change(sender, changes, **kwargs):
+    for pk, _, _, current in changes:
+        if current is None:
+            spatial_index.remove(pk)
+        else:
+            spatial_index.upsert(pk, *current)
+
+
+@receiver(locations_changed)
+def update_snapshot_on_change(sender, changes, **kwargs):
+    for pk, _, _, current in changes:
+        if current is None:
+            location_snapshot.remove(pk)
+        else:
+            location_snapshot.upsert(pk, *current)
+
+
+@receiver(locations_changed)
+def publish_events_on_change(sender, changes, **kwargs):
+    for pk, name, previous, current in changes:
+        if current is None:
+            broker.publish(deleted_event(pk))
+        else:
+            event_type = "created" if previous is None else "updated"
+            broker.publish(location_event(event_type, pk, name, *current))
+
+
+@receiver(locations_bulk_changed)
+def reset_derived_state(sender, **kwargs):
+    bump_data_version()
+    cluster_index.invalidate()
+    spatial_index.invalidate()
+    location_snapshot.invalidate()
+    tile_cache.clear()
+
+
+# Registered after reset_derived_state so clients that refetch on the resync
+# already see the new data version.
+@receiver(locations_bulk_changed)
+def publish_resync_on_bulk_change(sender, **kwargs):
+    broker.publish(RESYNC)
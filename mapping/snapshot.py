@@ -0,0 +1,180 @@
+"""
+Array-backed snapshot of Location ids and coordinates.
+
+Packed marker responses are built from here rather than from model
+instances. The snapshot is three flat ``array`` columns sorted by latitude,
+so a bounding box is a bisected latitude band whose longitudes are checked
+in one pass. As with the spatial index, edits go into a small overlay that
+is folded back in on a background thread once it grows, and edits made by
+other processes are caught up from the change sequence.
+"""
+
+import bisect
+import logging
+import threading
+from array import array
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import DataVersionWatch
+from .geo import longitude_ranges
+
+logger = logging.getLogger(__name__)
+
+
+class LocationSnapshot:
+    def __init__(self, rebuild_ratio=0.01, min_rebuild=1000):
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self._columns = None
+        self._pending = {}
+        self._stale = set()
+        self._seq = 0
+        self._watch = DataVersionWatch()
+        self._lock = threading.RLock()
+        # While a rebuild runs: the thread, and the points edited since it
+        # started (None for removed ones).
+        self._rebuild_thread = None
+        self._edits = None
+
+    def _load(self):
+        from .models import ChangeSequence, Location
+
+        self._watch.start()
+        self._seq = ChangeSequence.current(using=DEFAULT_DB_ALIAS)
+
+        ids, latitudes, longitudes = array("q"), array("d"), array("d")
+        # The primary, as the snapshot outlives any replica lag.
+        rows = (
+            Location.objects.using(DEFAULT_DB_ALIAS)
+            .order_by("latitude")
+            .values_list("id", "latitude", "longitude")
+        )
+        for pk, latitude, longitude in rows.iterator(chunk_size=10000):
+            ids.append(pk)
+            latitudes.append(latitude)
+            longitudes.append(longitude)
+        logger.info("Loaded location snapshot of %s points", len(ids))
+        return ids, latitudes, longitudes
+
+    def _ensure_fresh(self):
+        if self._columns is not None and self._watch.changed_elsewhere():
+            from .sync import catch_up
+
+            limit = max(self.min_rebuild, self.rebuild_ratio * len(self._columns[0]))
+            self._seq = catch_up(self, self._seq, limit)
+            if self._seq is None:
+                self._columns = None
+        overlay = len(self._pending) + len(self._stale)
+        if self._columns is None:
+            self._columns = self._load()
+            self._pending.clear()
+            self._stale.clear()
+        elif self._rebuild_thread is None and overlay > max(
+            self.min_rebuild, self.rebuild_ratio * len(self._columns[0])
+        ):
+            self._start_rebuild()
+        return self._columns
+
+    def _start_rebuild(self):
+        self._edits = {}
+        self._rebuild_thread = threading.Thread(
+            target=self._rebuild,
+            args=(self._columns, dict(self._pending), set(self._stale)),
+            name="location-snapshot-rebuild",
+            daemon=True,
+        )
+        self._rebuild_thread.start()
+
+    def _rebuild(self, columns, pending, stale):
+        """Merge an overlay into ``columns`` and swap in the result."""
+        try:
+            rows = [
+                (latitude, pk, longitude)
+                for pk, latitude, longitude in zip(*columns)
+                if pk not in stale
+            ]
+            rows.extend(
+                (latitude, pk, longitude)
+                for pk, (latitude, longitude) in pending.items()
+            )
+            rows.sort()
+            rebuilt = (
+                array("q", (row[1] for row in rows)),
+                array("d", (row[0] for row in rows)),
+                array("d", (row[2] for row in rows)),
+            )
+        except Exception:
+            logger.exception("Failed to rebuild the location snapshot")
+            rebuilt = None
+        with self._lock:
+            # Unless the snapshot was invalidated or reloaded in the meantime.
+            if rebuilt is not None and self._columns is columns:
+                self._columns = rebuilt
+                self._pending = {
+                    pk: point for pk, point in self._edits.items() if point is not None
+                }
+                self._stale = set(self._edits)
+                logger.info("Rebuilt location snapshot of %s points", len(rows))
+            self._rebuild_thread = self._edits = None
+
+    def invalidate(self):
+        with self._lock:
+            self._columns = None
+            self._pending.clear()
+            self._stale.clear()
+
+    def upsert(self, pk, latitude, longitude):
+        with self._lock:
+            if self._columns is not None:
+                self._stale.add(pk)
+                self._pending[pk] = (latitude, longitude)
+                if self._edits is not None:
+                    self._edits[pk] = (latitude, longitude)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._columns is not None:
+                self._stale.add(pk)
+                self._pending.pop(pk, None)
+                if self._edits is not None:
+                    self._edits[pk] = None
+
+    def select(self, bbox, limit):
+        """
+        Return ``(ids, latitudes, longitudes, truncated)`` for the points in
+        ``bbox`` as arrays ordered by id, keeping the ``limit`` lowest ids.
+        """
+        (west, east), *rest = longitude_ranges(bbox)
+        # An empty second range when the box doesn't cross the antimeridian.
+        other_west, other_east = rest[0] if rest else (1.0, 0.0)
+        south, north = bbox.south, bbox.north
+        with self._lock:
+            ids, latitudes, longitudes = self._ensure_fresh()
+            stale = self._stale
+            lo = bisect.bisect_left(latitudes, south)
+            hi = bisect.bisect_right(latitudes, north)
+            found = [
+                (ids[i], latitudes[i], lng)
+                for i, lng in zip(range(lo, hi), longitudes[lo:hi])
+                if (west <= lng <= east or other_west <= lng <= other_east)
+                and ids[i] not in stale
+            ]
+            found.extend(
+                (pk, lat, lng)
+                for pk, (lat, lng) in self._pending.items()
+                if south <= lat <= north
+                and (west <= lng <= east or other_west <= lng <= other_east)
+            )
+        found.sort()
+        truncated = len(found) > limit
+        del found[limit:]
+        return (
+            array("q", (row[0] for row in found)),
+            array("d", (row[1] for row in found)),
+            array("d", (row[2] for row in found)),
+            truncated,
+        )
+
+
+location_snapshot = LocationSnapshot()
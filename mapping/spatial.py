@@ -0,0 +1,312 @@
+import heapq
+import logging
+import math
+import threading
+from array import array
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import DataVersionWatch
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+LEAF_SIZE = 16
+
+
+def to_unit_vector(latitude, longitude):
+    """Convert a coordinate to a point on the unit sphere."""
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    cos_lat = math.cos(lat)
+    return cos_lat * math.cos(lng), cos_lat * math.sin(lng), math.sin(lat)
+
+
+def chord_to_metres(chord_squared):
+    """Convert a squared chord length on the unit sphere to a great-circle distance."""
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(chord_squared) / 2))
+
+
+def metres_to_chord(metres):
+    """Convert a great-circle distance to a chord length on the unit sphere."""
+    return 2 * math.sin(min(math.pi, metres / EARTH_RADIUS_M) / 2)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two coordinates."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class KDTree:
+    """
+    Static 3-d tree over unit-sphere vectors, stored as flat arrays.
+
+    Points are permuted in place so that every subtree is a contiguous slice
+    ``[lo, hi)`` whose median element ``(lo + hi) // 2`` is the splitting
+    point; slices of ``LEAF_SIZE`` or fewer points are scanned linearly.
+    Squared Euclidean (chord) distance on the unit sphere is monotonic in
+    great-circle distance, so nearest-by-chord is nearest-on-earth.
+    """
+
+    def __init__(self, ids, coords):
+        order = list(range(len(ids)))
+        self._build(order, coords)
+        self.ids = array("q", (ids[i] for i in order))
+        self.coords = [array("d", (axis[i] for i in order)) for axis in coords]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _build(order, coords):
+        stack = [(0, len(order), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            axis = coords[depth % 3]
+            order[lo:hi] = sorted(order[lo:hi], key=axis.__getitem__)
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+    def nearest(self, point, k, skip=frozenset()):
+        """Return up to ``k`` ``(chord_squared, id)`` pairs, nearest first."""
+        if k < 1:
+            return []
+        xs, ys, zs = self.coords
+        ids = self.ids
+        px, py, pz = point
+        heap = []  # max-heap of (-distance, id)
+
+        def visit(i):
+            if ids[i] in skip:
+                return
+            dx, dy, dz = xs[i] - px, ys[i] - py, zs[i] - pz
+            distance = dx * dx + dy * dy + dz * dz
+            if len(heap) < k:
+                heapq.heappush(heap, (-distance, ids[i]))
+            elif distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, ids[i]))
+
+        # Each entry carries a lower bound on the distance to any point in
+        # its slice; the far side of a split is skipped once the heap is full
+        # and that bound is no better than the current k-th distance.
+        stack = [(0, len(ids), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            if len(heap) == k and bound >= -heap[0][0]:
+                continue
+            if hi - lo <= LEAF_SIZE:
+                for i in range(lo, hi):
+                    visit(i)
+                continue
+            mid = (lo + hi) // 2
+            diff = point[depth % 3] - self.coords[depth % 3][mid]
+            visit(mid)
+            near, far = (mid + 1, hi), (lo, mid)
+            if diff < 0:
+                near, far = far, near
+            # Push the far side first so the near side is explored first.
+            stack.append((*far, depth + 1, max(bound, diff * diff)))
+            stack.append((*near, depth + 1, bound))
+        return sorted((-distance, pk) for distance, pk in heap)
+
+    def within(self, point, chord, skip=frozenset()):
+        """Return ``(chord_squared, id)`` pairs no further than ``chord``."""
+        xs, ys, zs = self.coords
+        ids = self.ids
+        px, py, pz = point
+        limit = chord * chord
+        found = []
+
+        def visit(i):
+            dx, dy, dz = xs[i] - px, ys[i] - py, zs[i] - pz
+            distance = dx * dx + dy * dy + dz * dz
+            if distance <= limit and ids[i] not in skip:
+                found.append((distance, ids[i]))
+
+        stack = [(0, len(ids), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                for i in range(lo, hi):
+                    visit(i)
+                continue
+            mid = (lo + hi) // 2
+            diff = point[depth % 3] - self.coords[depth % 3][mid]
+            visit(mid)
+            if diff <= chord:
+                stack.append((lo, mid, depth + 1))
+            if diff >= -chord:
+                stack.append((mid + 1, hi, depth + 1))
+        found.sort()
+        return found
+
+
+class SpatialIndex:
+    """
+    Lazily built nearest-neighbour index over Location coordinates.
+
+    A static KDTree is built from the database on first use. Later edits go
+    into a small overlay: ``_pending`` holds new or moved points that are
+    scanned linearly, and ``_stale`` holds ids whose tree entry must be
+    ignored. Once the overlay grows past ``rebuild_ratio`` of the tree, a
+    background thread builds a new tree from the old one and the overlay;
+    queries keep using the old tree until it is swapped in, and edits made
+    in the meantime stay in the new tree's overlay. Edits committed by other
+    processes are fetched from the change sequence into the overlay when a
+    query notices the shared data version has moved.
+    """
+
+    def __init__(self, rebuild_ratio=0.01, min_rebuild=1000):
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self._tree = None
+        self._pending = {}
+        self._stale = set()
+        self._seq = 0
+        self._watch = DataVersionWatch()
+        self._lock = threading.RLock()
+        # While a rebuild runs: the thread, and the points edited since it
+        # started (None for removed ones).
+        self._rebuild_thread = None
+        self._edits = None
+
+    def _load(self):
+        from .models import ChangeSequence, Location
+
+        self._watch.start()
+        self._seq = ChangeSequence.current(using=DEFAULT_DB_ALIAS)
+        ids = array("q")
+        coords = (array("d"), array("d"), array("d"))
+        # Not from a replica, whose lag would last as long as the tree does.
+        rows = (
+            Location.objects.using(DEFAULT_DB_ALIAS)
+            .order_by()
+            .values_list("id", "latitude", "longitude")
+        )
+        for pk, latitude, longitude in rows.iterator(chunk_size=10000):
+            ids.append(pk)
+            for axis, value in zip(coords, to_unit_vector(latitude, longitude)):
+                axis.append(value)
+        tree = KDTree(ids, coords)
+        logger.info("Built spatial index over %s locations", len(tree))
+        return tree
+
+    def _ensure_fresh(self):
+        if self._tree is not None and self._watch.changed_elsewhere():
+            from .sync import catch_up
+
+            limit = max(self.min_rebuild, self.rebuild_ratio * len(self._tree))
+            self._seq = catch_up(self, self._seq, limit)
+            if self._seq is None:
+                self._tree = None
+        overlay = len(self._pending) + len(self._stale)
+        if self._tree is None:
+            self._tree = self._load()
+            self._pending.clear()
+            self._stale.clear()
+        elif self._rebuild_thread is None and overlay > max(
+            self.min_rebuild, self.rebuild_ratio * len(self._tree)
+        ):
+            self._start_rebuild()
+        return self._tree
+
+    def _start_rebuild(self):
+        self._edits = {}
+        self._rebuild_thread = threading.Thread(
+            target=self._rebuild,
+            args=(self._tree, dict(self._pending), set(self._stale)),
+            name="spatial-index-rebuild",
+            daemon=True,
+        )
+        self._rebuild_thread.start()
+
+    def _rebuild(self, tree, pending, stale):
+        """Fold an overlay into ``tree``'s points and swap in the new tree."""
+        try:
+            ids = array("q")
+            coords = (array("d"), array("d"), array("d"))
+            xs, ys, zs = tree.coords
+            for i, pk in enumerate(tree.ids):
+                if pk not in stale:
+                    ids.append(pk)
+                    coords[0].append(xs[i])
+                    coords[1].append(ys[i])
+                    coords[2].append(zs[i])
+            for pk, point in pending.items():
+                ids.append(pk)
+                for axis, value in zip(coords, point):
+                    axis.append(value)
+            rebuilt = KDTree(ids, coords)
+        except Exception:
+            logger.exception("Failed to rebuild the spatial index")
+            rebuilt = None
+        with self._lock:
+            # Unless the index was invalidated or reloaded in the meantime.
+            if rebuilt is not None and self._tree is tree:
+                self._tree = rebuilt
+                self._pending = {
+                    pk: point for pk, point in self._edits.items() if point is not None
+                }
+                self._stale = set(self._edits)
+                logger.info("Rebuilt spatial index over %s locations", len(rebuilt))
+            self._rebuild_thread = self._edits = None
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+            self._pending.clear()
+            self._stale.clear()
+
+    def upsert(self, pk, latitude, longitude):
+        with self._lock:
+            if self._tree is not None:
+                point = to_unit_vector(latitude, longitude)
+                self._stale.add(pk)
+                self._pending[pk] = point
+                if self._edits is not None:
+                    self._edits[pk] = point
+
+    def remove(self, pk):
+        with self._lock:
+            if self._tree is not None:
+                self._stale.add(pk)
+                self._pending.pop(pk, None)
+                if self._edits is not None:
+                    self._edits[pk] = None
+
+    def _scan_pending(self, point):
+        px, py, pz = point
+        for pk, (x, y, z) in self._pending.items():
+            yield (x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2, pk
+
+    def nearest(self, latitude, longitude, k):
+        """Return the ``k`` nearest ``(id, distance_m)`` pairs, nearest first."""
+        point = to_unit_vector(latitude, longitude)
+        with self._lock:
+            tree = self._ensure_fresh()
+            candidates = tree.nearest(point, k, skip=self._stale)
+            candidates.extend(self._scan_pending(point))
+        return [(pk, chord_to_metres(d)) for d, pk in heapq.nsmallest(k, candidates)]
+
+    def within(self, latitude, longitude, radius_m):
+        """Return ``(id, distance_m)`` pairs within ``radius_m``, nearest first."""
+        point = to_unit_vector(latitude, longitude)
+        chord = metres_to_chord(radius_m)
+        with self._lock:
+            tree = self._ensure_fresh()
+            found = tree.within(point, chord, skip=self._stale)
+            found.extend(
+                (d, pk) for d, pk in self._scan_pending(point) if d <= chord * chord
+            )
+        found.sort()
+        return [(pk, chord_to_metres(d)) for d, pk in found]
+
+
+spatial_index = SpatialIndex()
@@ -0,0 +1,128 @@
+"""
+Incremental sync of Location data for map clients.
+
+Every write gives the rows it touches a number from ``ChangeSequence``, and
+deletes leave a ``LocationTombstone`` with their number. A client that last
+synced at ``since`` asks for everything numbered after it and gets back the
+rows to upsert, the ids to drop and the number to resume from, so the cost
+of a refresh follows the number of edits rather than the size of the table.
+
+Numbers are handed out under a row lock held until commit, so they become
+visible in order and nothing numbered at or below a returned ``seq`` can
+appear later. Rows changed by one bulk write may share a number; a page
+always ends on a number boundary so a client never resumes from a number
+it only saw part of.
+
+Everything is read from the primary. The sequence lives there, and a
+replica that lags behind it would return a ``seq`` past rows it doesn't
+have yet; the client would skip them for good. The reads need no
+transaction (which on SQLite, with IMMEDIATE transactions, would take the
+write lock on every poll): the sequence is read first and every query is
+bounded by it, so a row changed in between has a number past the bound
+and is sent next time.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import ChangeSequence, Location, LocationTombstone
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("id", "name", "latitude", "longitude", "change_seq")
+
+
+def _rows(since, upper, limit=None):
+    rows = (
+        Location.objects.using(DEFAULT_DB_ALIAS)
+        .filter(change_seq__gt=since, change_seq__lte=upper)
+        .order_by("change_seq", "id")
+        .values_list(*FIELDS)
+    )
+    return list(rows if limit is None else rows[: limit + 1])
+
+
+def _tombstones(since, upper, limit=None):
+    tombstones = (
+        LocationTombstone.objects.using(DEFAULT_DB_ALIAS)
+        .filter(change_seq__gt=since, change_seq__lte=upper)
+        .order_by("change_seq", "location_id")
+        .values_list("location_id", "change_seq")
+    )
+    return list(tombstones if limit is None else tombstones[: limit + 1])
+
+
+def changes_since(since, limit):
+    """
+    Return the changes numbered after ``since``, about ``limit`` at a time.
+
+    The result holds the rows to upsert as ``(id, name, latitude,
+    longitude)`` tuples, the deleted ids, the ``seq`` to pass as ``since``
+    next time, and ``more`` when the page stopped short of the latest
+    change. With ``since`` of 0 the client has nothing to delete, so
+    tombstones are skipped. A ``since`` the server never handed out (the
+    database was restored or recreated) is answered from 0 with ``reset``
+    set, telling the client to drop what it has.
+    """
+    upper = ChangeSequence.current(using=DEFAULT_DB_ALIAS)
+    reset = since > upper
+    if reset:
+        logger.warning("Sync from %s is ahead of %s; resetting client", since, upper)
+        since = 0
+    rows = _rows(since, upper, limit)
+    tombstones = _tombstones(since, upper, limit) if since else []
+
+    # Each list holds its first limit + 1 changes, so everything numbered
+    # below the (limit + 1)th of the merged lists has been fetched.
+    seqs = sorted([row[-1] for row in rows] + [seq for _, seq in tombstones])
+    end = upper if len(seqs) <= limit else seqs[limit] - 1
+    if len(seqs) > limit and end <= since:
+        # The first number alone is over the limit; send all of it.
+        end = seqs[0]
+        rows = _rows(since, end)
+        tombstones = _tombstones(since, end) if since else []
+
+    rows = [row[:-1] for row in rows if row[-1] <= end]
+    deleted = [pk for pk, seq in tombstones if seq <= end]
+    logger.debug(
+        "Changes since %s: %d rows, %d deleted, up to %s of %s",
+        since,
+        len(rows),
+        len(deleted),
+        end,
+        upper,
+    )
+    return {
+        "seq": end,
+        "more": end < upper,
+        "reset": reset,
+        "rows": rows,
+        "deleted": deleted,
+    }
+
+
+def catch_up(index, since, limit):
+    """
+    Apply the changes numbered after ``since`` to an in-memory index with
+    ``upsert(pk, latitude, longitude)`` and ``remove(pk)`` methods.
+
+    Returns the ``seq`` to catch up from next time, or None when there were
+    more than ``limit`` changes or the sequence was reset, in which case
+    reloading the index is cheaper (or the only option).
+    """
+    applied = 0
+    more = True
+    while more:
+        changes = changes_since(since, settings.MAPPING_CHANGES_PAGE_SIZE)
+        applied += len(changes["rows"]) + len(changes["deleted"])
+        if changes["reset"] or applied > limit:
+            return None
+        for pk, _, latitude, longitude in changes["rows"]:
+            index.upsert(pk, latitude, longitude)
+        for pk in changes["deleted"]:
+            index.remove(pk)
+        since, more = changes["seq"], changes["more"]
+    logger.debug("Caught up %s with %d changes to %s", index, applied, since)
+    return since
@@ -1,15 +1,32 @@
+from functools import lru_cache
+
 from django import template
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
 register = template.Library()
 
 
 def decimal_to_dms(decimal_degrees):
-    """Convert decimal degrees to degrees, minutes, seconds."""
-    degrees = int(abs(decimal_degrees))
-    minutes_decimal = (abs(decimal_degrees) - degrees) * 60
-    minutes = int(minutes_decimal)
-    seconds = int((minutes_decimal - minutes) * 60)
-    return degrees, minutes, seconds
+    """
+    Convert decimal degrees to degrees, minutes, seconds.
+
+    Works on whole seconds so minutes and seconds can never reach 60; the
+    value is rounded to a microsecond of arc first so that floating-point
+    noise such as 2.3 -> 2.29999... does not drop a second.
+    """
+    total = int(round(abs(decimal_degrees) * 3600, 6))
+    return total // 3600, total % 3600 // 60, total % 60
+
+
+@lru_cache(maxsize=65536)
+def _format_dms(value, positive, negative):
+    direction = positive if value >= 0 else negative
+    degrees, minutes, seconds = decimal_to_dms(value)
+    return f"{degrees}°{minutes}'{seconds}\"{direction}"
 
 
 @register.filter
@@ -19,10 +36,7 @@ def format_latitude(value):
     Example: 40.7128 becomes 40°42'46"N
     """
     try:
-        float_value = float(value)
-        direction = "N" if float_value >= 0 else "S"
-        degrees, minutes, seconds = decimal_to_dms(float_value)
-        return f"{degrees}°{minutes}'{seconds}\"{direction}"
+        return _format_dms(float(value), "N", "S")
     except (ValueError, TypeError):
         return value
 
@@ -31,13 +45,10 @@ def format_latitude(value):
 def format_longitude(value):
     """
     Format longitude with E/W hemisphere.
-    Example: -74.0060 becomes 74°0'22"W
+    Example: -74.0060 becomes 74°0'21"W
     """
     try:
-        float_value = float(value)
-        direction = "E" if float_value >= 0 else "W"
-        degrees, minutes, seconds = decimal_to_dms(float_value)
-        return f"{degrees}°{minutes}'{seconds}\"{direction}"
+        return _format_dms(float(value), "E", "W")
     except (ValueError, TypeError):
         return value
 
@@ -46,8 +57,60 @@ def format_longitude(value):
 def format_coordinates(latitude, longitude):
     """
     Format both latitude and longitude together.
-    Example: (40.7128, -74.0060) becomes 40°42'46"N, 74°0'22"W
+    Example: (40.7128, -74.0060) becomes 40°42'46"N, 74°0'21"W
     """
     lat_str = format_latitude(latitude)
     lng_str = format_longitude(longitude)
     return f"{lat_str}, {lng_str}"
+
+
+def _format_dms_array(values, positive, negative):
+    values = np.asarray(values, dtype=float)
+    if not np.isfinite(values).all():
+        raise ValueError("Non-finite coordinate")
+    total = np.round(np.abs(values) * 3600, 6).astype(np.int64)
+    directions = np.where(values >= 0, positive, negative)
+    return [
+        f"{d}°{m}'{s}\"{h}"
+        for d, m, s, h in zip(
+            (total // 3600).tolist(),
+            (total % 3600 // 60).tolist(),
+            (total % 60).tolist(),
+            directions.tolist(),
+        )
+    ]
+
+
+def format_coordinates_batch(latitudes, longitudes):
+    """
+    Format many coordinate pairs at once, same output as format_coordinates.
+
+    With NumPy installed the degree/minute/second arithmetic runs over whole
+    arrays; otherwise each value goes through the memoised per-value path,
+    which is cheap when the same coordinates repeat.
+    """
+    latitudes, longitudes = list(latitudes), list(longitudes)
+    if np is not None:
+        try:
+            lat_strs = _format_dms_array(latitudes, "N", "S")
+            lng_strs = _format_dms_array(longitudes, "E", "W")
+        except (ValueError, TypeError):
+            pass  # Non-numeric values: fall back to the per-value filters.
+        else:
+            return [f"{lat}, {lng}" for lat, lng in zip(lat_strs, lng_strs)]
+    return [format_coordinates(lat, lng) for lat, lng in zip(latitudes, longitudes)]
+
+
+@register.filter
+def with_coordinates(locations):
+    """
+    Pair each location with its formatted coordinates in one batch.
+
+    Usage: {% for location, coordinates in locations|with_coordinates %}
+    """
+    locations = list(locations)
+    formatted = format_coordinates_batch(
+        [location.latitude for location in locations],
+        [location.longitude for location in locations],
+    )
+    return list(zip(locations, formatted))
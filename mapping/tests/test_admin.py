@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import ChangeSequence, Location, LocationTombstone
+from ..pagination import EstimatedCountPaginator, estimated_row_count
+from ..signals import locations_bulk_changed
+
+
+def make(name, latitude, longitude, description="A place"):
+    return Location(
+        name=name, description=description, latitude=latitude, longitude=longitude
+    )
+
+
+class LocationAdminTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+        self.dallas, self.austin, self.paris = Location.objects.bulk_create(
+            [
+                make("Dallas", 32.78, -96.80, "Big D"),
+                make("Austin", 30.27, -97.74, "Live music capital"),
+                make("Paris", 48.86, 2.35, "City of light"),
+            ]
+        )
+        self.url = reverse("admin:mapping_location_changelist")
+
+    def names(self, response):
+        return sorted(location.name for location in response.context["cl"].result_list)
+
+    def test_changelist(self):
+        """Test the changelist renders without a full-table count."""
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 3)
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+    def test_search_uses_text_index(self):
+        """Test that search matches word prefixes in name and description."""
+        response = self.client.get(self.url, {"q": "mus"})
+        self.assertEqual(self.names(response), ["Austin"])
+        response = self.client.get(self.url, {"q": "!!"})
+        self.assertEqual(self.names(response), [])
+
+    def test_bbox_filter(self):
+        """Test region and custom bounding-box filtering."""
+        response = self.client.get(self.url, {"bbox": "35.0,-25.0,72.0,45.0"})
+        self.assertEqual(self.names(response), ["Paris"])
+        response = self.client.get(self.url, {"bbox": "30,-98,33,-96"})
+        self.assertEqual(self.names(response), ["Austin", "Dallas"])
+        response = self.client.get(self.url, {"bbox": "north-ish"})
+        self.assertRedirects(response, f"{self.url}?e=1", fetch_redirect_response=False)
+
+    def test_delete_in_bulk(self):
+        """Test the confirmation page and the set-based delete."""
+        data = {
+            "action": "delete_in_bulk",
+            helpers.ACTION_CHECKBOX_NAME: [self.dallas.pk, self.austin.pk],
+            "index": 0,
+        }
+        response = self.client.post(self.url, data)
+        self.assertContains(response, "delete 2 locations")
+        self.assertEqual(Location.objects.count(), 3)
+
+        del data["index"]
+        data["post"] = "yes"
+        with mock.patch.object(locations_bulk_changed, "send") as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, data)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        send.assert_called_once_with(sender=Location)
+        self.assertEqual(list(Location.objects.all()), [self.paris])
+        seq = ChangeSequence.current()
+        tombstones = LocationTombstone.objects.order_by("location_id")
+        self.assertEqual(
+            [(t.location_id, t.change_seq) for t in tombstones],
+            [(self.dallas.pk, seq), (self.austin.pk, seq)],
+        )
+
+    def test_delete_across_filter(self):
+        """Test that "select all" deletes every row matching the filter."""
+        data = {
+            "action": "delete_in_bulk",
+            helpers.ACTION_CHECKBOX_NAME: [self.dallas.pk],
+            "select_across": "1",
+            "post": "yes",
+        }
+        self.client.post(f"{self.url}?bbox=30,-98,33,-96", data)
+        self.assertEqual(list(Location.objects.all()), [self.paris])
+
+    def test_resend_to_clients(self):
+        """Test that resending gives the selection one new change number."""
+        before = ChangeSequence.current()
+        data = {
+            "action": "resend_to_clients",
+            helpers.ACTION_CHECKBOX_NAME: [self.dallas.pk, self.paris.pk],
+            "index": 0,
+        }
+        self.client.post(self.url, data)
+        self.assertEqual(
+            set(
+                Location.objects.filter(change_seq__gt=before).values_list(
+                    "name", flat=True
+                )
+            ),
+            {"Dallas", "Paris"},
+        )
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        Location.objects.bulk_create([make(f"Place {i}", i, i) for i in range(20)])
+
+    def test_estimate(self):
+        """Test that ANALYZE statistics stand in for the count once large."""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimated_row_count(Location), 20)
+        queryset = Location.objects.all()
+        with override_settings(MAPPING_ADMIN_COUNT_LIMIT=10):
+            Location.objects.bulk_create([make("Unanalyzed", 0, 0)])
+            self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 20)
+            filtered = queryset.filter(latitude__lt=15)
+            self.assertEqual(EstimatedCountPaginator(filtered, 5).count, 10)
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 21)
@@ -0,0 +1,100 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Location
+
+
+class AsyncLocationViewsTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        self.sydney = Location.objects.create(
+            name="Sydney", description="", latitude=-33.8688, longitude=151.2093
+        )
+
+    async def test_location_list(self):
+        """Test the async list view renders the first page."""
+        response = await self.async_client.get(reverse("async_location_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "mapping/location_list.html")
+        self.assertEqual(
+            list(response.context["locations"]), [self.dallas, self.sydney]
+        )
+        self.assertIn("ETag", response)
+
+    @override_settings(MAPPING_PAGE_SIZE=1)
+    async def test_location_list_api_paginated(self):
+        """Test that the async list API follows the next-page cursor."""
+        url = reverse("async_location_list_api")
+        data = json.loads((await self.async_client.get(url)).content)
+        self.assertEqual([r["id"] for r in data["results"]], [self.dallas.pk])
+        data = json.loads(
+            (await self.async_client.get(url, {"after": data["next"]})).content
+        )
+        self.assertEqual([r["id"] for r in data["results"]], [self.sydney.pk])
+        self.assertIsNone(data["next"])
+
+        response = await self.async_client.get(url, {"after": "???"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_location_detail_api(self):
+        """Test the async detail view and its 404."""
+        response = await self.async_client.get(
+            reverse("async_location_detail_api", args=[self.dallas.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {
+                "id": self.dallas.pk,
+                "name": "Dallas",
+                "description": "Big D",
+                "lat": 32.7767,
+                "lng": -96.797,
+            },
+        )
+        response = await self.async_client.get(
+            reverse("async_location_detail_api", args=[self.sydney.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_location_markers(self):
+        """Test the async markers view matches the sync one."""
+        params = {"south": 30, "west": -100, "north": 35, "east": -90}
+        response = await self.async_client.get(
+            reverse("async_location_markers"), params
+        )
+        self.assertEqual(response.status_code, 200)
+        sync_response = await self.async_client.get(reverse("location_markers"), params)
+        self.assertEqual(
+            json.loads(response.content), json.loads(sync_response.content)
+        )
+        self.assertEqual(
+            [m["id"] for m in json.loads(response.content)["markers"]],
+            [self.dallas.pk],
+        )
+
+    @override_settings(MAPPING_EXPORT_CHUNK_SIZE=1)
+    async def test_location_export(self):
+        """Test the async export streams every row across several chunks."""
+        response = await self.async_client.get(
+            reverse("async_location_export"), {"format": "ndjson"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(
+            [json.loads(line)["id"] for line in body.splitlines()],
+            [self.dallas.pk, self.sydney.pk],
+        )
+
+        response = await self.async_client.get(
+            reverse("async_location_export"), {"format": "xml"}
+        )
+        self.assertEqual(response.status_code, 400)
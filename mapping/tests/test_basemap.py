@@ -0,0 +1,136 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from ..basemap import SingleFlight, TileNotFound, UpstreamError, basemap_cache, get_tile
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """Stand-in tile server: /z/x/y.png returns a fake tile, z > 5 is missing."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        time.sleep(self.server.delay)
+        z, x, y = self.path.strip("/").removesuffix(".png").split("/")
+        if int(z) > 5:
+            self.send_error(404)
+            return
+        if int(z) == 5:
+            self.send_error(500)
+            return
+        body = f"PNG {z}/{x}/{y} ".encode() * 10
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BasemapTestMixin:
+    def setUp(self):
+        """Start a local upstream tile server and use a temporary cache."""
+        self.upstream = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+        self.upstream.requests = []
+        self.upstream.delay = 0
+        thread = threading.Thread(
+            target=self.upstream.serve_forever, args=(0.01,), daemon=True
+        )
+        thread.start()
+        self.addCleanup(self.upstream.server_close)
+        self.addCleanup(self.upstream.shutdown)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        port = self.upstream.server_address[1]
+        overrides = override_settings(
+            MAPPING_BASEMAP_UPSTREAM=f"http://127.0.0.1:{port}/{{z}}/{{x}}/{{y}}.png",
+            MAPPING_BASEMAP_CACHE_DIR=cache_dir.name,
+            MAPPING_BASEMAP_TIMEOUT=5,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+class BasemapCacheTest(BasemapTestMixin, SimpleTestCase):
+    def test_fetch_then_cache(self):
+        """Test that a tile is fetched once and then read from disk."""
+        data = get_tile(3, 1, 2)
+        self.assertTrue(data.startswith(b"PNG 3/1/2"))
+        self.assertEqual(get_tile(3, 1, 2), data)
+        self.assertEqual(self.upstream.requests, ["/3/1/2.png"])
+        self.assertEqual(basemap_cache.path(3, 1, 2).read_bytes(), data)
+
+    def test_concurrent_requests_share_one_fetch(self):
+        """Test that concurrent misses for one tile make one upstream request."""
+        self.upstream.delay = 0.2
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: get_tile(2, 1, 1), range(8)))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.upstream.requests, ["/2/1/1.png"])
+
+    def test_lru_eviction(self):
+        """Test that the least recently used tiles are evicted over the limit."""
+        size = len(get_tile(1, 0, 0))
+        with override_settings(MAPPING_BASEMAP_CACHE_MAX_BYTES=size * 2):
+            get_tile(1, 0, 1)
+            get_tile(1, 0, 0)  # Now more recent than 0/1.
+            get_tile(1, 1, 0)
+            self.assertLessEqual(basemap_cache.size, size * 2)
+        self.assertTrue(basemap_cache.path(1, 0, 0).exists())
+        self.assertFalse(basemap_cache.path(1, 0, 1).exists())
+        self.assertTrue(basemap_cache.path(1, 1, 0).exists())
+
+    def test_upstream_errors(self):
+        """Test missing tiles and upstream failures are not cached."""
+        with self.assertRaises(TileNotFound):
+            get_tile(6, 0, 0)
+        with self.assertRaises(UpstreamError):
+            get_tile(5, 0, 0)
+        self.assertFalse(basemap_cache.path(5, 0, 0).exists())
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_error_shared_and_key_released(self):
+        """Test that waiters get the leader's error and the key is reusable."""
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flights.do("key", fail)
+        self.assertEqual(flights.do("key", lambda: 1), 1)
+
+
+class BasemapViewTest(BasemapTestMixin, SimpleTestCase):
+    def test_tile_view(self):
+        """Test that tiles are served as PNG with long-lived cache headers."""
+        response = self.client.get(reverse("basemap_tile", args=[3, 1, 2]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=604800", response["Cache-Control"])
+        self.assertTrue(response.content.startswith(b"PNG 3/1/2"))
+
+    def test_tile_view_errors(self):
+        """Test out-of-range, missing and failing tiles."""
+        url = reverse("basemap_tile", args=[2, 4, 0])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse("basemap_tile", args=[6, 0, 0])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse("basemap_tile", args=[5, 0, 0])
+        self.assertEqual(self.client.get(url).status_code, 502)
+
+    @override_settings(MAPPING_BASEMAP_UPSTREAM="http://127.0.0.1:9/{z}/{x}/{y}.png")
+    def test_upstream_down(self):
+        """Test that an unreachable upstream is a 502."""
+        url = reverse("basemap_tile", args=[1, 0, 0])
+        self.assertEqual(self.client.get(url).status_code, 502)
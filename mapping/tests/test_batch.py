@@ -0,0 +1,189 @@
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import batch
+from ..clustering import cluster_index
+from ..geo import BoundingBox
+from ..models import Location
+from ..signals import locations_bulk_changed, locations_changed
+from ..spatial import spatial_index
+
+
+class LocationBatchViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        self.sydney = Location.objects.create(
+            name="Sydney", description="Harbour", latitude=-33.8688, longitude=151.2093
+        )
+        self.url = reverse("location_batch")
+
+    def post(self, operations):
+        return self.client.post(
+            self.url, json.dumps({"operations": operations}), "application/json"
+        )
+
+    def connect(self, signal):
+        receiver = mock.Mock()
+        signal.connect(receiver)
+        self.addCleanup(signal.disconnect, receiver)
+        return receiver
+
+    def test_mixed_batch(self):
+        """Test creates, updates and deletes applied together."""
+        bulk_receiver = self.connect(locations_bulk_changed)
+        receiver = self.connect(locations_changed)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertNumQueries(11):
+                response = self.post(
+                    [
+                        {
+                            "op": "create",
+                            "data": {
+                                "name": "Austin",
+                                "description": "Capital",
+                                "latitude": 30.27,
+                                "longitude": -97.74,
+                            },
+                        },
+                        {
+                            "op": "update",
+                            "id": self.dallas.pk,
+                            "data": {"latitude": 33.0},
+                        },
+                        {"op": "delete", "id": self.sydney.pk},
+                    ]
+                )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results], ["created", "updated", "deleted"]
+        )
+        austin = Location.objects.get(name="Austin")
+        self.assertEqual(results[0]["id"], austin.pk)
+        self.assertNotEqual(austin.geohash, "")
+
+        self.dallas.refresh_from_db()
+        self.assertEqual(self.dallas.latitude, 33.0)
+        self.assertEqual(self.dallas.description, "Big D")
+        self.assertFalse(Location.objects.filter(pk=self.sydney.pk).exists())
+
+        # One callback for the whole batch, none from per-row delete signals.
+        self.assertEqual(len(callbacks), 1)
+        bulk_receiver.assert_not_called()
+        receiver.assert_called_once()
+        self.assertEqual(
+            receiver.call_args.kwargs["changes"],
+            [
+                (self.dallas.pk, "Dallas", (32.7767, -96.7970), (33.0, -96.7970)),
+                (self.sydney.pk, None, (-33.8688, 151.2093), None),
+                (austin.pk, "Austin", None, (30.27, -97.74)),
+            ],
+        )
+
+    def test_derived_state_updated_in_place(self):
+        """Test that a batch edits the in-memory indexes instead of dropping them."""
+        for index in (spatial_index, cluster_index):
+            index.invalidate()
+            self.addCleanup(index.invalidate)
+        spatial_index.nearest(0, 0, 1)
+        tree = spatial_index._tree
+        world = BoundingBox(-85, -180, 85, 180)
+        cluster_index.query(world, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(
+                [
+                    {
+                        "op": "update",
+                        "id": self.sydney.pk,
+                        "data": {"latitude": 32.78, "longitude": -96.8},
+                    },
+                    {"op": "delete", "id": self.dallas.pk},
+                ]
+            )
+        self.assertIs(spatial_index._tree, tree)
+        nearest = spatial_index.nearest(32.7767, -96.7970, 2)
+        self.assertEqual([pk for pk, _ in nearest], [self.sydney.pk])
+        clusters = cluster_index.query(BoundingBox(30, -100, 35, -90), 10)
+        self.assertEqual([count for _, _, count in clusters], [1])
+        self.assertEqual(sum(count for _, _, count in cluster_index.query(world, 0)), 1)
+
+    def test_update_keeps_concurrent_edits(self):
+        """Test that fields an update didn't give aren't overwritten."""
+        plan, results, ok = batch.validate(
+            [{"op": "update", "id": self.dallas.pk, "data": {"latitude": 33.0}}], 10
+        )
+        self.assertTrue(ok)
+        Location.objects.filter(pk=self.dallas.pk).update(description="Edited")
+        self.assertTrue(batch.apply(plan, results)[1])
+        self.dallas.refresh_from_db()
+        self.assertEqual(self.dallas.description, "Edited")
+        self.assertEqual(self.dallas.latitude, 33.0)
+
+    def test_update_of_location_deleted_meanwhile(self):
+        """Test that an update to a row deleted since validation writes nothing."""
+        plan, results, ok = batch.validate(
+            [
+                {"op": "update", "id": self.dallas.pk, "data": {"name": "Big D"}},
+                {"op": "delete", "id": self.sydney.pk},
+            ],
+            10,
+        )
+        Location.objects.filter(pk=self.dallas.pk).delete_in_bulk()
+        results, ok = batch.apply(plan, results)
+        self.assertFalse(ok)
+        self.assertEqual(results[0]["status"], "invalid")
+        self.assertTrue(Location.objects.filter(pk=self.sydney.pk).exists())
+
+    def test_invalid_item_rejects_whole_batch(self):
+        """Test that one invalid operation means nothing is written."""
+        response = self.post(
+            [
+                {
+                    "op": "create",
+                    "data": {
+                        "name": "Austin",
+                        "description": "Capital",
+                        "latitude": 30.27,
+                        "longitude": -97.74,
+                    },
+                },
+                {"op": "update", "id": self.dallas.pk, "data": {"latitude": 91}},
+                {"op": "delete", "id": 999},
+                {"op": "delete", "id": self.sydney.pk},
+                {"op": "delete", "id": self.sydney.pk},
+                {"op": "rename"},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["created", "invalid", "invalid", "deleted", "invalid", "invalid"],
+        )
+        self.assertIn("latitude", results[1]["errors"])
+        self.assertEqual(results[2]["errors"], {"id": ["Location not found"]})
+        self.assertFalse(Location.objects.filter(name="Austin").exists())
+        self.assertEqual(Location.objects.count(), 2)
+
+    @override_settings(MAPPING_BATCH_MAX_OPERATIONS=2)
+    def test_malformed_batches(self):
+        """Test bodies that are not a usable list of operations."""
+        self.assertEqual(
+            self.client.post(self.url, "nope", "application/json").status_code, 400
+        )
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({"op": "delete"}).status_code, 400)
+        response = self.post([{"op": "delete", "id": self.dallas.pk}] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("At most 2", response.json()["error"])
+
+    def test_get_not_allowed(self):
+        """Test that the batch endpoint only accepts POST."""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
@@ -0,0 +1,147 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..cache import VERSION_KEY, DataVersionWatch, bump_data_version, get_data_version
+from ..models import Location
+from ..signals import locations_bulk_changed
+
+
+class DataVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_initialised_and_bumped(self):
+        """Test that the version starts from the clock and only increases."""
+        version, last_modified = get_data_version()
+        self.assertEqual(get_data_version(), (version, last_modified))
+        self.assertEqual(bump_data_version(), version + 1)
+        self.assertEqual(get_data_version()[0], version + 1)
+
+    def test_version_survives_eviction(self):
+        """Test that a lost counter restarts above every earlier value."""
+        version = bump_data_version()
+        cache.clear()
+        self.assertGreater(get_data_version()[0], version)
+
+    def test_bumped_on_commit(self):
+        """Test that saves and deletes bump the version after commit."""
+        version, _ = get_data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+            )
+        self.assertEqual(get_data_version()[0], version + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            location.delete()
+        self.assertEqual(get_data_version()[0], version + 2)
+
+    def test_bumped_on_bulk_change(self):
+        """Test that bulk writes bump the version."""
+        version, _ = get_data_version()
+        locations_bulk_changed.send(sender=Location)
+        self.assertEqual(get_data_version()[0], version + 1)
+
+    def test_watch_ignores_own_changes(self):
+        """Test that only bumps made by another process count as changes."""
+        watch = DataVersionWatch()
+        self.assertFalse(watch.changed_elsewhere())
+        watch.start()
+        bump_data_version()
+        self.assertFalse(watch.changed_elsewhere())
+        cache.incr(VERSION_KEY)
+        bump_data_version()
+        self.assertTrue(watch.changed_elsewhere())
+        self.assertFalse(watch.changed_elsewhere())
+
+
+class VersionedResponseCacheTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.url = reverse("location_list")
+
+    def test_etag_and_last_modified(self):
+        """Test that cached views send validators and require revalidation."""
+        response = self.client.get(self.url)
+        version, last_modified = get_data_version()
+        self.assertTrue(response["ETag"].startswith(f'"{version}-'))
+        self.assertEqual(response["Last-Modified"], http_date(last_modified))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_if_none_match_returns_304_without_queries(self):
+        """Test that a matching ETag is answered without the database."""
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since_returns_304(self):
+        """Test that an If-Modified-Since after the version is answered with 304."""
+        self.client.get(self.url)
+        _, last_modified = get_data_version()
+        response = self.client.get(
+            self.url, headers={"If-Modified-Since": http_date(last_modified + 1)}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_same_second(self):
+        """Test that a date shared by two versions is not answered with 304."""
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Austin", description="", latitude=30.2672, longitude=-97.7431
+            )
+        response = self.client.get(
+            self.url, headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Austin")
+
+    def test_if_none_match_wins_over_if_modified_since(self):
+        """Test that If-Modified-Since is ignored when an ETag is sent."""
+        _, last_modified = get_data_version()
+        response = self.client.get(
+            self.url,
+            headers={
+                "If-None-Match": '"stale"',
+                "If-Modified-Since": http_date(last_modified + 60),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_body_served_without_queries(self):
+        """Test that a repeat request is served from the response cache."""
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_new_version_invalidates(self):
+        """Test that bumping the version re-renders with fresh data."""
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Austin", description="", latitude=30.2672, longitude=-97.7431
+            )
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "Austin")
+
+    def test_json_views_cached_per_url(self):
+        """Test that different query strings get different entries."""
+        url = reverse("location_markers")
+        inside = self.client.get(
+            url, {"south": 30, "west": -100, "north": 35, "east": -90}
+        )
+        outside = self.client.get(url, {"south": 0, "west": 0, "north": 1, "east": 1})
+        self.assertNotEqual(inside["ETag"], outside["ETag"])
+        self.assertEqual(len(inside.json()["markers"]), 1)
+        self.assertEqual(outside.json()["markers"], [])
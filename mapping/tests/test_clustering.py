@@ -0,0 +1,148 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..cache import VERSION_KEY, get_data_version
+from ..clustering import GridClusterIndex, cluster_index
+from ..geo import BoundingBox
+from ..models import Location
+
+WORLD = BoundingBox(-85, -180, 85, 180)
+
+
+class GridClusterIndexTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.index = GridClusterIndex(max_zoom=10, cell_size=64)
+        for i in range(3):
+            Location.objects.create(
+                name=f"Dallas {i}",
+                description="",
+                latitude=32.7767 + i * 0.001,
+                longitude=-96.7970,
+            )
+        Location.objects.create(
+            name="Sydney", description="", latitude=-33.8688, longitude=151.2093
+        )
+
+    def test_low_zoom_clusters(self):
+        """Test that nearby points are grouped into one cluster."""
+        clusters = sorted(self.index.query(WORLD, 2), key=lambda c: c[2])
+        self.assertEqual([count for _, _, count in clusters], [1, 3])
+        latitude, longitude, _ = clusters[1]
+        self.assertAlmostEqual(latitude, 32.7777)
+        self.assertAlmostEqual(longitude, -96.7970)
+
+    def test_query_limited_to_bbox(self):
+        """Test that clusters outside the viewport are skipped."""
+        clusters = self.index.query(BoundingBox(-40, 140, -30, 160), 8)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0][2], 1)
+
+    def test_query_across_antimeridian(self):
+        """Test a viewport that wraps past 180 degrees."""
+        clusters = self.index.query(BoundingBox(-40, 140, -30, 200), 4)
+        self.assertEqual([count for _, _, count in clusters], [1])
+
+    def test_add_and_remove(self):
+        """Test incremental updates across every zoom level."""
+        self.index.query(WORLD, 0)
+        self.index.add(-33.87, 151.21)
+        self.assertEqual(sum(c for _, _, c in self.index.query(WORLD, 0)), 5)
+        self.assertEqual(sum(c for _, _, c in self.index.query(WORLD, 10)), 5)
+        self.index.remove(-33.87, 151.21)
+        self.index.remove(-33.8688, 151.2093)
+        self.assertEqual(len(self.index.query(BoundingBox(-40, 140, -30, 160), 10)), 0)
+
+    def test_reloads_after_other_processes_change(self):
+        """Test that edits committed elsewhere rebuild the index."""
+        get_data_version()
+        self.index.query(WORLD, 0)
+        # Written without this process's on_commit hooks, as another worker.
+        Location.objects.filter(name="Sydney").delete_in_bulk()
+        cache.incr(VERSION_KEY)
+        self.assertEqual(sum(c for _, _, c in self.index.query(WORLD, 0)), 3)
+
+
+class ClusterSignalsTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cluster_index.invalidate()
+        self.location = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        cluster_index.query(WORLD, 0)
+
+    def tearDown(self):
+        cluster_index.invalidate()
+
+    def total(self):
+        return sum(count for _, _, count in cluster_index.query(WORLD, 0))
+
+    def test_create_updates_index(self):
+        """Test that creating a location adds it to the loaded index."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Austin", description="", latitude=30.2672, longitude=-97.7431
+            )
+        self.assertEqual(self.total(), 2)
+
+    def test_move_updates_index(self):
+        """Test that moving a location moves it between cells."""
+        location = Location.objects.get(pk=self.location.pk)
+        location.latitude, location.longitude = -33.8688, 151.2093
+        with self.captureOnCommitCallbacks(execute=True):
+            location.save()
+        clusters = cluster_index.query(BoundingBox(-40, 140, -30, 160), 10)
+        self.assertEqual([count for _, _, count in clusters], [1])
+        self.assertEqual(self.total(), 1)
+
+    def test_delete_updates_index(self):
+        """Test that deleting a location removes it from the index."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.delete()
+        self.assertEqual(self.total(), 0)
+
+
+class ClusterViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        cluster_index.invalidate()
+        self.location = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.params = {"south": 30, "west": -100, "north": 35, "east": -90}
+
+    def tearDown(self):
+        cluster_index.invalidate()
+
+    def test_clusters_at_low_zoom(self):
+        """Test that the view returns clusters below the max cluster zoom."""
+        response = self.client.get(
+            reverse("location_clusters"), {**self.params, "zoom": 5}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["markers"], [])
+        self.assertEqual([c["count"] for c in data["clusters"]], [1])
+
+    def test_markers_at_high_zoom(self):
+        """Test that the view returns markers past the max cluster zoom."""
+        response = self.client.get(
+            reverse("location_clusters"), {**self.params, "zoom": 18}
+        )
+        data = response.json()
+        self.assertEqual(data["clusters"], [])
+        self.assertEqual([m["id"] for m in data["markers"]], [self.location.pk])
+
+    def test_missing_zoom(self):
+        """Test the cluster view without a zoom level."""
+        response = self.client.get(reverse("location_clusters"), self.params)
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_bbox(self):
+        """Test that infinite or NaN longitudes are a 400, not a 500."""
+        params = {**self.params, "west": "inf", "east": "inf", "zoom": 3}
+        response = self.client.get(reverse("location_clusters"), params)
+        self.assertEqual(response.status_code, 400)
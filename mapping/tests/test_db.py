@@ -0,0 +1,48 @@
+import tempfile
+from pathlib import Path
+
+from django.db import connections
+from django.test import TestCase, override_settings
+
+
+class ConfigureSQLiteTest(TestCase):
+    def setUp(self):
+        """Open a file-backed SQLite connection with the project settings."""
+        connection = connections["default"]
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite-specific")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wrapper = connection.__class__(
+            {**connection.settings_dict, "NAME": str(Path(directory.name) / "db")}
+        )
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        """Test that new connections get WAL mode and the other pragmas."""
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertGreater(self.pragma("mmap_size"), 0)
+
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 250})
+    def test_pragmas_from_settings(self):
+        """Test that SQLITE_PRAGMAS controls what is applied."""
+        self.assertEqual(self.pragma("busy_timeout"), 250)
+        self.assertEqual(self.pragma("journal_mode"), "delete")
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "wal; DROP TABLE x"})
+    def test_invalid_pragma_rejected(self):
+        """Test that pragma values can't carry extra SQL."""
+        with self.assertRaises(ValueError):
+            self.wrapper.ensure_connection()
+
+    def test_immediate_transactions(self):
+        """Test that transactions take the write lock when they start."""
+        self.wrapper.ensure_connection()
+        self.assertEqual(self.wrapper.transaction_mode, "IMMEDIATE")
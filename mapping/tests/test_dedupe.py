@@ -0,0 +1,151 @@
+import io
+import math
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from .. import geohash
+from ..dedupe import (
+    METRES_PER_DEGREE,
+    find_duplicate_clusters,
+    find_near_duplicates,
+    names_similar,
+    normalize_name,
+    search_precision,
+)
+from ..models import Location, LocationTombstone
+from ..signals import locations_bulk_changed
+
+# About 10 m of latitude.
+TEN_METRES = 10 / METRES_PER_DEGREE
+
+
+def make(name, latitude, longitude, description=""):
+    return Location(
+        name=name, description=description, latitude=latitude, longitude=longitude
+    )
+
+
+class DedupeHelpersTest(SimpleTestCase):
+    def test_normalize_name(self):
+        """Test that case, accents and punctuation are ignored."""
+        self.assertEqual(normalize_name("  Café  DU-Monde! "), "cafe du monde")
+
+    def test_names_similar(self):
+        """Test the similarity threshold."""
+        self.assertTrue(names_similar("cafe du monde", "cafe du monde", 0.85))
+        self.assertTrue(names_similar("starbucks coffee", "starbuck coffee", 0.85))
+        self.assertFalse(names_similar("test location", "new location", 0.85))
+
+    def test_search_precision(self):
+        """Test that cells are at least the radius across, even near the poles."""
+        for latitude in (0, 45, 80):
+            for radius in (5, 50, 5000):
+                precision = search_precision(latitude, radius)
+                height, width = geohash.cell_size(precision)
+                shrink = math.cos(math.radians(latitude))
+                self.assertGreaterEqual(height * METRES_PER_DEGREE, radius)
+                self.assertGreaterEqual(width * shrink * METRES_PER_DEGREE, radius)
+        self.assertLess(search_precision(80, 50), search_precision(0, 50))
+
+    def test_find_duplicate_clusters(self):
+        """Test clustering by distance and name, across the antimeridian."""
+        rows = [
+            (1, "Harbor Cafe", 10.0, 20.0),
+            (2, "Harbour Cafe", 10.0 + TEN_METRES, 20.0),
+            (3, "Harbor Cafe", 10.0 + 20 * TEN_METRES, 20.0),
+            (4, "Fish Market", 10.0, 20.0),
+            (5, "Date Line Inn", 0.0, 179.99995),
+            (6, "Dateline Inn", 0.0, -179.99995),
+        ]
+        self.assertEqual(find_duplicate_clusters(rows, 50, 0.85), [[1, 2], [5, 6]])
+        self.assertEqual(find_duplicate_clusters(rows, 50, 0.99), [])
+
+    def test_clusters_are_transitive(self):
+        """Test that a chain of matches makes one cluster."""
+        rows = [(i, "Kiosk", i * 4 * TEN_METRES, 0.0) for i in range(5)]
+        self.assertEqual(find_duplicate_clusters(rows, 50, 0.85), [[0, 1, 2, 3, 4]])
+
+
+class FindNearDuplicatesTest(TestCase):
+    def test_find_near_duplicates(self):
+        """Test that only close, similarly named rows match, nearest first."""
+        near, nearer, _, _ = Location.objects.bulk_create(
+            [
+                make("Harbor Cafe", 32.0 + 3 * TEN_METRES, -96.0),
+                make("Harbor Café", 32.0 + TEN_METRES, -96.0),
+                make("Harbor Cafe", 32.0 + 10 * TEN_METRES, -96.0),
+                make("Fish Market", 32.0, -96.0),
+            ]
+        )
+        found = find_near_duplicates(
+            Location.objects.all(), "harbor cafe", 32.0, -96.0, 50, 0.85
+        )
+        self.assertEqual([location for location, _ in found], [nearer, near])
+        self.assertAlmostEqual(found[0][1], 10, delta=0.1)
+
+    def test_find_near_duplicates_across_pole(self):
+        """Test that matches on the far side of a pole are found."""
+        across, _ = Location.objects.bulk_create(
+            [
+                make("Pole Station", 89.9999, -170.0),
+                make("Pole Station", 89.99, 10.0),
+            ]
+        )
+        found = find_near_duplicates(
+            Location.objects.all(), "Pole Station", 89.9999, 10.0, 50, 0.85
+        )
+        self.assertEqual([location for location, _ in found], [across])
+        self.assertAlmostEqual(found[0][1], 22.2, delta=0.1)
+
+
+class DedupeLocationsCommandTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.keeper, self.copy, self.other_copy, self.fish = (
+            Location.objects.bulk_create(
+                [
+                    make("Harbor Cafe", 10.0, 20.0),
+                    make("Harbour Cafe", 10.0 + TEN_METRES, 20.0, "Good coffee"),
+                    make("harbor cafe.", 10.0, 20.0 + TEN_METRES / 2, "Coffee"),
+                    make("Fish Market", 10.0, 20.0, "Fresh fish"),
+                ]
+            )
+        )
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command("dedupe_locations", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_dry_run(self):
+        """Test that clusters are reported without changing anything."""
+        output = self.call("--verbosity", "2")
+        self.assertIn(f"{self.keeper.pk} {self.copy.pk} {self.other_copy.pk}", output)
+        self.assertIn("Found 1 clusters with 2 duplicates", output)
+        self.assertEqual(Location.objects.count(), 4)
+
+    def test_merge(self):
+        """Test that each cluster is merged into its oldest location."""
+        with mock.patch.object(locations_bulk_changed, "send") as send:
+            output = self.call("--merge", "--batch-size", "1")
+        self.assertIn("removing 2 duplicates", output)
+        send.assert_called_once_with(sender=Location)
+        self.assertEqual(
+            list(Location.objects.order_by("pk")), [self.keeper, self.fish]
+        )
+        self.keeper.refresh_from_db()
+        self.assertEqual(self.keeper.description, "Good coffee")
+        self.assertEqual(
+            set(LocationTombstone.objects.values_list("location_id", flat=True)),
+            {self.copy.pk, self.other_copy.pk},
+        )
+        self.assertIn("Found 0 clusters", self.call())
+
+    def test_invalid_options(self):
+        """Test that out-of-range options are rejected."""
+        with self.assertRaises(CommandError):
+            self.call("--similarity", "1.5")
+        with self.assertRaises(CommandError):
+            self.call("--radius", "0")
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..async_views import _event_stream
+from ..events import (
+    RESYNC,
+    Broker,
+    ChangesBackend,
+    Event,
+    Subscription,
+    broker,
+    deleted_event,
+    location_event,
+)
+from ..models import ChangeSequence, Location
+from ..signals import locations_bulk_changed
+
+
+def event(event_type, pk):
+    return location_event(event_type, pk, f"Place {pk}", 1.0, 2.0)
+
+
+def payloads(events):
+    return [event.payload for event in events]
+
+
+class SubscriptionTest(SimpleTestCase):
+    def subscribe(self):
+        """Return a subscription on the running loop holding at most 3 events."""
+        return Subscription(Broker(), asyncio.get_running_loop(), max_pending=3)
+
+    async def test_coalesces_per_location(self):
+        """Test that only the latest event per location is kept."""
+        subscription = self.subscribe()
+        subscription.push(Event(event("created", 1)))
+        subscription.push(Event(event("updated", 2)))
+        subscription.push(Event({**event("updated", 1), "name": "Renamed"}))
+        subscription.push(Event(deleted_event(2)))
+        events = payloads(await subscription.get(0))
+        self.assertEqual(
+            [(e["type"], e["id"]) for e in events], [("created", 1), ("deleted", 2)]
+        )
+        self.assertEqual(events[0]["name"], "Renamed")
+        self.assertEqual(await subscription.get(0), [])
+
+    async def test_overflow_becomes_resync(self):
+        """Test that a client too far behind gets one resync event."""
+        subscription = self.subscribe()
+        for pk in range(4):
+            subscription.push(Event(event("updated", pk)))
+        subscription.push(Event(event("updated", 9)))
+        self.assertEqual(payloads(await subscription.get(0)), [RESYNC])
+        self.assertEqual(subscription.dropped, 4)
+
+    async def test_get_waits_for_events(self):
+        """Test that get() wakes up when an event arrives."""
+        subscription = self.subscribe()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, subscription.push, Event(event("updated", 1)))
+        events = await subscription.get(5)
+        self.assertEqual(len(events), 1)
+
+
+class BrokerTest(SimpleTestCase):
+    async def test_dispatch_from_another_thread(self):
+        """Test that events published off the loop reach every subscriber."""
+        broker = Broker()
+        first, second = broker.subscribe(), broker.subscribe()
+        self.assertEqual(broker.subscriber_count, 2)
+        thread = threading.Thread(target=broker.publish, args=(event("updated", 1),))
+        thread.start()
+        thread.join()
+        for subscription in (first, second):
+            self.assertEqual(len(await subscription.get(5)), 1)
+        # A burst published before the loop runs is coalesced on the way in.
+        broker.dispatch(*(event("updated", pk % 2) for pk in range(10)))
+        self.assertEqual(
+            [e["id"] for e in payloads(await first.get(5))],
+            [0, 1],
+        )
+        first.close()
+        second.close()
+        self.assertEqual(broker.subscriber_count, 0)
+
+    async def test_backend_runs_while_subscribed(self):
+        """Test that the backend is started by the first subscriber only."""
+        broker = Broker()
+        backend = mock.Mock()
+        with mock.patch("mapping.events.import_string", return_value=backend):
+            subscriptions = [broker.subscribe() for _ in range(3)]
+            backend.return_value.start.assert_called_once_with()
+            for subscription in subscriptions:
+                subscription.close()
+            backend.return_value.stop.assert_called_once_with()
+
+
+class PublishTest(TestCase):
+    def test_save_and_delete_publish_after_commit(self):
+        """Test that writes publish create, update and delete events."""
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                location = Location.objects.create(
+                    name="Dallas", description="Big D", latitude=32.78, longitude=-96.8
+                )
+                publish.assert_not_called()
+            location.name = "Dallas, TX"
+            with self.captureOnCommitCallbacks(execute=True):
+                location.save()
+            pk = location.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                location.delete()
+            locations_bulk_changed.send(sender=Location)
+        events = [call.args[0] for call in publish.call_args_list]
+        self.assertEqual(
+            [(e["type"], e.get("id")) for e in events],
+            [("created", pk), ("updated", pk), ("deleted", pk), ("resync", None)],
+        )
+        self.assertEqual(events[1]["name"], "Dallas, TX")
+
+
+class ChangesBackendTest(TestCase):
+    def test_poll(self):
+        """Test that a poll dispatches what changed since the last one."""
+        fake_broker = mock.Mock()
+        backend = ChangesBackend(fake_broker)
+        since = ChangeSequence.current()
+        location = Location.objects.create(
+            name="Austin", description="Capital", latitude=30.27, longitude=-97.74
+        )
+        since = backend.poll(since)
+        (dispatched,), _ = fake_broker.dispatch.call_args
+        self.assertEqual(
+            (dispatched["type"], dispatched["id"]), ("updated", location.pk)
+        )
+
+        pk = location.pk
+        location.delete()
+        fake_broker.reset_mock()
+        self.assertEqual(backend.poll(since), ChangeSequence.current())
+        fake_broker.dispatch.assert_called_once_with(deleted_event(pk))
+
+        fake_broker.reset_mock()
+        backend.poll(ChangeSequence.current())
+        fake_broker.dispatch.assert_not_called()
+
+
+class LocationEventsViewTest(SimpleTestCase):
+    async def test_stream(self):
+        """Test that a connected client receives published events."""
+        response = await self.async_client.get(reverse("location_events"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        broker.publish(event("created", 7))
+        chunk = await asyncio.wait_for(anext(stream), 5)
+        self.assertTrue(chunk.startswith(b"data: "))
+        self.assertEqual(json.loads(chunk[6:])["id"], 7)
+        await stream.aclose()
+
+    @override_settings(MAPPING_EVENTS_HEARTBEAT=0.01)
+    async def test_heartbeat_and_cleanup(self):
+        """Test keep-alive comments and that closing the stream unsubscribes."""
+        before = broker.subscriber_count
+        stream = _event_stream()
+        await anext(stream)
+        self.assertEqual(broker.subscriber_count, before + 1)
+        self.assertEqual(await anext(stream), ": keep-alive\n\n")
+        await stream.aclose()
+        self.assertEqual(broker.subscriber_count, before)
+
+    @override_settings(MAPPING_EVENTS_MAX_CLIENTS=0)
+    async def test_too_many_clients(self):
+        """Test that streams over the limit are refused."""
+        response = await self.async_client.get(reverse("location_events"))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_wsgi_refused(self):
+        """Test that the stream isn't served to a WSGI worker."""
+        self.assertEqual(self.client.get(reverse("location_events")).status_code, 501)
@@ -0,0 +1,112 @@
+import csv
+import gzip
+import io
+import json
+
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from ..export import ExportEncoder, accepts_gzip, iter_export
+from ..models import Location
+
+
+class ExportHelpersTest(TestCase):
+    def test_accepts_gzip(self):
+        """Test parsing of the Accept-Encoding header."""
+        factory = RequestFactory()
+        for header, expected in [
+            ("gzip, deflate, br", True),
+            ("br;q=1.0, gzip;q=0.8", True),
+            ("*", True),
+            ("gzip;q=0", False),
+            ("identity", False),
+            ("", False),
+        ]:
+            request = factory.get("/", HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(accepts_gzip(request), expected, header)
+
+    def test_encoder_blocks(self):
+        """Test that encoded blocks, plain or gzipped, decode to the whole export."""
+        rows = [(i, f"Place {i}", "", 1.5, 2.5) for i in range(1000)]
+        plain = list(iter_export(ExportEncoder("ndjson", block_size=1000), rows))
+        self.assertGreater(len(plain), 1)
+        lines = b"".join(plain).decode().splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], list(range(1000)))
+
+        compressed = iter_export(ExportEncoder("geojson", compress=True), rows)
+        data = json.loads(gzip.decompress(b"".join(compressed)))
+        self.assertEqual(len(data["features"]), 1000)
+
+    def test_empty_export(self):
+        """Test that an export with no rows is still well formed."""
+        data = b"".join(iter_export(ExportEncoder("geojson"), []))
+        self.assertEqual(json.loads(data)["features"], [])
+
+
+class LocationExportViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        self.sydney = Location.objects.create(
+            name="Sydney", description="", latitude=-33.8688, longitude=151.2093
+        )
+
+    def export(self, **params):
+        headers = params.pop("headers", {})
+        response = self.client.get(reverse("location_export"), params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_geojson_export(self):
+        """Test the default GeoJSON FeatureCollection export."""
+        response = self.export()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual(
+            [f["id"] for f in data["features"]], [self.dallas.pk, self.sydney.pk]
+        )
+        self.assertEqual(
+            data["features"][0]["geometry"]["coordinates"], [-96.7970, 32.7767]
+        )
+        self.assertEqual(data["features"][0]["properties"]["name"], "Dallas")
+
+    def test_csv_export(self):
+        """Test the CSV export."""
+        response = self.export(format="csv")
+        self.assertIn("locations.csv", response["Content-Disposition"])
+        rows = list(
+            csv.reader(io.StringIO(b"".join(response.streaming_content).decode()))
+        )
+        self.assertEqual(
+            rows[0], ["id", "name", "description", "latitude", "longitude"]
+        )
+        self.assertEqual(
+            rows[1], [str(self.dallas.pk), "Dallas", "Big D", "32.7767", "-96.797"]
+        )
+        self.assertEqual(len(rows), 3)
+
+    def test_ndjson_export_with_bbox(self):
+        """Test the NDJSON export filtered to a bounding box."""
+        response = self.export(
+            format="ndjson", south=-40, west=140, north=-30, east=160
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [self.sydney.pk])
+
+    def test_gzip_export(self):
+        """Test that the export is compressed when the client accepts gzip."""
+        response = self.export(format="ndjson", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_invalid_requests(self):
+        """Test unknown formats and incomplete bounding boxes."""
+        url = reverse("location_export")
+        self.assertEqual(self.client.get(url, {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"south": 0}).status_code, 400)
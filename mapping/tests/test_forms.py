@@ -63,3 +63,48 @@ class LocationFormTest(TestCase):
         updated_location = form.save()
         self.assertEqual(updated_location.name, "Updated Location")
         self.assertEqual(updated_location.pk, location.pk)
+
+    def test_duplicate_warning(self):
+        """Test that a nearby, similarly named location needs confirming."""
+        existing = Location.objects.create(**self.valid_data)
+        data = {**self.valid_data, "name": "test location!", "latitude": 32.7768}
+        self.assertTrue(LocationForm(data=data).is_valid())
+
+        form = LocationForm(data=data, check_duplicates=True)
+        self.assertFalse(form.is_valid())
+        self.assertIn("Test Location (11 m away)", form.non_field_errors()[0])
+        self.assertEqual([location for location, _ in form.duplicates], [existing])
+        self.assertIn('type="checkbox" name="save_anyway"', form.as_p())
+
+        form = LocationForm(data={**data, "save_anyway": "on"}, check_duplicates=True)
+        self.assertTrue(form.is_valid())
+
+    def test_duplicate_warning_ignores_far_or_different(self):
+        """Test that distant or differently named locations are not flagged."""
+        Location.objects.create(**self.valid_data)
+        for changes in ({"latitude": 32.79}, {"name": "Fish Market"}):
+            form = LocationForm(
+                data={**self.valid_data, **changes}, check_duplicates=True
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+
+    def test_duplicate_warning_on_update(self):
+        """Test that an edit is checked against other locations only."""
+        location = Location.objects.create(**self.valid_data)
+        form = LocationForm(
+            data=self.valid_data, instance=location, check_duplicates=True
+        )
+        self.assertTrue(form.is_valid())
+        Location.objects.create(**{**self.valid_data, "name": "Test Locations"})
+        form = LocationForm(
+            data={**self.valid_data, "description": "Edited"},
+            instance=location,
+            check_duplicates=True,
+        )
+        self.assertTrue(form.is_valid())
+        form = LocationForm(
+            data={**self.valid_data, "latitude": 32.7768},
+            instance=location,
+            check_duplicates=True,
+        )
+        self.assertFalse(form.is_valid())
@@ -0,0 +1,98 @@
+from django.test import TestCase
+
+from ..geo import (
+    BoundingBox,
+    bbox_q,
+    normalize_longitude,
+    parse_bbox,
+    project,
+    tile_bbox,
+    tile_for,
+)
+from ..models import Location
+
+
+class BoundingBoxTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.dallas = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.fiji = Location.objects.create(
+            name="Fiji", description="", latitude=-17.7134, longitude=178.0650
+        )
+        self.samoa = Location.objects.create(
+            name="Samoa", description="", latitude=-13.7590, longitude=-172.1046
+        )
+
+    def filter(self, bbox):
+        return set(Location.objects.filter(bbox_q(bbox)))
+
+    def test_parse_bbox(self):
+        """Test parsing a bounding box from request parameters."""
+        bbox = parse_bbox({"south": "30", "west": "-100", "north": "35", "east": "-90"})
+        self.assertEqual(bbox, BoundingBox(30.0, -100.0, 35.0, -90.0))
+
+    def test_parse_bbox_invalid(self):
+        """Test that missing or malformed values are rejected."""
+        with self.assertRaises(ValueError):
+            parse_bbox({"south": "30", "west": "-100", "north": "35"})
+        with self.assertRaises(ValueError):
+            parse_bbox({"south": "abc", "west": "-100", "north": "35", "east": "-90"})
+        with self.assertRaises(ValueError):
+            parse_bbox({"south": "40", "west": "-100", "north": "35", "east": "-90"})
+        with self.assertRaises(ValueError):
+            parse_bbox({"south": "30", "west": "-100", "north": "95", "east": "-90"})
+        for value in ("nan", "inf", "-inf"):
+            with self.assertRaises(ValueError):
+                parse_bbox({"south": "0", "west": value, "north": "10", "east": "inf"})
+
+    def test_normalize_longitude(self):
+        """Test wrapping longitudes into [-180, 180)."""
+        self.assertEqual(normalize_longitude(190.0), -170.0)
+        self.assertEqual(normalize_longitude(-190.0), 170.0)
+        self.assertEqual(normalize_longitude(45.0), 45.0)
+
+    def test_filter_simple_bbox(self):
+        """Test filtering by a box that does not cross the antimeridian."""
+        self.assertEqual(self.filter(BoundingBox(30, -100, 35, -90)), {self.dallas})
+
+    def test_filter_antimeridian_bbox(self):
+        """Test filtering by a box that crosses the antimeridian."""
+        self.assertEqual(
+            self.filter(BoundingBox(-20, 170, -10, 190)), {self.fiji, self.samoa}
+        )
+        self.assertEqual(
+            self.filter(BoundingBox(-20, -190, -10, -170)), {self.fiji, self.samoa}
+        )
+
+    def test_filter_whole_world(self):
+        """Test that a box spanning 360 degrees ignores longitude."""
+        self.assertEqual(
+            self.filter(BoundingBox(-90, -400, 90, 400)),
+            {self.dallas, self.fiji, self.samoa},
+        )
+
+
+class WebMercatorTest(TestCase):
+    def test_project(self):
+        """Test web-mercator projection of the map origin and corners."""
+        self.assertEqual(project(0, 0, 0), (128.0, 128.0))
+        x, y = project(85.0511287798, -180, 1)
+        self.assertAlmostEqual(x, 0.0)
+        self.assertAlmostEqual(y, 0.0, places=3)
+
+    def test_tile_for(self):
+        """Test finding the tile that contains a coordinate."""
+        self.assertEqual(tile_for(32.7767, -96.7970, 0), (0, 0))
+        self.assertEqual(tile_for(32.7767, -96.7970, 10), (236, 413))
+        self.assertEqual(tile_for(-85.06, 180.0, 2), (3, 3))
+
+    def test_tile_bbox(self):
+        """Test the bounds of a tile contain the points assigned to it."""
+        bbox = tile_bbox(10, 236, 413)
+        self.assertTrue(bbox.south <= 32.7767 <= bbox.north)
+        self.assertTrue(bbox.west <= -96.7970 <= bbox.east)
+        world = tile_bbox(0, 0, 0)
+        self.assertAlmostEqual(world.north, 85.0511287798)
+        self.assertEqual((world.west, world.east), (-180.0, 180.0))
@@ -0,0 +1,51 @@
+from django.test import SimpleTestCase
+
+from .. import geohash
+
+
+class GeohashTest(SimpleTestCase):
+    def test_encode(self):
+        """Test encoding against known geohashes."""
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geohash.encode(32.7767, -96.7970, 5), "9vg4m")
+        self.assertEqual(len(geohash.encode(0, 0)), geohash.MAX_PRECISION)
+
+    def test_decode_bbox(self):
+        """Test that a cell's bounds contain the encoded point."""
+        south, west, north, east = geohash.decode_bbox("u4pruydqqvj")
+        self.assertTrue(south <= 57.64911 <= north)
+        self.assertTrue(west <= 10.40744 <= east)
+        self.assertEqual(geohash.decode_bbox(""), (-90.0, -180.0, 90.0, 180.0))
+
+    def test_cell_size(self):
+        """Test cell dimensions for odd and even precisions."""
+        self.assertEqual(geohash.cell_size(1), (45.0, 45.0))
+        self.assertEqual(geohash.cell_size(2), (5.625, 11.25))
+
+    def test_neighbours(self):
+        """Test the 3x3 neighbourhood, including across the antimeridian."""
+        cells = geohash.neighbours("9vg4")
+        self.assertEqual(len(cells), 9)
+        self.assertIn("9vg4", cells)
+        self.assertIn("9vfc", cells)
+        edge = geohash.neighbours(geohash.encode(0, 179.99, 3))
+        self.assertTrue(any(geohash.decode_bbox(c)[1] < 0 for c in edge))
+        pole = geohash.neighbours(geohash.encode(89.99, 0, 2))
+        self.assertEqual(len(pole), 6)
+
+    def test_next_prefix(self):
+        """Test the exclusive upper bound of a prefix range."""
+        self.assertEqual(geohash.next_prefix("9vg"), "9vh")
+        self.assertEqual(geohash.next_prefix("9vz"), "9w")
+        self.assertEqual(geohash.next_prefix("b9"), "bb")
+        self.assertIsNone(geohash.next_prefix("zz"))
+
+    def test_cover_bbox(self):
+        """Test that every point in a box falls in one of the cover cells."""
+        cells = geohash.cover_bbox(32.0, -97.0, 33.0, -96.0, max_cells=32)
+        self.assertLessEqual(len(cells), 32)
+        for latitude in (32.0, 32.5, 33.0):
+            for longitude in (-97.0, -96.5, -96.0):
+                point = geohash.encode(latitude, longitude)
+                self.assertTrue(any(point.startswith(cell) for cell in cells))
+        self.assertEqual(geohash.cover_bbox(-90, -180, 90, 180, max_cells=4), [""])
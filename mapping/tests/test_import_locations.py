@@ -0,0 +1,167 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..management.commands.import_locations import read_geojson
+from ..models import Location
+
+
+class ImportLocationsCommandTest(TestCase):
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command("import_locations", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_import_csv(self):
+        """Test importing a CSV file in several batches."""
+        path = self.write(
+            ".csv",
+            "name,description,latitude,longitude\n"
+            "Dallas,Big D,32.7767,-96.7970\n"
+            "Austin,,30.2672,-97.7431\n"
+            "Houston,Space City,29.7604,-95.3698\n",
+        )
+        output = self.call(path, "--batch-size", "2")
+        self.assertIn("3 created", output)
+        self.assertEqual(
+            list(Location.objects.values_list("name", flat=True)),
+            ["Austin", "Dallas", "Houston"],
+        )
+        self.assertEqual(Location.objects.get(name="Dallas").description, "Big D")
+
+    def test_import_csv_with_byte_order_mark(self):
+        """Test that a CSV saved with a UTF-8 byte order mark is read."""
+        path = self.write(
+            ".csv", "\ufeffname,latitude,longitude\nDallas,32.7767,-96.7970\n"
+        )
+        self.assertIn("1 created", self.call(path, "--strict"))
+        self.assertEqual(Location.objects.get().name, "Dallas")
+
+    def test_import_ndjson_skips_invalid_rows(self):
+        """Test that rows failing the form's coordinate rules are skipped."""
+        path = self.write(
+            ".ndjson",
+            '{"name": "Dallas", "lat": 32.7767, "lng": -96.7970}\n'
+            "\n"
+            '{"name": "North of north", "lat": 91, "lng": 0}\n'
+            '{"name": "Off the edge", "lat": 0, "lng": 181}\n'
+            '{"name": "", "lat": 0, "lng": 0}\n',
+        )
+        output = self.call(path)
+        self.assertIn("1 created", output)
+        self.assertIn("3 skipped", output)
+        self.assertEqual(Location.objects.get().name, "Dallas")
+
+    def test_import_skips_non_finite_coordinates(self):
+        """Test that NaN or infinite coordinates are skipped as invalid."""
+        path = self.write(
+            ".csv",
+            "name,latitude,longitude\n"
+            "Dallas,32.7767,-96.7970\n"
+            "Nowhere,nan,0\n"
+            "Far east,0,inf\n",
+        )
+        output = self.call(path)
+        self.assertIn("1 created", output)
+        self.assertIn("2 skipped", output)
+        self.assertEqual(Location.objects.get().name, "Dallas")
+
+    def test_import_strict(self):
+        """Test that --strict aborts on an invalid row."""
+        path = self.write(".ndjson", '{"name": "Bad", "lat": 91, "lng": 0}\n')
+        with self.assertRaisesMessage(CommandError, "Latitude must be between"):
+            self.call(path, "--strict")
+
+    def test_import_geojson(self):
+        """Test importing a GeoJSON FeatureCollection."""
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [-96.797, 32.7767]},
+                    "properties": {"name": "Dallas", "description": "Big D"},
+                },
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [151.2093, -33.8688]},
+                    "properties": {"name": "Sydney"},
+                },
+            ],
+        }
+        output = self.call(self.write(".geojson", json.dumps(collection, indent=2)))
+        self.assertIn("2 created", output)
+        sydney = Location.objects.get(name="Sydney")
+        self.assertEqual((sydney.latitude, sydney.longitude), (-33.8688, 151.2093))
+
+    def test_upsert_by_name(self):
+        """Test that --upsert updates locations that already exist."""
+        Location.objects.create(
+            name="Dallas", description="Old", latitude=0, longitude=0
+        )
+        path = self.write(
+            ".csv",
+            "name,description,latitude,longitude\n"
+            "Dallas,New,32.7767,-96.7970\n"
+            "Austin,,30.2672,-97.7431\n",
+        )
+        output = self.call(path, "--upsert")
+        self.assertIn("1 created, 1 updated", output)
+        dallas = Location.objects.get(name="Dallas")
+        self.assertEqual((dallas.description, dallas.latitude), ("New", 32.7767))
+        self.assertEqual(Location.objects.count(), 2)
+
+    def test_unknown_format(self):
+        """Test that an unrecognised extension needs --format."""
+        with self.assertRaises(CommandError):
+            self.call(self.write(".txt", ""))
+
+
+class ReadGeoJSONTest(TestCase):
+    def test_small_chunks(self):
+        """Test that features split across read chunks are reassembled."""
+        features = [{"type": "Feature", "id": i, "properties": {}} for i in range(5)]
+        document = json.dumps({"features": features, "type": "FeatureCollection"})
+        parsed = list(read_geojson(io.StringIO(document), chunk_size=7))
+        self.assertEqual(parsed, features)
+
+    def test_empty_collection(self):
+        """Test a collection without features."""
+        document = '{"type": "FeatureCollection", "features": [ ]}'
+        self.assertEqual(list(read_geojson(io.StringIO(document))), [])
+
+    def test_missing_features(self):
+        """Test a document without a features array."""
+        with self.assertRaises(ValueError):
+            list(read_geojson(io.StringIO('{"type": "Feature"}')))
+
+    def test_only_top_level_features(self):
+        """Test that "features" inside other members or strings is skipped."""
+        features = [{"type": "Feature", "id": 1, "properties": {}}]
+        document = json.dumps(
+            {
+                "name": 'not "features": [1]',
+                "metadata": {"features": [{"id": 0}], "count": 123456},
+                "total": 123456,
+                "features": features,
+            }
+        )
+        for chunk_size in (5, 1 << 16):
+            parsed = list(read_geojson(io.StringIO(document), chunk_size=chunk_size))
+            self.assertEqual(parsed, features)
+
+    def test_not_an_object(self):
+        """Test a document that isn't a JSON object."""
+        with self.assertRaises(ValueError):
+            list(read_geojson(io.StringIO('["features", []]')))
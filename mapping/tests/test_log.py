@@ -0,0 +1,91 @@
+import logging
+import logging.handlers
+
+from django.test import SimpleTestCase
+
+from config.log import (
+    PRODUCTION_SAMPLE_RATE,
+    QueueListenerHandler,
+    SamplingFilter,
+    queue_handlers,
+    resolve_sample_rates,
+)
+
+
+def make_record(level=logging.DEBUG, lineno=1, msg="message %s", args=(1,)):
+    return logging.LogRecord("mapping.test", level, __file__, lineno, msg, args, None)
+
+
+class SamplingFilterTest(SimpleTestCase):
+    def test_samples_per_call_site(self):
+        """Test that one in every rate DEBUG records passes per call site."""
+        sampler = SamplingFilter(rate=3)
+        passed = [sampler.filter(make_record()) for _ in range(7)]
+        self.assertEqual(passed, [True, False, False, True, False, False, True])
+        # A different call site has its own count.
+        self.assertTrue(sampler.filter(make_record(lineno=2)))
+
+    def test_higher_levels_always_pass(self):
+        """Test that records above the sampled level are never dropped."""
+        sampler = SamplingFilter(rate=100)
+        records = [make_record(level=logging.INFO) for _ in range(5)]
+        self.assertTrue(all(sampler.filter(record) for record in records))
+
+    def test_rate_follows_debug(self):
+        """Test that an unset rate is chosen from DEBUG and a set one is kept."""
+        filters = {"auto": {"rate": None}, "fixed": {"rate": 3}, "other": {}}
+        self.assertEqual(resolve_sample_rates(filters, True)["auto"]["rate"], 1)
+        resolved = resolve_sample_rates(filters, False)
+        self.assertEqual(resolved["auto"]["rate"], PRODUCTION_SAMPLE_RATE)
+        self.assertEqual(resolved["fixed"], {"rate": 3})
+        self.assertEqual(resolved["other"], {})
+        self.assertIsNone(filters["auto"]["rate"])
+
+
+class QueueListenerHandlerTest(SimpleTestCase):
+    def setUp(self):
+        self.target = logging.handlers.BufferingHandler(capacity=1000)
+        self.addCleanup(self.target.close)
+
+    def test_records_reach_target_handler(self):
+        """Test that queued records are formatted and handed to the target."""
+        handler = QueueListenerHandler([self.target])
+        handler.handle(make_record(args=(42,)))
+        handler.close()
+        self.assertEqual(
+            [record.getMessage() for record in self.target.buffer], ["message 42"]
+        )
+
+    def test_full_queue_drops_records(self):
+        """Test that a full queue drops records instead of blocking."""
+        handler = QueueListenerHandler([self.target], queue_size=2)
+        self.addCleanup(handler.close)
+        for _ in range(5):
+            handler.enqueue(make_record())
+        self.assertEqual(handler.dropped, 3)
+
+    def test_queue_handlers(self):
+        """Test that loggers' handlers move behind one queue with shared filters."""
+        sampler = SamplingFilter(rate=2)
+        other = logging.handlers.BufferingHandler(capacity=1000)
+        self.addCleanup(other.close)
+        self.target.addFilter(sampler)
+        other.addFilter(sampler)
+        other.setLevel(logging.INFO)
+        loggers = [logging.getLogger(f"mapping.test_log.{n}") for n in "ab"]
+        for logger in loggers:
+            logger.handlers = [self.target, other]
+            self.addCleanup(setattr, logger, "handlers", [])
+
+        queue_handlers([logger.name for logger in loggers])
+        handler = loggers[0].handlers[0]
+        self.assertIsInstance(handler, QueueListenerHandler)
+        self.assertEqual(loggers[1].handlers, [handler])
+        self.assertEqual(handler.filters, [sampler])
+        self.assertEqual(self.target.filters, [])
+        for _ in range(4):
+            handler.handle(make_record())
+        handler.handle(make_record(level=logging.INFO))
+        handler.close()
+        self.assertEqual(len(self.target.buffer), 3)
+        self.assertEqual(len(other.buffer), 1)
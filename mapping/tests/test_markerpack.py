@@ -0,0 +1,190 @@
+import gzip
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import VERSION_KEY, get_data_version
+from ..geo import BoundingBox
+from ..markerpack import FIXED_POINT, FLOAT32, HEADER, pack_markers, unpack_markers
+from ..models import Location
+from ..snapshot import LocationSnapshot, location_snapshot
+
+WORLD = {"south": -90, "west": -180, "north": 90, "east": 180}
+
+
+class PackMarkersTest(SimpleTestCase):
+    def test_float32_round_trip(self):
+        """Test that float32 payloads decode to the packed values."""
+        data = pack_markers([3, 10, 11], [32.5, -45.25, 0.0], [-96.75, 170.5, 1.0])
+        self.assertEqual(len(data), HEADER.size + 3 * 12)
+        ids, latitudes, longitudes, truncated = unpack_markers(data)
+        self.assertEqual(ids, [3, 10, 11])
+        self.assertEqual(latitudes, [32.5, -45.25, 0.0])
+        self.assertEqual(longitudes, [-96.75, 170.5, 1.0])
+        self.assertFalse(truncated)
+
+    def test_fixed_point_round_trip(self):
+        """Test that delta-encoded fixed point keeps five decimal places."""
+        data = pack_markers(
+            [1, 2], [32.776712, -33.86882], [-96.797, 151.20929], FIXED_POINT, True
+        )
+        ids, latitudes, longitudes, truncated = unpack_markers(data)
+        self.assertEqual(ids, [1, 2])
+        self.assertEqual(latitudes, [32.77671, -33.86882])
+        self.assertEqual(longitudes, [-96.797, 151.20929])
+        self.assertTrue(truncated)
+
+    def test_empty(self):
+        """Test that an empty payload is just the header."""
+        data = pack_markers([], [], [], FLOAT32)
+        self.assertEqual(len(data), HEADER.size)
+        self.assertEqual(unpack_markers(data), ([], [], [], False))
+
+    def test_not_a_payload(self):
+        """Test that other data is rejected."""
+        with self.assertRaises(ValueError):
+            unpack_markers(b"\0" * HEADER.size)
+
+
+class LocationSnapshotTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.snapshot = LocationSnapshot()
+        self.dallas, self.fiji, self.samoa = Location.objects.bulk_create(
+            [
+                Location(
+                    name="Dallas", description="", latitude=32.78, longitude=-96.8
+                ),
+                Location(name="Fiji", description="", latitude=-17.7, longitude=178.0),
+                Location(
+                    name="Samoa", description="", latitude=-13.8, longitude=-172.1
+                ),
+            ]
+        )
+
+    def ids(self, bbox, limit=100):
+        return list(self.snapshot.select(BoundingBox(*bbox), limit)[0])
+
+    def test_select(self):
+        """Test bbox selection, including across the antimeridian."""
+        self.assertEqual(self.ids((30, -100, 35, -90)), [self.dallas.pk])
+        self.assertEqual(
+            self.ids((-20, 170, -10, 190)), sorted([self.fiji.pk, self.samoa.pk])
+        )
+        world = BoundingBox(-90, -180, 90, 180)
+        ids, _, _, truncated = self.snapshot.select(world, 2)
+        self.assertEqual(list(ids), [self.dallas.pk, self.fiji.pk])
+        self.assertTrue(truncated)
+
+    def test_overlay(self):
+        """Test that edits show before the snapshot is reloaded."""
+        self.ids((30, -100, 35, -90))
+        self.snapshot.upsert(self.dallas.pk, 48.86, 2.35)
+        self.snapshot.remove(self.fiji.pk)
+        self.assertEqual(self.ids((30, -100, 35, -90)), [])
+        self.assertEqual(self.ids((45, 0, 50, 5)), [self.dallas.pk])
+        self.assertEqual(self.ids((-20, 170, -10, 190)), [self.samoa.pk])
+
+    def test_rebuild_in_background(self):
+        """Test that a full overlay is merged in on another thread."""
+        snapshot = self.snapshot = LocationSnapshot(rebuild_ratio=0, min_rebuild=1)
+        self.ids((30, -100, 35, -90))
+        snapshot.upsert(999, 48.86, 2.35)
+        snapshot.remove(self.fiji.pk)
+        self.ids((30, -100, 35, -90))
+        snapshot._rebuild_thread.join(5)
+        self.assertEqual(
+            list(snapshot._columns[0]), [self.samoa.pk, self.dallas.pk, 999]
+        )
+        self.assertEqual((snapshot._pending, snapshot._stale), ({}, set()))
+        self.assertEqual(self.ids((-20, 170, -10, 190)), [self.samoa.pk])
+
+    def test_edits_during_rebuild_kept(self):
+        """Test that edits made while a rebuild runs stay in the new overlay."""
+        self.ids((30, -100, 35, -90))
+        columns = self.snapshot._columns
+        self.snapshot._edits = {}
+        self.snapshot.upsert(self.dallas.pk, 48.86, 2.35)
+        self.snapshot.remove(self.samoa.pk)
+        self.snapshot._rebuild(columns, {}, set())
+        self.assertIsNot(self.snapshot._columns, columns)
+        self.assertEqual(self.ids((30, -100, 35, -90)), [])
+        self.assertEqual(self.ids((45, 0, 50, 5)), [self.dallas.pk])
+        self.assertEqual(self.ids((-20, 170, -10, 190)), [self.fiji.pk])
+
+    def test_catches_up_with_other_processes(self):
+        """Test that edits committed elsewhere show up on the next select."""
+        get_data_version()
+        self.ids((30, -100, 35, -90))
+        Location.objects.filter(pk=self.dallas.pk).update(
+            latitude=48.86, longitude=2.35
+        )
+        cache.incr(VERSION_KEY)
+        self.assertEqual(self.ids((30, -100, 35, -90)), [])
+        self.assertEqual(self.ids((45, 0, 50, 5)), [self.dallas.pk])
+
+
+class LocationMarkersPackedViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        location_snapshot.invalidate()
+        self.locations = Location.objects.bulk_create(
+            [
+                Location(name=f"Place {i}", description="", latitude=i, longitude=i)
+                for i in range(10)
+            ]
+        )
+        self.url = reverse("location_markers_packed")
+
+    def tearDown(self):
+        location_snapshot.invalidate()
+
+    def test_markers(self):
+        """Test the payload for a viewport, in both encodings."""
+        bbox = {"south": 2, "west": 2, "north": 4.5, "east": 4.5}
+        expected = [location.pk for location in self.locations[2:5]]
+        for encoding in ("float32", "delta"):
+            response = self.client.get(self.url, {**bbox, "encoding": encoding})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "application/octet-stream")
+            ids, latitudes, longitudes, truncated = unpack_markers(response.content)
+            self.assertEqual(ids, expected)
+            self.assertEqual(latitudes, [2.0, 3.0, 4.0])
+            self.assertFalse(truncated)
+
+    def test_gzip(self):
+        """Test that the payload is compressed for clients that accept it."""
+        Location.objects.bulk_create(
+            Location(name="More", description="", latitude=i, longitude=-i)
+            for i in range(40)
+        )
+        location_snapshot.invalidate()
+        response = self.client.get(self.url, WORLD, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        ids = unpack_markers(gzip.decompress(response.content))[0]
+        self.assertEqual(len(ids), 50)
+
+    def test_saves_update_snapshot(self):
+        """Test that a committed edit is in the next response."""
+        self.client.get(self.url, WORLD)
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Extra", description="", latitude=50, longitude=50
+            )
+        response = self.client.get(self.url, WORLD)
+        self.assertEqual(len(unpack_markers(response.content)[0]), 11)
+
+    @override_settings(MAPPING_PACKED_MARKER_LIMIT=4)
+    def test_truncated(self):
+        """Test that MAPPING_PACKED_MARKER_LIMIT bounds the payload."""
+        ids, _, _, truncated = unpack_markers(self.client.get(self.url, WORLD).content)
+        self.assertEqual(ids, [location.pk for location in self.locations[:4]])
+        self.assertTrue(truncated)
+
+    def test_invalid(self):
+        """Test that a bad bbox or encoding is a 400."""
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        response = self.client.get(self.url, {**WORLD, "encoding": "json"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import Histogram, MetricsRegistry, registry
+from ..models import Location
+
+
+class HistogramTest(SimpleTestCase):
+    def test_cumulative_buckets(self):
+        """Test that bucket counts are cumulative and end with +Inf."""
+        histogram = Histogram([1, 5])
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.cumulative()), [(1, 2), (5, 3), (float("inf"), 4)]
+        )
+        self.assertEqual(histogram.sum, 14.5)
+        self.assertEqual(histogram.count, 4)
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    def test_render(self):
+        """Test the Prometheus text output for one observation."""
+        metrics = MetricsRegistry()
+        metrics.observe(
+            'view"name', "GET", 200, 0.02, queries=3, response_bytes=1234567
+        )
+        text = metrics.render()
+        self.assertIn("# TYPE mapping_http_requests_total counter", text)
+        self.assertIn(
+            'mapping_http_requests_total{view="view\\"name",method="GET",status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'mapping_http_request_duration_seconds_bucket{view="view\\"name",le="0.025"} 1',
+            text,
+        )
+        self.assertIn(
+            'mapping_db_queries_per_request_bucket{view="view\\"name",le="2"} 0', text
+        )
+        self.assertIn(
+            'mapping_http_response_bytes_total{view="view\\"name"} 1234567', text
+        )
+        self.assertTrue(text.endswith("\n"))
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        registry.reset()
+        self.location = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+
+    def test_requests_are_recorded_per_url_name(self):
+        """Test that latency, queries and status are recorded per URL name."""
+        self.client.get(reverse("location_list"))
+        self.client.get(reverse("location_update", args=[999]))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'mapping_http_requests_total{view="location_list",method="GET",status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'mapping_http_requests_total{view="location_update",method="GET",status="404"} 1',
+            text,
+        )
+        self.assertIn(
+            'mapping_db_queries_per_request_count{view="location_list"} 1', text
+        )
+        self.assertIn(
+            'mapping_db_queries_per_request_sum{view="location_list"} 1', text
+        )
+
+    async def test_async_views_are_recorded(self):
+        """Test that queries run by async views are counted."""
+        await self.async_client.get(
+            reverse("async_location_detail_api", args=[self.location.pk])
+        )
+        self.assertIn(
+            'mapping_db_queries_per_request_sum{view="async_location_detail_api"} 1',
+            registry.render(),
+        )
+
+    @override_settings(MAPPING_QUERY_BUDGET=0)
+    def test_query_budget(self):
+        """Test that requests over the query budget are logged and counted."""
+        with self.assertLogs("mapping.middleware", "WARNING") as logs:
+            self.client.get(reverse("location_list"))
+        self.assertIn("location_list ran 1 queries (budget 0)", logs.output[0])
+        self.assertIn(
+            'mapping_query_budget_exceeded_total{view="location_list"} 1',
+            registry.render(),
+        )
@@ -56,3 +56,46 @@ class LocationModelTest(TestCase):
         self.assertEqual(locations[0].name, "A Location")
         self.assertEqual(locations[1].name, "B Location")
         self.assertEqual(locations[2].name, "C Location")
+
+    def test_geohash_computed_on_save(self):
+        """Test that saving a location stores its geohash."""
+        self.assertEqual(self.location.geohash, "9vg4mqfd47tr")
+        self.location.latitude = -33.8688
+        self.location.longitude = 151.2093
+        self.location.save(update_fields=["latitude", "longitude"])
+        self.location.refresh_from_db()
+        self.assertTrue(self.location.geohash.startswith("r3gx2"))
+
+    def test_geohash_computed_on_bulk_paths(self):
+        """Test that bulk_create and bulk_update keep the geohash in sync."""
+        created = Location.objects.bulk_create(
+            [Location(name="Bulk", description="", latitude=0.1, longitude=0.1)]
+        )
+        self.assertTrue(created[0].geohash.startswith("s000d"))
+        location = Location.objects.get(name="Bulk")
+        location.latitude = 32.7767
+        location.longitude = -96.7970
+        Location.objects.bulk_update([location], ["latitude", "longitude"])
+        location.refresh_from_db()
+        self.assertEqual(location.geohash, self.location.geohash)
+
+    def test_geohash_queries(self):
+        """Test the geohash-backed manager methods."""
+        sydney = Location.objects.create(
+            name="Sydney", description="", latitude=-33.8688, longitude=151.2093
+        )
+        fiji = Location.objects.create(
+            name="Fiji", description="", latitude=-17.7134, longitude=178.0650
+        )
+        samoa = Location.objects.create(
+            name="Samoa", description="", latitude=-13.7590, longitude=-172.1046
+        )
+        self.assertEqual(list(Location.objects.in_cell("9vg")), [self.location])
+        self.assertEqual(
+            list(Location.objects.in_cell("9vg", "r3g")), [sydney, self.location]
+        )
+        self.assertEqual(list(Location.objects.near_geohash("9vg4m")), [self.location])
+        self.assertEqual(list(Location.objects.in_bbox(-40, 140, -30, 160)), [sydney])
+        self.assertEqual(
+            list(Location.objects.in_bbox(-20, 170, -10, 190)), [fiji, samoa]
+        )
@@ -0,0 +1,75 @@
+import struct
+
+from django.test import SimpleTestCase
+
+from ..mvt import encode_tile
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def read_message(data):
+    """Decode a protobuf message into {field: [values]}."""
+    fields, pos = {}, 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos : pos + 8], pos + 8
+        else:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos : pos + length], pos + length
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def read_packed(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+class VectorTileEncoderTest(SimpleTestCase):
+    def test_point_layer(self):
+        """Test that a point layer round-trips through a protobuf decoder."""
+        tile = encode_tile(
+            {
+                "locations": [
+                    (7, 10, 20, {"name": "Dallas", "rank": 3}),
+                    (8, -5, 4100, {"name": "Dallas", "score": 1.5}),
+                ]
+            }
+        )
+        layers = read_message(tile)[3]
+        self.assertEqual(len(layers), 1)
+        layer = read_message(layers[0])
+        self.assertEqual(layer[15], [2])
+        self.assertEqual(layer[1], [b"locations"])
+        self.assertEqual(layer[5], [4096])
+        self.assertEqual(layer[3], [b"name", b"rank", b"score"])
+
+        values = [read_message(value) for value in layer[4]]
+        self.assertEqual(values[0], {1: [b"Dallas"]})
+        self.assertEqual(values[1], {5: [3]})
+        self.assertEqual(struct.unpack("<d", values[2][3][0]), (1.5,))
+
+        first, second = (read_message(feature) for feature in layer[2])
+        self.assertEqual(first[1], [7])
+        self.assertEqual(first[3], [1])
+        self.assertEqual(read_packed(first[2][0]), [0, 0, 1, 1])
+        self.assertEqual(read_packed(first[4][0]), [9, 20, 40])
+        # Shared values are stored once and referenced by index.
+        self.assertEqual(read_packed(second[2][0]), [0, 0, 2, 2])
+        self.assertEqual(read_packed(second[4][0]), [9, 9, 8200])
@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from ..models import Location
+from ..pagination import decode_cursor, encode_cursor, paginate_keyset
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        # Two locations share each name so the id tie-breaker is exercised.
+        for name in ["Alpha", "Bravo", "Charlie"]:
+            for _ in range(2):
+                Location.objects.create(
+                    name=name, description="", latitude=32.7767, longitude=-96.7970
+                )
+        self.ordered = list(Location.objects.order_by("name", "id"))
+
+    def test_cursor_round_trip(self):
+        """Test encoding and decoding a cursor."""
+        self.assertEqual(decode_cursor(encode_cursor("Café", 42)), ("Café", 42))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor("Alpha", 1)[:-2] + "!!")
+
+    def test_first_page(self):
+        """Test the first page has a next cursor and no previous one."""
+        page = paginate_keyset(Location.objects.all(), 4)
+        self.assertEqual(list(page), self.ordered[:4])
+        self.assertTrue(page.has_next)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_walk_forward_and_back(self):
+        """Test following next and previous cursors through every page."""
+        seen = []
+        page = paginate_keyset(Location.objects.all(), 4)
+        seen.extend(page)
+        page = paginate_keyset(Location.objects.all(), 4, after=page.next_cursor)
+        seen.extend(page)
+        self.assertEqual(seen, self.ordered)
+        self.assertFalse(page.has_next)
+        self.assertIsNone(page.next_cursor)
+
+        previous = paginate_keyset(
+            Location.objects.all(), 4, before=page.previous_cursor
+        )
+        self.assertEqual(list(previous), self.ordered[:4])
+        self.assertFalse(previous.has_previous)
+        self.assertTrue(previous.has_next)
+
+    def test_both_cursors(self):
+        """Test that 'after' and 'before' cannot be combined."""
+        cursor = encode_cursor("Alpha", 1)
+        with self.assertRaises(ValueError):
+            paginate_keyset(Location.objects.all(), 4, after=cursor, before=cursor)
@@ -0,0 +1,142 @@
+import copy
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from config.routers import STICKY_COOKIE, PrimaryReplicaRouter
+
+from ..clustering import cluster_index
+from ..geo import BoundingBox, tile_for
+from ..models import Location
+from ..snapshot import location_snapshot
+from ..spatial import spatial_index
+from ..tiles import render_tile
+from .test_mvt import read_message
+
+WORLD = BoundingBox(-90, -180, 90, 180)
+LOCATION = {
+    "name": "Dallas",
+    "description": "Big D",
+    "latitude": 32.7767,
+    "longitude": -96.7970,
+}
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], DATABASE_PRIMARY_STICKY_SECONDS=5)
+class PrimaryReplicaTest(TransactionTestCase):
+    """
+    Route against a second SQLite database standing in for a replica.
+
+    Nothing copies rows to it, so it behaves like a replica that hasn't
+    caught up yet: a read sent there doesn't see what was just written. It
+    is added once the default database is set up, as system checks run
+    before and would look for it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        replica = copy.deepcopy(connections.settings["default"])
+        replica["NAME"] = f"{cls.directory}/replica.sqlite3"
+        connections.settings["replica"] = replica
+        cls.databases = cls.databases | {"replica"}
+        call_command("migrate", database="replica", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.dallas = Location.objects.create(**LOCATION)
+
+    def detail(self, pk):
+        return self.client.get(reverse("location_detail_api", args=[pk]))
+
+    def test_routing(self):
+        """Test reads go to the replica, writes and transactions to default."""
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Location), "replica")
+        self.assertEqual(router.db_for_write(Location), "default")
+        self.assertIsNone(router.db_for_read(User))
+        self.assertFalse(Location.objects.exists())
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Location), "default")
+            self.assertTrue(Location.objects.exists())
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(router.db_for_read(Location), "default")
+
+    def test_reads_stick_to_primary_after_create(self):
+        """Test that a client sees the location it has just created."""
+        response = self.client.post(
+            reverse("location_create"), {**LOCATION, "name": "Austin"}
+        )
+        self.assertEqual(response.status_code, 302)
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
+
+        austin = Location.objects.using("default").get(name="Austin")
+        self.assertEqual(self.detail(austin.pk).status_code, 200)
+        # Another client, without the cookie, reads from the replica.
+        self.client.cookies.clear()
+        self.assertEqual(self.detail(austin.pk).status_code, 404)
+
+    def test_update_and_delete_read_from_primary(self):
+        """Test that writes look up the row they change on the primary."""
+        url = reverse("location_update", args=[self.dallas.pk])
+        response = self.client.post(url, {**LOCATION, "name": "Dallas, TX"})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.detail(self.dallas.pk).json()["name"], "Dallas, TX")
+
+        self.client.cookies.clear()
+        url = reverse("location_delete", args=[self.dallas.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertFalse(Location.objects.using("default").exists())
+
+    def test_reads_do_not_stick(self):
+        """Test that a request that doesn't write sets no cookie."""
+        response = self.client.get(reverse("location_list"))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_recent_responses_not_cached(self):
+        """Test that a response read soon after a change isn't kept."""
+        response = self.client.get(reverse("location_list_api"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        with override_settings(DATABASE_PRIMARY_STICKY_SECONDS=-1):
+            self.assertIn("ETag", self.client.get(reverse("location_list_api")))
+
+    def test_changes_read_from_primary(self):
+        """Test that the change feed never hands out a seq past replica rows."""
+        response = self.client.get(reverse("location_changes"), {"since": 0})
+        data = response.json()
+        self.assertEqual([row["id"] for row in data["locations"]], [self.dallas.pk])
+        self.assertEqual(data["seq"], self.dallas.change_seq)
+
+    def test_derived_state_read_from_primary(self):
+        """Test that indexes and tiles are rebuilt from the primary."""
+        for index in (cluster_index, spatial_index, location_snapshot):
+            index.invalidate()
+            self.addCleanup(index.invalidate)
+        self.assertEqual(spatial_index.nearest(32.7, -96.7, 1)[0][0], self.dallas.pk)
+        self.assertEqual(sum(count for _, _, count in cluster_index.query(WORLD, 0)), 1)
+        self.assertEqual(len(location_snapshot.select(WORLD, 10)[0]), 1)
+        x, y = tile_for(LOCATION["latitude"], LOCATION["longitude"], 10)
+        layer = read_message(read_message(render_tile(10, x, y))[3][0])
+        self.assertEqual(len(layer[2]), 1)
@@ -0,0 +1,118 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..geo import BoundingBox
+from ..models import Location
+from ..search import ensure_installed, parse_terms, search
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        self.fort_worth = Location.objects.create(
+            name="Fort Worth",
+            description="West of Dallas",
+            latitude=32.7555,
+            longitude=-97.3308,
+        )
+        self.sao_paulo = Location.objects.create(
+            name="São Paulo",
+            description="Largest city in Brazil",
+            latitude=-23.5505,
+            longitude=-46.6333,
+        )
+
+    def names(self, text, **kwargs):
+        return [location.name for location in search(text, **kwargs)]
+
+    def test_parse_terms(self):
+        """Test that input is split into lower-case word terms."""
+        self.assertEqual(parse_terms('  Fort-Worth "NOT" * '), ["fort", "worth", "not"])
+        self.assertEqual(parse_terms("!!!"), [])
+
+    def test_name_matches_rank_first(self):
+        """Test that a name match ranks above a description match."""
+        results = search("dallas")
+        self.assertEqual([r.name for r in results], ["Dallas", "Fort Worth"])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_prefix_and_all_terms(self):
+        """Test that every term is a prefix and all terms must match."""
+        self.assertEqual(self.names("fo wor"), ["Fort Worth"])
+        self.assertEqual(self.names("dal big"), ["Dallas"])
+        self.assertEqual(self.names("dallas nowhere"), [])
+
+    def test_diacritics_and_operators(self):
+        """Test accent folding and that query syntax in the input is literal."""
+        self.assertEqual(self.names("sao paulo"), ["São Paulo"])
+        self.assertEqual(self.names('dallas" OR "fort'), [])
+        self.assertEqual(self.names("NOT"), [])
+
+    def test_bbox_filter(self):
+        """Test restricting matches to a bounding box."""
+        bbox = BoundingBox(32, -97, 33, -96)
+        self.assertEqual(self.names("dallas", bbox=bbox), ["Dallas"])
+
+    def test_index_follows_writes(self):
+        """Test that saves, bulk writes and deletes keep the index in sync."""
+        self.dallas.name = "Big D"
+        self.dallas.save()
+        self.assertEqual(self.names("dallas"), ["Fort Worth"])
+
+        Location.objects.bulk_create(
+            [Location(name="Denton", description="", latitude=33.2, longitude=-97.1)]
+        )
+        Location.objects.filter(name="Fort Worth").update(description="Cowtown")
+        self.assertEqual(self.names("den"), ["Denton"])
+        self.assertEqual(self.names("cowtown"), ["Fort Worth"])
+
+        self.fort_worth.delete()
+        self.assertEqual(self.names("cowtown"), [])
+
+    def test_ensure_installed_restores_triggers(self):
+        """Test that dropped SQLite triggers are recreated after migrate."""
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite-specific")
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER mapping_location_fts_ai")
+        ensure_installed(using=connection.alias)
+        Location.objects.create(
+            name="Austin", description="", latitude=30.27, longitude=-97.74
+        )
+        self.assertEqual(self.names("austin"), ["Austin"])
+
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+
+    def test_search_view(self):
+        """Test the search endpoint returns ranked results."""
+        response = self.client.get(reverse("location_search"), {"q": "dall"})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], [self.dallas.pk])
+        self.assertIn("rank", results[0])
+
+    def test_search_view_with_bbox(self):
+        """Test the search endpoint with a bounding box outside the match."""
+        response = self.client.get(
+            reverse("location_search"),
+            {"q": "dallas", "south": 0, "west": 0, "north": 10, "east": 10},
+        )
+        self.assertEqual(response.json()["results"], [])
+
+    def test_search_view_invalid(self):
+        """Test missing queries, bad limits and incomplete bounding boxes."""
+        url = reverse("location_search")
+        for params in [{}, {"q": " "}, {"q": "a", "limit": 0}, {"q": "a", "south": 1}]:
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
@@ -0,0 +1,225 @@
+import random
+import threading
+from array import array
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..cache import VERSION_KEY, get_data_version
+from ..models import Location
+from ..spatial import (
+    KDTree,
+    SpatialIndex,
+    chord_to_metres,
+    haversine_m,
+    metres_to_chord,
+    spatial_index,
+    to_unit_vector,
+)
+
+
+class KDTreeTest(SimpleTestCase):
+    def setUp(self):
+        """Build a tree over random points."""
+        rng = random.Random(42)
+        self.points = [
+            (rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(2000)
+        ]
+        ids = array("q", range(len(self.points)))
+        coords = (array("d"), array("d"), array("d"))
+        for latitude, longitude in self.points:
+            for axis, value in zip(coords, to_unit_vector(latitude, longitude)):
+                axis.append(value)
+        self.tree = KDTree(ids, coords)
+        self.queries = [
+            (rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(25)
+        ]
+
+    def brute_force(self, latitude, longitude):
+        return sorted(
+            (haversine_m(latitude, longitude, *point), pk)
+            for pk, point in enumerate(self.points)
+        )
+
+    def test_distance_conversions(self):
+        """Test chord/metre conversions against haversine."""
+        chord = metres_to_chord(1000)
+        self.assertAlmostEqual(chord_to_metres(chord * chord), 1000, places=6)
+        a = to_unit_vector(32.7767, -96.7970)
+        b = to_unit_vector(-33.8688, 151.2093)
+        chord_squared = sum((x - y) ** 2 for x, y in zip(a, b))
+        self.assertAlmostEqual(
+            chord_to_metres(chord_squared),
+            haversine_m(32.7767, -96.7970, -33.8688, 151.2093),
+            delta=0.01,
+        )
+
+    def test_nearest_matches_brute_force(self):
+        """Test k-nearest results against a full scan."""
+        for latitude, longitude in self.queries:
+            expected = [pk for _, pk in self.brute_force(latitude, longitude)[:5]]
+            found = self.tree.nearest(to_unit_vector(latitude, longitude), 5)
+            self.assertEqual([pk for _, pk in found], expected)
+
+    def test_within_matches_brute_force(self):
+        """Test radius results against a full scan."""
+        radius = 750_000
+        for latitude, longitude in self.queries:
+            expected = [
+                pk for d, pk in self.brute_force(latitude, longitude) if d <= radius
+            ]
+            found = self.tree.within(
+                to_unit_vector(latitude, longitude), metres_to_chord(radius)
+            )
+            self.assertEqual([pk for _, pk in found], expected)
+
+    def test_skip(self):
+        """Test that skipped ids are left out of the results."""
+        latitude, longitude = self.points[7]
+        point = to_unit_vector(latitude, longitude)
+        self.assertEqual(self.tree.nearest(point, 1)[0][1], 7)
+        self.assertNotEqual(self.tree.nearest(point, 1, skip={7})[0][1], 7)
+
+
+class SpatialIndexTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.index = SpatialIndex()
+        self.dallas = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.austin = Location.objects.create(
+            name="Austin", description="", latitude=30.2672, longitude=-97.7431
+        )
+
+    def test_lazy_build_and_query(self):
+        """Test that the index loads from the database on first query."""
+        results = self.index.nearest(32.78, -96.80, 2)
+        self.assertEqual([pk for pk, _ in results], [self.dallas.pk, self.austin.pk])
+        self.assertLess(results[0][1], 1000)
+
+    def test_incremental_updates(self):
+        """Test that upserts and removals apply without a rebuild."""
+        self.index.nearest(0, 0, 1)
+        self.index.upsert(999, 32.7800, -96.8000)
+        self.index.remove(self.dallas.pk)
+        self.index.upsert(self.austin.pk, 32.7700, -96.8000)
+        with self.assertNumQueries(0):
+            results = self.index.within(32.78, -96.80, 5000)
+        self.assertEqual([pk for pk, _ in results], [999, self.austin.pk])
+
+    def test_rebuild_in_background(self):
+        """Test that a full overlay is folded in while queries use the old tree."""
+        index = SpatialIndex(rebuild_ratio=0, min_rebuild=1)
+        index.nearest(0, 0, 1)
+        tree = index._tree
+        release = threading.Event()
+
+        def slow_tree(*args):
+            release.wait(5)
+            return KDTree(*args)
+
+        with mock.patch("mapping.spatial.KDTree", side_effect=slow_tree):
+            index.upsert(999, 32.7800, -96.8000)
+            index.remove(self.dallas.pk)
+            with self.assertNumQueries(0):
+                results = index.within(32.78, -96.80, 5000)
+            self.assertEqual([pk for pk, _ in results], [999])
+            thread = index._rebuild_thread
+            self.assertIsNotNone(thread)
+            self.assertIs(index._tree, tree)
+            # Edited while the new tree is built, so left in its overlay.
+            index.upsert(1000, 32.7801, -96.8000)
+            index.remove(999)
+            release.set()
+            thread.join(5)
+        self.assertIsNot(index._tree, tree)
+        self.assertEqual(sorted(index._tree.ids), [self.austin.pk, 999])
+        self.assertEqual(list(index._pending), [1000])
+        results = index.within(32.78, -96.80, 5000)
+        self.assertEqual([pk for pk, _ in results], [1000])
+
+    def test_catches_up_with_other_processes(self):
+        """Test that edits committed elsewhere are applied without a reload."""
+        get_data_version()
+        self.index.nearest(0, 0, 1)
+        # Written without this process's on_commit hooks, as another worker.
+        houston = Location.objects.create(
+            name="Houston", description="", latitude=29.7604, longitude=-95.3698
+        )
+        Location.objects.filter(pk=self.dallas.pk).delete_in_bulk()
+        cache.incr(VERSION_KEY)
+        results = self.index.within(31, -96, 300000)
+        self.assertEqual([pk for pk, _ in results], [houston.pk, self.austin.pk])
+        self.assertIsNotNone(self.index._tree)
+
+
+class NeighbourViewsTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        spatial_index.invalidate()
+        self.dallas = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.austin = Location.objects.create(
+            name="Austin", description="", latitude=30.2672, longitude=-97.7431
+        )
+
+    def tearDown(self):
+        spatial_index.invalidate()
+
+    def test_nearest_view(self):
+        """Test the k-nearest endpoint."""
+        response = self.client.get(
+            reverse("location_nearest"), {"lat": 30.3, "lng": -97.7, "k": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["name"] for r in results], ["Austin"])
+        self.assertIn("distance_m", results[0])
+
+    def test_within_view_sees_new_locations(self):
+        """Test that the radius endpoint reflects committed creates."""
+        url = reverse("location_within")
+        params = {"lat": 32.78, "lng": -96.80, "radius_m": 10_000}
+        self.assertEqual(len(self.client.get(url, params).json()["results"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Dallas 2", description="", latitude=32.79, longitude=-96.81
+            )
+        results = self.client.get(url, params).json()["results"]
+        self.assertEqual([r["name"] for r in results], ["Dallas", "Dallas 2"])
+
+    def test_invalid_parameters(self):
+        """Test validation of the query parameters."""
+        self.assertEqual(
+            self.client.get(
+                reverse("location_nearest"), {"lat": 91, "lng": 0}
+            ).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse("location_nearest"), {"lat": 0, "lng": 0, "k": 0}
+            ).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse("location_within"), {"lat": 0, "lng": 0}
+            ).status_code,
+            400,
+        )
+
+    def test_non_finite_parameters(self):
+        """Test that NaN or infinite coordinates and radii are rejected."""
+        for params in ({"lat": "nan", "lng": 0}, {"lat": 0, "lng": "-inf"}):
+            response = self.client.get(reverse("location_nearest"), params)
+            self.assertEqual(response.status_code, 400)
+        for radius_m in ("nan", "inf"):
+            response = self.client.get(
+                reverse("location_within"), {"lat": 0, "lng": 0, "radius_m": radius_m}
+            )
+            self.assertEqual(response.status_code, 400)
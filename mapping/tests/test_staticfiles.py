@@ -0,0 +1,124 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+
+from config.staticfiles import StaticFilesMiddleware, accepted_encodings, brotli
+
+STATIC_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    SERVE_STATIC=True,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "config.staticfiles.CompressedManifestStaticFilesStorage"
+        },
+    },
+)
+class StaticFilesTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutil.rmtree, STATIC_ROOT, ignore_errors=True)
+        call_command(
+            "collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin"]
+        )
+
+    def path(self, url):
+        return os.path.join(STATIC_ROOT, url.removeprefix("/static/"))
+
+    def get(self, url, accept_encoding="", **extra):
+        return self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding, **extra)
+
+    def test_collectstatic_writes_compressed_copies(self):
+        """Test hashed names and gzip copies of compressible files only."""
+        url = static("css/styles.css")
+        self.assertRegex(url, r"/static/css/styles\.[0-9a-f]{12}\.css$")
+        with gzip.open(self.path(url) + ".gz") as f, open(self.path(url), "rb") as g:
+            self.assertEqual(f.read(), g.read())
+        png = self.path(static("leaflet/images/marker-icon.png"))
+        self.assertTrue(os.path.exists(png))
+        self.assertFalse(os.path.exists(png + ".gz"))
+
+    def test_css_references_hashed_images(self):
+        """Test that url() references in leaflet.css point at hashed files."""
+        with open(self.path(static("leaflet/leaflet.css"))) as f:
+            css = f.read()
+        self.assertIn(static("leaflet/images/layers.png").rsplit("/", 1)[1], css)
+
+    def test_hashed_file_is_immutable(self):
+        """Test that a content-hashed name is cached for a year."""
+        url = static("leaflet/leaflet.js")
+        response = self.get(url, "gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertTrue(response["Content-Type"].endswith("charset=utf-8"))
+        body = b"".join(response.streaming_content)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        with open(self.path(url), "rb") as f:
+            self.assertEqual(gzip.decompress(body), f.read())
+
+    def test_brotli_preferred(self):
+        """Test that the smallest accepted encoding is chosen."""
+        if brotli is None:
+            self.skipTest("brotli is not installed")
+        response = self.get(static("leaflet/leaflet.js"), "gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        response = self.get(static("leaflet/leaflet.js"), "gzip, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_identity(self):
+        """Test clients that accept no compression get the original file."""
+        url = static("leaflet/leaflet.js")
+        response = self.get(url)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(
+            int(response["Content-Length"]), os.path.getsize(self.path(url))
+        )
+
+    def test_plain_name_revalidates(self):
+        """Test that unhashed names must be revalidated and support ETags."""
+        response = self.get("/static/css/styles.css", "gzip")
+        self.assertNotIn("immutable", response["Cache-Control"])
+        response = self.get(
+            "/static/css/styles.css", "gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_files_fall_through(self):
+        """Test that unknown names and other methods reach the URL resolver."""
+        self.assertEqual(self.get("/static/missing.js").status_code, 404)
+        self.assertEqual(self.client.post(static("css/styles.css")).status_code, 404)
+
+    def test_templates_use_local_assets(self):
+        """Test the base template links the hashed Leaflet files."""
+        response = self.client.get("/mapping/add/")
+        self.assertContains(response, static("leaflet/leaflet.js"))
+        self.assertContains(response, static("leaflet/images/marker-shadow.png"))
+        self.assertNotContains(response, "unpkg.com")
+
+
+class StaticFilesMiddlewareTest(SimpleTestCase):
+    @override_settings(SERVE_STATIC=False)
+    def test_disabled(self):
+        """Test that the middleware removes itself unless SERVE_STATIC is on."""
+        with self.assertRaises(MiddlewareNotUsed):
+            StaticFilesMiddleware(lambda request: None)
+
+    def test_accepted_encodings(self):
+        """Test Accept-Encoding parsing, including q-values."""
+        self.assertEqual(
+            accepted_encodings("gzip;q=1.0, br; q=0, deflate;q=bad, *"),
+            {"gzip", "*"},
+        )
+        self.assertEqual(accepted_encodings(""), set())
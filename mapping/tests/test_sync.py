@@ -0,0 +1,189 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import ChangeSequence, Location, LocationTombstone
+from ..sync import changes_since
+
+
+def make(name, latitude=32.7767, longitude=-96.7970):
+    return Location(
+        name=name, description="A place", latitude=latitude, longitude=longitude
+    )
+
+
+def stored_seq(location):
+    return Location.objects.values_list("change_seq", flat=True).get(pk=location.pk)
+
+
+class ChangeSequenceTest(TestCase):
+    def test_every_write_advances_the_sequence(self):
+        """Test save, bulk writes, update and delete all take new numbers."""
+        dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        seen = [stored_seq(dallas)]
+
+        dallas.description = "Big D, TX"
+        dallas.save(update_fields=["description"])
+        seen.append(stored_seq(dallas))
+
+        austin, houston = Location.objects.bulk_create(
+            [make("Austin"), make("Houston")]
+        )
+        seen += [stored_seq(austin), stored_seq(houston)]
+
+        austin.latitude = 30.27
+        Location.objects.bulk_update([austin], ["latitude"])
+        seen.append(stored_seq(austin))
+
+        Location.objects.filter(pk=houston.pk).update(name="Space City")
+        seen.append(stored_seq(houston))
+
+        pk = dallas.pk
+        dallas.delete()
+        seen.append(LocationTombstone.objects.get(location_id=pk).change_seq)
+
+        self.assertEqual(seen, sorted(set(seen)))
+        self.assertEqual(seen[-1], ChangeSequence.current())
+
+    def test_updated_at(self):
+        """Test that updated_at moves forward on save and on bulk writes."""
+        location = Location.objects.create(
+            name="Plano", description="Suburb", latitude=33.02, longitude=-96.70
+        )
+        first = location.updated_at
+        Location.objects.bulk_update([location], ["name"])
+        location.refresh_from_db()
+        self.assertGreater(location.updated_at, first)
+
+    def test_queryset_delete_leaves_tombstones(self):
+        """Test that a bulk delete records one tombstone per row."""
+        rows = Location.objects.bulk_create([make("A"), make("B"), make("C")])
+        Location.objects.filter(name__in=["A", "B"]).delete()
+        self.assertEqual(
+            set(LocationTombstone.objects.values_list("location_id", flat=True)),
+            {rows[0].pk, rows[1].pk},
+        )
+
+    def test_reused_pk_replaces_tombstone(self):
+        """Test that a row deleted twice under one pk keeps one tombstone."""
+        location = Location.objects.create(
+            name="Frisco", description="North", latitude=33.15, longitude=-96.82
+        )
+        pk = location.pk
+        location.delete()
+        Location.objects.bulk_create(
+            [
+                Location(
+                    pk=pk, name="Frisco", description="North", latitude=0, longitude=0
+                )
+            ]
+        )
+        Location.objects.filter(pk=pk).delete()
+        tombstone = LocationTombstone.objects.get(location_id=pk)
+        self.assertEqual(tombstone.change_seq, ChangeSequence.current())
+
+
+class ChangesSinceTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        self.start = ChangeSequence.current()
+        self.locations = Location.objects.bulk_create(
+            [make(f"Place {i}", latitude=i) for i in range(5)]
+        )
+
+    def test_only_changes_after_since(self):
+        """Test that rows changed before since aren't returned."""
+        seq = changes_since(self.start, 100)["seq"]
+        moved = self.locations[2]
+        moved.latitude = 45.0
+        moved.save()
+        deleted = self.locations[4].pk
+        self.locations[4].delete()
+
+        changes = changes_since(seq, 100)
+        self.assertEqual([row[0] for row in changes["rows"]], [moved.pk])
+        self.assertEqual(changes["rows"][0][2], 45.0)
+        self.assertEqual(changes["deleted"], [deleted])
+        self.assertFalse(changes["more"])
+        self.assertEqual(changes_since(changes["seq"], 100)["rows"], [])
+
+    def test_paging(self):
+        """Test that pages resume where the last one stopped."""
+        seen, since = [], self.start
+        while True:
+            changes = changes_since(since, 2)
+            self.assertLessEqual(len(changes["rows"]), 2)
+            seen += [row[0] for row in changes["rows"]]
+            since = changes["seq"]
+            if not changes["more"]:
+                break
+        self.assertEqual(seen, [location.pk for location in self.locations])
+
+    def test_shared_number_sent_whole(self):
+        """Test that rows sharing a number are never split across pages."""
+        Location.objects.update(description="Renamed")
+        changes = changes_since(self.start + 5, 2)
+        self.assertEqual(len(changes["rows"]), 5)
+        self.assertFalse(changes["more"])
+
+    def test_initial_sync_skips_tombstones(self):
+        """Test that a client starting from 0 isn't sent deletions."""
+        self.locations[0].delete()
+        self.assertEqual(changes_since(0, 100)["deleted"], [])
+
+    def test_since_ahead_of_server_resets(self):
+        """Test that an unknown sequence number makes the client start over."""
+        changes = changes_since(ChangeSequence.current() + 10, 100)
+        self.assertTrue(changes["reset"])
+        self.assertEqual(len(changes["rows"]), 5)
+
+    def test_reads_without_a_transaction(self):
+        """Test that polling doesn't open a (write-locking) transaction."""
+        with CaptureQueriesContext(connection) as queries:
+            changes_since(self.start, 2)
+        for query in queries.captured_queries:
+            self.assertNotIn("SAVEPOINT", query["sql"])
+
+
+class LocationChangesViewTest(TestCase):
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.dallas = Location.objects.create(
+            name="Dallas", description="Big D", latitude=32.7767, longitude=-96.7970
+        )
+        self.url = reverse("location_changes")
+
+    def test_changes(self):
+        """Test the JSON shape and that a synced client gets an empty page."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["locations"][-1]["id"], self.dallas.pk)
+        self.assertEqual(data["locations"][-1]["lat"], 32.7767)
+        self.assertIn("coordinates", data["locations"][-1])
+        self.assertEqual(data["seq"], ChangeSequence.current())
+
+        response = self.client.get(self.url, {"since": data["seq"]})
+        self.assertEqual(response.json()["locations"], [])
+        self.assertEqual(response.json()["deleted"], [])
+
+    @override_settings(MAPPING_CHANGES_PAGE_SIZE=1)
+    def test_page_size_setting(self):
+        """Test that MAPPING_CHANGES_PAGE_SIZE bounds each page."""
+        Location.objects.create(
+            name="Austin", description="Capital", latitude=30.27, longitude=-97.74
+        )
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data["locations"]), 1)
+        self.assertTrue(data["more"])
+
+    def test_invalid_since(self):
+        """Test that a bad since parameter is a 400."""
+        for since in ("-1", "abc"):
+            response = self.client.get(self.url, {"since": since})
+            self.assertEqual(response.status_code, 400)
@@ -1,6 +1,17 @@
+import random
+import unittest
+from unittest import mock
+
+from django.template import Context, Template
 from django.test import TestCase
 
-from ..templatetags.location_tags import format_coordinates
+from ..models import Location
+from ..templatetags import location_tags
+from ..templatetags.location_tags import (
+    decimal_to_dms,
+    format_coordinates,
+    format_coordinates_batch,
+)
 
 
 class LocationTemplateTagsTest(TestCase):
@@ -23,3 +34,62 @@ class LocationTemplateTagsTest(TestCase):
         self.assertEqual(
             format_coordinates(40.7128, -74.0060), "40°42'46\"N, 74°0'21\"W"
         )
+
+    def test_decimal_to_dms_carry(self):
+        """Test that floating-point noise never produces 60 seconds."""
+        self.assertEqual(decimal_to_dms(2.3), (2, 18, 0))
+        self.assertEqual(decimal_to_dms(10.999999999999998), (11, 0, 0))
+        self.assertEqual(decimal_to_dms(-0.5), (0, 30, 0))
+        for value in (i / 3600 for i in range(0, 7200, 7)):
+            _, minutes, seconds = decimal_to_dms(value)
+            self.assertLess(minutes, 60)
+            self.assertLess(seconds, 60)
+
+    def test_format_invalid_values(self):
+        """Test that non-numeric values pass through unchanged."""
+        self.assertEqual(format_coordinates("abc", None), "abc, None")
+
+
+class FormatCoordinatesBatchTest(TestCase):
+    def setUp(self):
+        """Set up random coordinates."""
+        rng = random.Random(7)
+        self.latitudes = [rng.uniform(-90, 90) for _ in range(500)] + [2.3, 0.0]
+        self.longitudes = [rng.uniform(-180, 180) for _ in range(500)] + [-2.3, 0.0]
+        self.expected = [
+            format_coordinates(lat, lng)
+            for lat, lng in zip(self.latitudes, self.longitudes)
+        ]
+
+    def test_pure_python_batch(self):
+        """Test the fallback path matches the per-call tag."""
+        with mock.patch.object(location_tags, "np", None):
+            result = format_coordinates_batch(self.latitudes, self.longitudes)
+        self.assertEqual(result, self.expected)
+
+    @unittest.skipIf(location_tags.np is None, "NumPy is not installed")
+    def test_numpy_batch(self):
+        """Test the vectorised path matches the per-call tag."""
+        result = format_coordinates_batch(self.latitudes, self.longitudes)
+        self.assertEqual(result, self.expected)
+
+    def test_batch_with_invalid_values(self):
+        """Test that non-numeric input falls back to the per-value filters."""
+        self.assertEqual(
+            format_coordinates_batch([32.7767, "abc"], [-96.7970, 1.0]),
+            ["32°46'36\"N, 96°47'49\"W", "abc, 1°0'0\"E"],
+        )
+
+    def test_with_coordinates_filter(self):
+        """Test the template hook formats each row once."""
+        Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        template = Template(
+            "{% load location_tags %}"
+            "{% for location, coordinates in locations|with_coordinates %}"
+            "{{ location.name }}: {{ coordinates|safe }}"
+            "{% endfor %}"
+        )
+        rendered = template.render(Context({"locations": Location.objects.all()}))
+        self.assertEqual(rendered, "Dallas: 32°46'36\"N, 96°47'49\"W")
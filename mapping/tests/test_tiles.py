@@ -0,0 +1,168 @@
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import bump_data_version, get_data_version
+from ..clustering import cluster_index
+from ..geo import tile_bbox, tile_for, tiles_containing
+from ..models import Location
+from ..tiles import render_tile, tile_cache
+from .test_mvt import read_message, read_packed
+
+
+class TileTestMixin:
+    def setUp(self):
+        """Set up a temporary tile cache and test data."""
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        overrides = override_settings(
+            MAPPING_TILE_CACHE_DIR=self.cache_dir.name, MAPPING_TILE_MAX_ZOOM=12
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.location = Location.objects.create(
+            name="Dallas", description="", latitude=32.7767, longitude=-96.7970
+        )
+        self.x, self.y = tile_for(32.7767, -96.7970, 10)
+
+
+class RenderTileTest(TileTestMixin, TestCase):
+    def test_render_tile(self):
+        """Test that a tile contains the locations inside it."""
+        layer = read_message(read_message(render_tile(10, self.x, self.y))[3][0])
+        self.assertEqual(layer[1], [b"locations"])
+        self.assertEqual(len(layer[2]), 1)
+        self.assertEqual(read_message(layer[2][0])[1], [self.location.pk])
+
+    def test_render_empty_tile(self):
+        """Test that a tile without locations has no features."""
+        layer = read_message(read_message(render_tile(10, 0, 0))[3][0])
+        self.assertNotIn(2, layer)
+
+    def test_render_low_zoom_tile_from_clusters(self):
+        """Test that low-zoom tiles hold cluster counts, not every location."""
+        cluster_index.invalidate()
+        self.addCleanup(cluster_index.invalidate)
+        Location.objects.bulk_create(
+            Location(name=f"Near {i}", description="", latitude=32.78, longitude=-96.8)
+            for i in range(2)
+        )
+        Location.objects.create(
+            name="Sydney", description="", latitude=-33.8688, longitude=151.2093
+        )
+        x, y = tile_for(32.7767, -96.7970, 3)
+        cluster_index.query(tile_bbox(3, x, y), 3)
+        with self.assertNumQueries(0):
+            tile = render_tile(3, x, y)
+        layer = read_message(read_message(tile)[3][0])
+        self.assertEqual(layer[1], [b"clusters"])
+        self.assertEqual(layer[3], [b"count"])
+        self.assertEqual(len(layer[2]), 1)
+        tags = read_packed(read_message(layer[2][0])[2][0])
+        self.assertEqual(read_message(layer[4][tags[1]])[5], [3])
+
+
+class TileCacheTest(TileTestMixin, TestCase):
+    def test_set_and_get(self):
+        """Test storing and reading a cached tile."""
+        self.assertIsNone(tile_cache.get(3, 1, 2))
+        tile_cache.set(3, 1, 2, b"tile")
+        self.assertEqual(tile_cache.get(3, 1, 2), b"tile")
+        tile_cache.clear()
+        self.assertIsNone(tile_cache.get(3, 1, 2))
+
+    def test_invalidate_point(self):
+        """Test that only tiles covering the point are removed."""
+        tile_cache.set(10, self.x, self.y, b"dallas")
+        tile_cache.set(10, 0, 0, b"elsewhere")
+        tile_cache.invalidate_point(32.7767, -96.7970)
+        self.assertIsNone(tile_cache.get(10, self.x, self.y))
+        self.assertEqual(tile_cache.get(10, 0, 0), b"elsewhere")
+
+    def test_invalidate_point_on_tile_edges(self):
+        """Test that a point on an edge or corner clears every tile with it."""
+        self.assertEqual(tiles_containing(0, 0, 1), [(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertEqual(tiles_containing(10, 0, 1), [(0, 0), (1, 0)])
+        self.assertEqual(tiles_containing(10, 10, 1), [(1, 0)])
+        for x in (0, 1):
+            tile_cache.set(1, x, 0, b"edge")
+        tile_cache.invalidate_point(10, 0)
+        self.assertIsNone(tile_cache.get(1, 0, 0))
+        self.assertIsNone(tile_cache.get(1, 1, 0))
+
+    def test_set_drops_tile_rendered_before_a_change(self):
+        """Test that a tile is not kept if the data changed while rendering."""
+        version, _ = get_data_version()
+        bump_data_version()
+        tile_cache.set(3, 1, 2, b"stale", data_version=version)
+        self.assertIsNone(tile_cache.get(3, 1, 2))
+        version, _ = get_data_version()
+        tile_cache.set(3, 1, 2, b"fresh", data_version=version)
+        self.assertEqual(tile_cache.get(3, 1, 2), b"fresh")
+
+
+class TileViewTest(TileTestMixin, TestCase):
+    def tile_url(self, z=10, x=None, y=None):
+        return reverse(
+            "location_tile",
+            args=[z, self.x if x is None else x, self.y if y is None else y],
+        )
+
+    def test_tile_view_caches_tile(self):
+        """Test that the tile view renders once and then serves from disk."""
+        response = self.client.get(self.tile_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertEqual(tile_cache.get(10, self.x, self.y), response.content)
+        with self.assertNumQueries(0):
+            self.client.get(self.tile_url())
+
+    def test_tile_view_race_with_edit(self):
+        """Test that an edit committed during a render leaves no stale tile."""
+
+        def render_during_edit(*args):
+            data = render_tile(*args)
+            with self.captureOnCommitCallbacks(execute=True):
+                Location.objects.create(
+                    name="Near Dallas", description="", latitude=32.78, longitude=-96.8
+                )
+            return data
+
+        with mock.patch("mapping.views.render_tile", render_during_edit):
+            self.assertEqual(self.client.get(self.tile_url()).status_code, 200)
+        self.assertIsNone(tile_cache.get(10, self.x, self.y))
+
+    def test_tile_out_of_range(self):
+        """Test tiles outside the zoom level's grid or max zoom."""
+        self.assertEqual(self.client.get(self.tile_url(2, 4, 0)).status_code, 404)
+        self.assertEqual(self.client.get(self.tile_url(13, 0, 0)).status_code, 404)
+
+    def test_update_view_invalidates_old_and_new_tiles(self):
+        """Test that moving a location clears the tiles at both positions."""
+        new_x, new_y = tile_for(-33.8688, 151.2093, 10)
+        tile_cache.set(10, self.x, self.y, b"old")
+        tile_cache.set(10, new_x, new_y, b"new")
+        tile_cache.set(10, 0, 0, b"untouched")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("location_update", args=[self.location.pk]),
+                {
+                    "name": "Sydney",
+                    "description": "Moved",
+                    "latitude": -33.8688,
+                    "longitude": 151.2093,
+                },
+            )
+        self.assertRedirects(response, reverse("location_list"))
+        self.assertIsNone(tile_cache.get(10, self.x, self.y))
+        self.assertIsNone(tile_cache.get(10, new_x, new_y))
+        self.assertEqual(tile_cache.get(10, 0, 0), b"untouched")
+
+    def test_delete_view_invalidates_tile(self):
+        """Test that deleting a location clears its tile."""
+        tile_cache.set(10, self.x, self.y, b"old")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("location_delete", args=[self.location.pk]))
+        self.assertIsNone(tile_cache.get(10, self.x, self.y))
@@ -1,4 +1,5 @@
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..forms import LocationForm
@@ -8,6 +9,7 @@ from ..models import Location
 class LocationViewsTest(TestCase):
     def setUp(self):
         """Set up test data."""
+        cache.clear()
         self.client = Client()
         self.location_data = {
             "name": "Test Location",
@@ -25,6 +27,63 @@ class LocationViewsTest(TestCase):
         self.assertIn("locations", response.context)
         self.assertEqual(list(response.context["locations"]), [self.location])
 
+    def test_location_list_view_no_count_query(self):
+        """Test that the list view renders a page without a COUNT query."""
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(reverse("location_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("COUNT", queries.captured_queries[0]["sql"])
+
+    @override_settings(MAPPING_PAGE_SIZE=1)
+    def test_location_list_view_paginated(self):
+        """Test that the list view follows the next-page cursor."""
+        second = Location.objects.create(**{**self.location_data, "name": "Z"})
+        response = self.client.get(reverse("location_list"))
+        self.assertEqual(list(response.context["locations"]), [self.location])
+        cursor = response.context["page"].next_cursor
+        self.assertContains(response, f"?after={cursor}")
+
+        response = self.client.get(reverse("location_list"), {"after": cursor})
+        self.assertEqual(list(response.context["locations"]), [second])
+        self.assertFalse(response.context["page"].has_next)
+
+    def test_location_list_view_invalid_cursor(self):
+        """Test the list view with a malformed cursor."""
+        response = self.client.get(reverse("location_list"), {"after": "bogus"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_location_list_api(self):
+        """Test the keyset-paginated JSON list API."""
+        second = Location.objects.create(**{**self.location_data, "name": "Z"})
+        response = self.client.get(reverse("location_list_api"), {"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.location.pk])
+        self.assertIsNone(data["previous"])
+
+        response = self.client.get(
+            reverse("location_list_api"), {"limit": 1, "after": data["next"]}
+        )
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["results"]], [second.pk])
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+    def test_location_list_api_invalid_limit(self):
+        """Test the list API with a non-positive limit."""
+        response = self.client.get(reverse("location_list_api"), {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_location_detail_api(self):
+        """Test the JSON detail view and its 404."""
+        response = self.client.get(
+            reverse("location_detail_api", args=[self.location.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Test Location")
+        response = self.client.get(reverse("location_detail_api", args=[999]))
+        self.assertEqual(response.status_code, 404)
+
     def test_location_create_view_get(self):
         """Test the location create view GET request."""
         response = self.client.get(reverse("location_create"))
@@ -44,6 +103,19 @@ class LocationViewsTest(TestCase):
         self.assertRedirects(response, reverse("location_list"))
         self.assertEqual(Location.objects.count(), 2)  # Original + new location
 
+    def test_location_create_view_duplicate(self):
+        """Test that a likely duplicate is saved only once confirmed."""
+        data = {**self.location_data, "name": "Test location."}
+        response = self.client.post(reverse("location_create"), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "looks like a duplicate of Test Location")
+        self.assertEqual(Location.objects.count(), 1)
+
+        data["save_anyway"] = "on"
+        response = self.client.post(reverse("location_create"), data)
+        self.assertRedirects(response, reverse("location_list"))
+        self.assertEqual(Location.objects.count(), 2)
+
     def test_location_update_view_get(self):
         """Test the location update view GET request."""
         response = self.client.get(reverse("location_update", args=[self.location.pk]))
@@ -85,3 +157,43 @@ class LocationViewsTest(TestCase):
         """Test updating a nonexistent location."""
         response = self.client.get(reverse("location_update", args=[999]))
         self.assertEqual(response.status_code, 404)
+
+    def test_location_markers_view(self):
+        """Test the viewport marker JSON view."""
+        response = self.client.get(
+            reverse("location_markers"),
+            {"south": 30, "west": -100, "north": 35, "east": -90},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data["truncated"])
+        self.assertEqual(len(data["markers"]), 1)
+        marker = data["markers"][0]
+        self.assertEqual(marker["id"], self.location.pk)
+        self.assertEqual(marker["name"], "Test Location")
+        self.assertEqual(marker["coordinates"], "32°46'36\"N, 96°47'49\"W")
+
+    def test_location_markers_outside_viewport(self):
+        """Test that markers outside the viewport are not returned."""
+        response = self.client.get(
+            reverse("location_markers"),
+            {"south": 40, "west": -80, "north": 45, "east": -70},
+        )
+        self.assertEqual(response.json()["markers"], [])
+
+    @override_settings(MAPPING_MARKER_LIMIT=1)
+    def test_location_markers_truncated(self):
+        """Test that the marker view reports when it hits the limit."""
+        Location.objects.create(**self.location_data)
+        response = self.client.get(
+            reverse("location_markers"),
+            {"south": 30, "west": -100, "north": 35, "east": -90},
+        )
+        data = response.json()
+        self.assertTrue(data["truncated"])
+        self.assertEqual(len(data["markers"]), 1)
+
+    def test_location_markers_invalid_bbox(self):
+        """Test the marker view with a missing bounding box."""
+        response = self.client.get(reverse("location_markers"))
+        self.assertEqual(response.status_code, 400)
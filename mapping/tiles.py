@@ -0,0 +1,142 @@
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import get_data_version
+from .geo import TILE_SIZE, bbox_q, project, tile_bbox, tiles_containing
+from .mvt import encode_tile
+
+logger = logging.getLogger(__name__)
+
+EXTENT = 4096
+LAYER_NAME = "locations"
+CLUSTER_LAYER_NAME = "clusters"
+# Low-zoom tiles use cluster cells this many zoom levels finer than the
+# cluster endpoint's: 16 pixels with the default 64 pixel cells, so at
+# most 256 features per tile.
+CLUSTER_DETAIL = 2
+
+
+def render_tile(zoom, x, y):
+    """
+    Encode the locations inside tile ``zoom/x/y`` as a vector tile.
+
+    Below MAPPING_TILE_CLUSTER_ZOOM one tile can cover most of the table,
+    so those tiles hold a "clusters" layer with a point and a ``count`` per
+    cluster index cell instead of a feature per location.
+    """
+    if zoom < settings.MAPPING_TILE_CLUSTER_ZOOM:
+        return encode_tile({CLUSTER_LAYER_NAME: _cluster_features(zoom, x, y)})
+
+    from .models import Location
+
+    scale = EXTENT / TILE_SIZE
+    origin_x, origin_y = x * TILE_SIZE, y * TILE_SIZE
+    # Rendered tiles are cached until an edit invalidates them, so they are
+    # read from the primary rather than a replica that may be behind.
+    rows = (
+        Location.objects.using(DEFAULT_DB_ALIAS)
+        .filter(bbox_q(tile_bbox(zoom, x, y)))
+        .order_by()
+        .values_list("id", "name", "latitude", "longitude")
+    )
+
+    def features():
+        for pk, name, latitude, longitude in rows.iterator(chunk_size=5000):
+            px, py = project(latitude, longitude, zoom)
+            yield (
+                pk,
+                round((px - origin_x) * scale),
+                round((py - origin_y) * scale),
+                {"name": name},
+            )
+
+    return encode_tile({LAYER_NAME: features()})
+
+
+def _cluster_features(zoom, x, y):
+    from .clustering import cluster_index
+
+    scale = EXTENT / TILE_SIZE
+    origin_x, origin_y = x * TILE_SIZE, y * TILE_SIZE
+    clusters = cluster_index.query(tile_bbox(zoom, x, y), zoom + CLUSTER_DETAIL)
+    for number, (latitude, longitude, count) in enumerate(sorted(clusters), 1):
+        px, py = project(latitude, longitude, zoom)
+        px, py = px - origin_x, py - origin_y
+        # The query also returns the cells just past the tile's far edges,
+        # which belong to the neighbouring tiles.
+        if 0 <= px < TILE_SIZE and 0 <= py < TILE_SIZE:
+            yield number, round(px * scale), round(py * scale), {"count": count}
+
+
+class TileCache:
+    """
+    On-disk vector tile cache laid out as ``<dir>/v<version>/z/x/y.mvt``.
+
+    The version is bumped whenever the tile contents change shape (new
+    properties, a different encoder), which orphans every old tile at once.
+    Data edits only remove the tiles that cover the edited point.
+
+    A tile is stored along with the data version read before it was
+    rendered. If the data has changed by the time the file is in place, the
+    write is undone: the edit's invalidation may already have run, and
+    would otherwise leave the stale tile behind for good. Edits bump the
+    data version before they invalidate tiles (see mapping.signals), so one
+    of the two always catches it.
+    """
+
+    @property
+    def root(self):
+        return (
+            Path(settings.MAPPING_TILE_CACHE_DIR)
+            / f"v{settings.MAPPING_TILE_CACHE_VERSION}"
+        )
+
+    def path(self, zoom, x, y):
+        return self.root / str(zoom) / str(x) / f"{y}.mvt"
+
+    def get(self, zoom, x, y):
+        try:
+            return self.path(zoom, x, y).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, zoom, x, y, data, data_version=None):
+        """
+        Store a tile. Pass the data version read before rendering it to have
+        the tile dropped again if the data changed in the meantime.
+        """
+        path = self.path(zoom, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it into place so readers never
+        # see a partially written tile.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if data_version is not None and get_data_version()[0] != data_version:
+            logger.debug("Data changed while rendering %s/%s/%s", zoom, x, y)
+            path.unlink(missing_ok=True)
+
+    def invalidate_point(self, latitude, longitude):
+        """Remove the cached tiles containing a point at every zoom level."""
+        for zoom in range(settings.MAPPING_TILE_MAX_ZOOM + 1):
+            for x, y in tiles_containing(latitude, longitude, zoom):
+                self.path(zoom, x, y).unlink(missing_ok=True)
+
+    def clear(self):
+        """Remove every cached tile for the current version."""
+        logger.info("Clearing tile cache at %s", self.root)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+tile_cache = TileCache()
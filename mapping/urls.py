@@ -1,9 +1,44 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("", views.location_list, name="location_list"),
+    path("api/locations/", views.location_list_api, name="location_list_api"),
+    path("api/locations/batch/", views.location_batch, name="location_batch"),
+    path(
+        "api/locations/<int:pk>/",
+        views.location_detail_api,
+        name="location_detail_api",
+    ),
+    path("markers/", views.location_markers, name="location_markers"),
+    path("markers.bin", views.location_markers_packed, name="location_markers_packed"),
+    path("clusters/", views.location_clusters, name="location_clusters"),
+    path("changes/", views.location_changes, name="location_changes"),
+    path(
+        "tiles/<int:z>/<int:x>/<int:y>.mvt", views.location_tile, name="location_tile"
+    ),
+    path(
+        "basemap/<int:z>/<int:x>/<int:y>.png", views.basemap_tile, name="basemap_tile"
+    ),
+    path("search/", views.location_search, name="location_search"),
+    path("export/", views.location_export, name="location_export"),
+    path("nearest/", views.location_nearest, name="location_nearest"),
+    path("within/", views.location_within, name="location_within"),
+    path("async/", async_views.location_list, name="async_location_list"),
+    path(
+        "async/api/locations/",
+        async_views.location_list_api,
+        name="async_location_list_api",
+    ),
+    path(
+        "async/api/locations/<int:pk>/",
+        async_views.location_detail_api,
+        name="async_location_detail_api",
+    ),
+    path("async/markers/", async_views.location_markers, name="async_location_markers"),
+    path("async/export/", async_views.location_export, name="async_location_export"),
+    path("events/", async_views.location_events, name="location_events"),
     path("add/", views.location_create, name="location_create"),
     path("<int:pk>/edit/", views.location_update, name="location_update"),
     path("<int:pk>/delete/", views.location_delete, name="location_delete"),
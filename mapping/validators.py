@@ -0,0 +1,13 @@
+import math
+
+from django.core.exceptions import ValidationError
+
+
+def validate_latitude(value):
+    if not math.isfinite(value) or value < -90 or value > 90:
+        raise ValidationError("Latitude must be between -90 and 90 degrees")
+
+
+def validate_longitude(value):
+    if not math.isfinite(value) or value < -180 or value > 180:
+        raise ValidationError("Longitude must be between -180 and 180 degrees")
@@ -1,38 +1,483 @@
+import json
 import logging
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_POST
 
+from . import batch, markerpack, sync
+from .basemap import TileNotFound, UpstreamError, get_tile
+from .cache import cache_by_data_version, get_data_version
+from .clustering import cluster_index
+from .export import (
+    EXPORT_FIELDS,
+    EXPORT_FORMATS,
+    ExportEncoder,
+    accepts_gzip,
+    iter_export,
+)
 from .forms import LocationForm
+from .geo import BBOX_PARAMS, bbox_q, parse_bbox
+from .metrics import registry
 from .models import Location
+from .pagination import paginate_keyset
+from .search import search
+from .snapshot import location_snapshot
+from .spatial import spatial_index
+from .tiles import render_tile, tile_cache
+from .validators import validate_latitude, validate_longitude
+from .templatetags.location_tags import format_coordinates_batch
 
 logger = logging.getLogger(__name__)
 
 
+@cache_by_data_version
 def location_list(request):
-    logger.info(f"Accessing location list view - User: {request.user}")
+    logger.info("Accessing location list view - User: %s", request.user)
     try:
-        locations = Location.objects.all()
-        logger.debug(f"Retrieved {locations.count()} locations from database")
-        return render(request, "mapping/location_list.html", {"locations": locations})
+        page = paginate_keyset(
+            Location.objects.all(),
+            settings.MAPPING_PAGE_SIZE,
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
+    except ValueError as e:
+        logger.warning("Invalid location list cursor: %s", e)
+        return HttpResponseBadRequest(str(e))
+    try:
+        logger.debug("Retrieved %s locations from database", len(page))
+        return render(
+            request,
+            "mapping/location_list.html",
+            {"locations": page, "page": page},
+        )
     except Exception as e:
-        logger.error(f"Error retrieving locations: {str(e)}", exc_info=True)
+        logger.error("Error retrieving locations: %s", e, exc_info=True)
         raise
 
 
+def _location_dict(location):
+    return {
+        "id": location.pk,
+        "name": location.name,
+        "description": location.description,
+        "lat": location.latitude,
+        "lng": location.longitude,
+    }
+
+
+@cache_by_data_version
+def location_list_api(request):
+    """Return one keyset-paginated page of locations as JSON."""
+    try:
+        limit = int(request.GET.get("limit", settings.MAPPING_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer")
+        page = paginate_keyset(
+            Location.objects.all(),
+            min(limit, settings.MAPPING_MAX_PAGE_SIZE),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
+    except ValueError as e:
+        logger.warning("Invalid location list API request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    results = [_location_dict(location) for location in page]
+    return JsonResponse(
+        {
+            "results": results,
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+@require_POST
+def location_batch(request):
+    """
+    Create, update and delete many locations in one transaction.
+
+    See mapping.batch for the request format. Returns one result per
+    operation; if any operation is invalid nothing is written and the
+    response is a 400 listing the errors. An update to a location deleted
+    while the batch was being checked is a 409, again with nothing written.
+    """
+    try:
+        payload = json.loads(request.body)
+        operations = payload.get("operations") if isinstance(payload, dict) else None
+        plan, results, ok = batch.validate(
+            operations, settings.MAPPING_BATCH_MAX_OPERATIONS
+        )
+    except ValueError as e:
+        logger.warning("Invalid location batch: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+    if not ok:
+        logger.warning("Rejected location batch of %d operations", len(results))
+        return JsonResponse({"results": results}, status=400)
+    results, ok = batch.apply(plan, results)
+    if not ok:
+        logger.warning("Location batch conflicted with a concurrent delete")
+        return JsonResponse({"results": results}, status=409)
+    return JsonResponse({"results": results})
+
+
+def location_detail_api(request, pk):
+    """Return a single location as JSON."""
+    location = get_object_or_404(Location, pk=pk)
+    return JsonResponse(_location_dict(location))
+
+
+def _viewport_query(bbox):
+    return (
+        Location.objects.filter(bbox_q(bbox))
+        .order_by()
+        .values_list("id", "name", "latitude", "longitude")[
+            : settings.MAPPING_MARKER_LIMIT + 1
+        ]
+    )
+
+
+def _markers_from_rows(rows):
+    limit = settings.MAPPING_MARKER_LIMIT
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    formatted = format_coordinates_batch(
+        [row[2] for row in rows], [row[3] for row in rows]
+    )
+    markers = [
+        {
+            "id": pk,
+            "name": name,
+            "lat": latitude,
+            "lng": longitude,
+            "coordinates": coordinates,
+        }
+        for (pk, name, latitude, longitude), coordinates in zip(rows, formatted)
+    ]
+    return markers, truncated
+
+
+def _viewport_markers(bbox):
+    return _markers_from_rows(list(_viewport_query(bbox)))
+
+
+@cache_by_data_version
+def location_markers(request):
+    """Return the markers that fall inside the map's current viewport."""
+    try:
+        bbox = parse_bbox(request.GET)
+    except ValueError as e:
+        logger.warning("Invalid marker bounding box: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    markers, truncated = _viewport_markers(bbox)
+    logger.debug("Returning %s markers for %s", len(markers), bbox)
+    return JsonResponse({"markers": markers, "truncated": truncated})
+
+
+@gzip_page
+@cache_by_data_version
+def location_markers_packed(request):
+    """
+    Return the points inside the viewport as packed binary columns.
+
+    Ids and coordinates only, read from the in-memory snapshot; see
+    mapping.markerpack for the layout. ``encoding`` is ``float32`` (the
+    default) or ``delta`` for delta-encoded fixed point.
+    """
+    try:
+        bbox = parse_bbox(request.GET)
+        encoding = markerpack.ENCODINGS[request.GET.get("encoding", "float32")]
+    except KeyError:
+        return JsonResponse({"error": "Unknown encoding"}, status=400)
+    except ValueError as e:
+        logger.warning("Invalid marker bounding box: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    ids, latitudes, longitudes, truncated = location_snapshot.select(
+        bbox, settings.MAPPING_PACKED_MARKER_LIMIT
+    )
+    logger.debug("Returning %s packed markers for %s", len(ids), bbox)
+    data = markerpack.pack_markers(ids, latitudes, longitudes, encoding, truncated)
+    return HttpResponse(data, content_type="application/octet-stream")
+
+
+@cache_by_data_version
+def location_clusters(request):
+    """
+    Return marker clusters for the viewport at the requested zoom level.
+
+    Past ``MAPPING_CLUSTER_MAX_ZOOM`` the individual markers are returned
+    instead, in the same shape as ``location_markers``.
+    """
+    try:
+        bbox = parse_bbox(request.GET)
+        zoom = int(request.GET["zoom"])
+    except KeyError:
+        return JsonResponse({"error": "Missing zoom parameter"}, status=400)
+    except ValueError as e:
+        logger.warning("Invalid cluster request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if zoom > settings.MAPPING_CLUSTER_MAX_ZOOM:
+        markers, truncated = _viewport_markers(bbox)
+        return JsonResponse(
+            {"zoom": zoom, "clusters": [], "markers": markers, "truncated": truncated}
+        )
+
+    clusters = [
+        {"lat": latitude, "lng": longitude, "count": count}
+        for latitude, longitude, count in cluster_index.query(bbox, zoom)
+    ]
+    logger.debug("Returning %s clusters at zoom %s", len(clusters), zoom)
+    return JsonResponse(
+        {"zoom": zoom, "clusters": clusters, "markers": [], "truncated": False}
+    )
+
+
+@cache_by_data_version
+def location_changes(request):
+    """
+    Return the locations created, updated or deleted after ``since``.
+
+    Clients keep the returned ``seq`` and pass it back as ``since``; while
+    ``more`` is true there are further pages. See mapping.sync.
+    """
+    try:
+        since = int(request.GET.get("since", 0))
+        if since < 0:
+            raise ValueError("since must not be negative")
+    except ValueError as e:
+        logger.warning("Invalid changes request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    changes = sync.changes_since(since, settings.MAPPING_CHANGES_PAGE_SIZE)
+    rows = changes.pop("rows")
+    formatted = format_coordinates_batch(
+        [row[2] for row in rows], [row[3] for row in rows]
+    )
+    changes["locations"] = [
+        {
+            "id": pk,
+            "name": name,
+            "lat": latitude,
+            "lng": longitude,
+            "coordinates": coordinates,
+        }
+        for (pk, name, latitude, longitude), coordinates in zip(rows, formatted)
+    ]
+    return JsonResponse(changes)
+
+
+def location_tile(request, z, x, y):
+    """Serve the locations in web-mercator tile z/x/y as a Mapbox Vector Tile."""
+    if z > settings.MAPPING_TILE_MAX_ZOOM or x >= 1 << z or y >= 1 << z:
+        raise Http404("Tile out of range")
+
+    data = tile_cache.get(z, x, y)
+    if data is None:
+        logger.debug("Tile cache miss for %s/%s/%s", z, x, y)
+        version, _ = get_data_version()
+        data = render_tile(z, x, y)
+        tile_cache.set(z, x, y, data, data_version=version)
+    return HttpResponse(data, content_type="application/vnd.mapbox-vector-tile")
+
+
+def basemap_tile(request, z, x, y):
+    """Serve raster base map tile z/x/y through the local caching proxy."""
+    if z > settings.MAPPING_BASEMAP_MAX_ZOOM or x >= 1 << z or y >= 1 << z:
+        raise Http404("Tile out of range")
+
+    try:
+        data = get_tile(z, x, y)
+    except TileNotFound:
+        raise Http404("Tile not found upstream")
+    except UpstreamError as e:
+        logger.warning("Basemap upstream error: %s", e)
+        return HttpResponse("Basemap upstream unavailable", status=502)
+    response = HttpResponse(data, content_type="image/png")
+    patch_cache_control(response, public=True, max_age=settings.MAPPING_BASEMAP_MAX_AGE)
+    return response
+
+
+def _export_query(params):
+    rows = Location.objects.order_by("id")
+    if any(key in params for key in BBOX_PARAMS):
+        rows = rows.filter(bbox_q(parse_bbox(params)))
+    return rows.values_list(*EXPORT_FIELDS)
+
+
+def location_export(request):
+    """
+    Stream every location (or those inside an optional bounding box) as
+    GeoJSON, CSV or NDJSON, gzip-compressed when the client accepts it.
+    """
+    fmt = request.GET.get("format", "geojson")
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unsupported export format: {fmt}")
+
+    try:
+        rows = _export_query(request.GET).iterator(
+            chunk_size=settings.MAPPING_EXPORT_CHUNK_SIZE
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    compress = accepts_gzip(request)
+    content = iter_export(ExportEncoder(fmt, compress), rows)
+    logger.info("Streaming %s export (gzip=%s)", fmt, compress)
+    return _export_response(fmt, compress, content)
+
+
+def _export_response(fmt, compress, content):
+    content_type, extension = EXPORT_FORMATS[fmt][:2]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="locations.{extension}"'
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _parse_point(params):
+    try:
+        latitude, longitude = float(params["lat"]), float(params["lng"])
+    except KeyError as e:
+        raise ValueError(f"Missing parameter: {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("lat and lng must be numbers")
+    try:
+        validate_latitude(latitude)
+        validate_longitude(longitude)
+    except ValidationError as e:
+        raise ValueError(e.messages[0])
+    return latitude, longitude
+
+
+def _neighbour_results(matches):
+    locations = Location.objects.in_bulk([pk for pk, _ in matches])
+    return [
+        {
+            "id": pk,
+            "name": locations[pk].name,
+            "lat": locations[pk].latitude,
+            "lng": locations[pk].longitude,
+            "distance_m": round(distance, 1),
+        }
+        for pk, distance in matches
+        if pk in locations
+    ]
+
+
+def location_nearest(request):
+    """Return the k locations nearest to a point, nearest first."""
+    try:
+        latitude, longitude = _parse_point(request.GET)
+        k = int(request.GET.get("k", 10))
+        if not 1 <= k <= settings.MAPPING_NEAREST_MAX_K:
+            raise ValueError(
+                f"k must be between 1 and {settings.MAPPING_NEAREST_MAX_K}"
+            )
+    except ValueError as e:
+        logger.warning("Invalid nearest request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    matches = spatial_index.nearest(latitude, longitude, k)
+    return JsonResponse({"results": _neighbour_results(matches)})
+
+
+def location_within(request):
+    """Return the locations within radius_m metres of a point, nearest first."""
+    try:
+        latitude, longitude = _parse_point(request.GET)
+        radius_m = float(request.GET["radius_m"])
+        if not 0 <= radius_m <= settings.MAPPING_WITHIN_MAX_RADIUS_M:
+            raise ValueError(
+                f"radius_m must be between 0 and "
+                f"{settings.MAPPING_WITHIN_MAX_RADIUS_M:g}"
+            )
+    except KeyError:
+        return JsonResponse({"error": "Missing parameter: radius_m"}, status=400)
+    except ValueError as e:
+        logger.warning("Invalid within request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    matches = spatial_index.within(latitude, longitude, radius_m)
+    limit = settings.MAPPING_MARKER_LIMIT
+    return JsonResponse(
+        {
+            "results": _neighbour_results(matches[:limit]),
+            "truncated": len(matches) > limit,
+        }
+    )
+
+
+@cache_by_data_version
+def location_search(request):
+    """
+    Full-text search over location names and descriptions, best match
+    first, optionally limited to a bounding box.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        if not query:
+            raise ValueError("Missing search query: q")
+        limit = int(request.GET.get("limit", 20))
+        if not 1 <= limit <= settings.MAPPING_SEARCH_MAX_RESULTS:
+            raise ValueError(
+                f"limit must be between 1 and {settings.MAPPING_SEARCH_MAX_RESULTS}"
+            )
+        bbox = None
+        if any(key in request.GET for key in BBOX_PARAMS):
+            bbox = parse_bbox(request.GET)
+    except ValueError as e:
+        logger.warning("Invalid search request: %s", e)
+        return JsonResponse({"error": str(e)}, status=400)
+
+    results = search(query, bbox=bbox, limit=limit)
+    logger.debug("Search for %r returned %s results", query, len(results))
+    return JsonResponse(
+        {
+            "results": [
+                {**_location_dict(location), "rank": round(location.rank, 4)}
+                for location in results
+            ]
+        }
+    )
+
+
+def metrics(request):
+    """Expose per-view request metrics in the Prometheus text format."""
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 def location_create(request):
-    logger.info(f"Accessing location create view - User: {request.user}")
+    logger.info("Accessing location create view - User: %s", request.user)
     if request.method == "POST":
-        form = LocationForm(request.POST)
+        form = LocationForm(request.POST, check_duplicates=True)
         if form.is_valid():
             try:
                 location = form.save()
-                logger.info(f"Successfully created new location: {location.name}")
+                logger.info("Successfully created new location: %s", location.name)
                 return redirect("location_list")
             except Exception as e:
-                logger.error(f"Error creating location: {str(e)}", exc_info=True)
+                logger.error("Error creating location: %s", e, exc_info=True)
                 raise
         else:
-            logger.warning(f"Invalid form submission: {form.errors}")
+            logger.warning("Invalid form submission: %s", form.errors)
     else:
         form = LocationForm()
         logger.debug("Rendering empty location form")
@@ -40,28 +485,30 @@ def location_create(request):
 
 
 def location_update(request, pk):
-    logger.info(f"Accessing location update view for pk={pk} - User: {request.user}")
+    logger.info("Accessing location update view for pk=%s - User: %s", pk, request.user)
     location = get_object_or_404(Location, pk=pk)
 
     if request.method == "POST":
-        form = LocationForm(request.POST, instance=location)
+        form = LocationForm(request.POST, instance=location, check_duplicates=True)
         if form.is_valid():
             try:
                 updated_location = form.save()
-                logger.info(f"Successfully updated location: {updated_location.name}")
+                logger.info("Successfully updated location: %s", updated_location.name)
                 return redirect("location_list")
             except Exception as e:
                 logger.error(
-                    f"Error updating location {location.name}: {str(e)}", exc_info=True
+                    "Error updating location %s: %s", location.name, e, exc_info=True
                 )
                 raise
         else:
             logger.warning(
-                f"Invalid form submission for location {location.name}: {form.errors}"
+                "Invalid form submission for location %s: %s",
+                location.name,
+                form.errors,
             )
     else:
         form = LocationForm(instance=location)
-        logger.debug(f"Rendering update form for location: {location.name}")
+        logger.debug("Rendering update form for location: %s", location.name)
 
     return render(
         request, "mapping/location_form.html", {"form": form, "location": location}
@@ -69,22 +516,22 @@ def location_update(request, pk):
 
 
 def location_delete(request, pk):
-    logger.info(f"Accessing location delete view for pk={pk} - User: {request.user}")
+    logger.info("Accessing location delete view for pk=%s - User: %s", pk, request.user)
     location = get_object_or_404(Location, pk=pk)
 
     if request.method == "POST":
         try:
             location_name = location.name
             location.delete()
-            logger.info(f"Successfully deleted location: {location_name}")
+            logger.info("Successfully deleted location: %s", location_name)
             return redirect("location_list")
         except Exception as e:
             logger.error(
-                f"Error deleting location {location.name}: {str(e)}", exc_info=True
+                "Error deleting location %s: %s", location.name, e, exc_info=True
             )
             raise
 
-    logger.debug(f"Rendering delete confirmation for location: {location.name}")
+    logger.debug("Rendering delete confirmation for location: %s", location.name)
     return render(
         request, "mapping/location_confirm_delete.html", {"location": location}
     )
@@ -0,0 +1,70 @@
+// Decoder for the packed marker payloads served at markers.bin (see
+// mapping/markerpack.py for the layout).
+//
+//     fetch(url).then(function(response) { return response.arrayBuffer(); })
+//         .then(decodeMarkers)
+//         .then(function(markers) { ... markers.lat[i], markers.lng[i] ... });
+//
+// Returns {ids, lat, lng, truncated}. Float32 coordinates are views onto the
+// response buffer; no JSON is parsed and nothing is copied.
+(function(global) {
+    'use strict';
+
+    var HEADER_SIZE = 16;
+    var FIXED_POINT = 1;
+    var TRUNCATED = 1;
+    var LITTLE_ENDIAN = new Uint8Array(new Uint16Array([1]).buffer)[0] === 1;
+
+    function column(buffer, index, count, Type) {
+        var offset = HEADER_SIZE + 4 * count * index;
+        if (LITTLE_ENDIAN) {
+            return new Type(buffer, offset, count);
+        }
+        var view = new DataView(buffer, offset, 4 * count);
+        var values = new Type(count);
+        var read = Type === Float32Array ? 'getFloat32'
+            : Type === Int32Array ? 'getInt32' : 'getUint32';
+        for (var i = 0; i < count; i++) {
+            values[i] = view[read](4 * i, true);
+        }
+        return values;
+    }
+
+    // Running sum of deltas into a new Float64Array, divided by scale.
+    function undelta(deltas, scale) {
+        var values = new Float64Array(deltas.length);
+        var total = 0;
+        for (var i = 0; i < deltas.length; i++) {
+            total += deltas[i];
+            values[i] = total / scale;
+        }
+        return values;
+    }
+
+    function decodeMarkers(buffer) {
+        var header = new DataView(buffer, 0, HEADER_SIZE);
+        var magic = String.fromCharCode(
+            header.getUint8(0), header.getUint8(1), header.getUint8(2), header.getUint8(3)
+        );
+        if (magic !== 'LMK1') {
+            throw new Error('Not a packed marker payload');
+        }
+        var encoding = header.getUint8(4);
+        var count = header.getUint32(8, true);
+        var scale = header.getUint32(12, true);
+        var markers = {
+            ids: undelta(column(buffer, 0, count, Uint32Array), 1),
+            truncated: (header.getUint8(5) & TRUNCATED) !== 0
+        };
+        if (encoding === FIXED_POINT) {
+            markers.lat = undelta(column(buffer, 1, count, Int32Array), scale);
+            markers.lng = undelta(column(buffer, 2, count, Int32Array), scale);
+        } else {
+            markers.lat = column(buffer, 1, count, Float32Array);
+            markers.lng = column(buffer, 2, count, Float32Array);
+        }
+        return markers;
+    }
+
+    global.decodeMarkers = decodeMarkers;
+})(typeof window !== 'undefined' ? window : globalThis);